@@ -1,134 +1,231 @@
+import time
+_script_started = time.perf_counter()
+
+import os
+import sys
+import numpy as np
 import streamlit as st
 import pandas as pd
-import pulp
-import folium
-from streamlit_folium import st_folium
-import altair as alt
-from geopy.distance import geodesic
-
-# Load Data
-@st.cache_data
+from fuel_solver import solve_refuelling, solve_refuelling_pulp, MIN_PURCHASE_LITRES
+from itinerary import Itinerary, check_chain, route_chains
+from geo_distance import add_route_distances
+from route_chainage import add_road_chainage, load_route_line, route_geojson_path
+from route_table import RouteTable
+from district_matcher import load_matches
+from plan_cache import PlanCache, plan_key
+from price_index import route_price_index
+from price_imputation import district_price_table
+from price_store import open_price_store
+from station_corridor import (DEFAULT_BUFFER_KM, STATION_CHAINAGE_COLUMN, STATION_OFFSET_COLUMN, STATIONS_FILE_PATH,
+                              fill_station_prices, route_stations)
+from table_cache import last_read, read_table
+from vehicles import vehicle_mileage, TANK_CAPACITY
+# Mapping, charting and solver libraries load where first used (scikit-learn inside the price imputation,
+# pulp inside the PuLP solver): together they take longer to import than everything above, and a first page
+# view needs none of them
+DEFERRED_MODULES = ('folium', 'streamlit_folium', 'altair', 'scipy', 'sklearn', 'pulp')
+imports_seconds = time.perf_counter() - _script_started
+
+# Load Data: built once per process and shared, so a route lookup is a slice of its arrays.
+# The workbook comes from the columnar cache unless it changed since the last parse.
+@st.cache_resource
 def load_data():
-    df = pd.read_excel('routes_districts_prices_filled_mean.xlsx')
-    return df
+    df = read_table('routes_districts_prices_filled_mean.xlsx')
+    return RouteTable(add_road_chainage(add_route_distances(df)))
+
+route_table = load_data()
+
+
+@st.cache_resource
+def get_plan_cache():
+    return PlanCache()
+
+plan_cache = get_plan_cache()
+# Memoized per process and reloaded when a new snapshot is appended
+price_store = open_price_store()
 
-routes_df = load_data()
 
-# Vehicle mileage data
-vehicle_mileage = {
-    'RJ14GG9302': {'Load': 4.60, 'Empty': 5.00},
-    'RJ14GH7301': {'Load': 2.10, 'Empty': 4.00}
-}
+@st.cache_resource
+def startup_report():
+    """What this process's first run cost: kept from the cold start for the sidebar."""
+    return {'imports': imports_seconds, 'data': time.perf_counter() - _script_started - imports_seconds,
+            'workbook': dict(last_read)}
+
+startup = startup_report()
 
 # Streamlit UI
 st.title("🚚 Fuel Optimization Tool")
 
-route_selected = st.selectbox("Choose Route", routes_df['Route Name'].unique())
+route_selected = st.selectbox("Choose Route", route_table.names)
 vehicle_selected = st.selectbox("Select Vehicle", list(vehicle_mileage.keys()))
 load_status = st.radio("Vehicle Load Status", ['Load', 'Empty'])
 
 mileage = vehicle_mileage[vehicle_selected][load_status]
 st.write(f"Vehicle Mileage: {mileage} km/l")
 
-tank_capacity = 300
+tank_capacity = TANK_CAPACITY
 start_fuel = st.number_input("Starting Fuel (liters)", value=200.0)
 end_fuel = st.number_input("Ending Fuel (liters)", value=50.0)
 buffer_fuel = st.number_input("Buffer Fuel (liters)", value=30.0)
+price_dates = price_store.dates()
+price_date = st.date_input("Prices as of", value=price_dates[-1].item(), min_value=price_dates[0].item()) \
+    if len(price_dates) else None
+
+SOLVER_GREEDY = 'Greedy (exact, fast)'
+SOLVER_PULP = 'PuLP / CBC (cross-check)'
+SOLVER_SPARSE = 'Sparse MILP (HiGHS / CBC)'
+solver_selected = st.radio("Solver", [SOLVER_GREEDY, SOLVER_PULP, SOLVER_SPARSE])
+stop_cost = st.number_input("Fixed Cost per Stop (₹)", value=0.0, min_value=0.0,
+                            help="Any stop cost needs the sparse MILP; the greedy solver assumes stops are free.")
 
 run_button = st.button("🚀 Run Optimization")
 
 if 'results' not in st.session_state:
     st.session_state['results'] = {}
+if 'lp_models' not in st.session_state:
+    st.session_state['lp_models'] = {}
+if 'itineraries' not in st.session_state:
+    st.session_state['itineraries'] = {}
+# Price indexes are updated in place, so each session keeps its own: another session repricing the same
+# route for a different date must not change the next-cheaper array this one is solving with
+if 'price_indexes' not in st.session_state:
+    st.session_state['price_indexes'] = {}
 
 if run_button:
-    route_data = routes_df[routes_df['Route Name'] == route_selected].reset_index()
-    coords = list(zip(route_data['District Latitude (Centroid)'], route_data['District Longitude (Centroid)']))
-
-    distances = [geodesic(coords[i], coords[i+1]).km for i in range(len(coords)-1)]
-    fuel_needed_segments = [d / mileage for d in distances]
+    # Optimization Model: quotes as of the chosen date, estimated from neighbours where a district has none
+    if price_date is not None:
+        route = route_table.with_prices(district_price_table(price_store.snapshot(price_date),
+                                                             load_matches())).route(route_selected)
+    else:
+        route = route_table.route(route_selected)
 
-    # Optimization Model
-    prob = pulp.LpProblem("FuelOptimization", pulp.LpMinimize)
+    distances = route.segment_km[:-1]
+    chainage = route.chainage
+    fuel_needed_segments = distances / mileage
 
-    purchase = pulp.LpVariable.dicts("purchase", route_data.index, lowBound=0)
-    fuel_level = pulp.LpVariable.dicts("fuel_level", route_data.index, lowBound=buffer_fuel, upBound=tank_capacity)
-    stop = pulp.LpVariable.dicts("stop", route_data.index, cat='Binary')
+    imputed = route.imputed
+    prices = route.price
+    route_inputs = (route.districts, prices, distances)
+    solve_inputs = dict(mileage=mileage, start_fuel=start_fuel, end_fuel=end_fuel, buffer_fuel=buffer_fuel,
+                        tank_capacity=tank_capacity)
 
-    prob += pulp.lpSum([purchase[i] * route_data.loc[i, 'Price'] for i in route_data.index])
-
-    for idx in route_data.index:
-        if idx == 0:
-            prob += fuel_level[idx] == start_fuel
-        else:
-            prob += fuel_level[idx] == fuel_level[idx - 1] + purchase[idx - 1] - fuel_needed_segments[idx - 1]
+    def cached_solve(solver_name, solve, **extra_inputs):
+        return plan_cache.get_or_solve(plan_key(*route_inputs, solver=solver_name, **solve_inputs, **extra_inputs),
+                                       solve)
 
-        prob += purchase[idx] <= (tank_capacity - buffer_fuel) * stop[idx]
-        prob += purchase[idx] + fuel_level[idx] <= tank_capacity
+    def solve_sparse():
+        from fuel_lp import SparseRefuelModel
+        # Keep one model per route/vehicle so a change of prices or start fuel re-solves from the last basis
+        model_key = (route_selected, mileage, end_fuel, buffer_fuel, tank_capacity, stop_cost)
+        lp_model = st.session_state['lp_models'].get(model_key)
+        if lp_model is None:
+            lp_model = SparseRefuelModel(fuel_needed_segments, buffer_fuel, tank_capacity, end_fuel, stop_cost)
+            st.session_state['lp_models'][model_key] = lp_model
+        return lp_model.solve(prices, start_fuel)
 
-    prob.solve()
+    # Kept per route and session; a new price snapshot only updates the districts whose price moved
+    price_index = route_price_index(route_selected, chainage, prices, st.session_state['price_indexes'])
+    plan = cached_solve('greedy', lambda: solve_refuelling(prices, fuel_needed_segments, start_fuel, end_fuel,
+                                                           buffer_fuel, tank_capacity, price_index.next_cheaper))
+    cross_check = None
+    if stop_cost > 0:
+        # Neither the greedy nor the PuLP model has a stop cost
+        if solver_selected == SOLVER_PULP:
+            st.warning("The PuLP model has no stop cost; solved with the sparse MILP instead.")
+        plan = cached_solve('sparse', solve_sparse, stop_cost=stop_cost)
+    elif solver_selected == SOLVER_PULP:
+        cross_check = plan
+        plan = cached_solve('pulp', lambda: solve_refuelling_pulp(prices, fuel_needed_segments, start_fuel, end_fuel,
+                                                                  buffer_fuel, tank_capacity))
+    elif solver_selected == SOLVER_SPARSE:
+        cross_check = plan
+        plan = cached_solve('sparse', solve_sparse, stop_cost=stop_cost)
 
     filling_table = []
-    total_cost, total_fuel, cumulative_distance = 0, 0, 0
-
-    for i in route_data.index:
-        purchased_fuel = pulp.value(purchase[i])
-        if purchased_fuel and purchased_fuel > 0.01:
-            cost_at_stop = purchased_fuel * route_data.loc[i, 'Price']
-            total_cost += cost_at_stop
-            total_fuel += purchased_fuel
-            filling_table.append({
-                'Location': route_data.loc[i, 'Intersected District'],
-                'Distance (km)': f"{cumulative_distance:.2f}",
-                'Arrival Fuel (L)': f"{pulp.value(fuel_level[i]):.2f}",
-                'Purchased Fuel (L)': f"{purchased_fuel:.2f}",
-                'Depart Fuel (L)': f"{pulp.value(fuel_level[i]) + purchased_fuel:.2f}",
-                'Fuel Cost (₹)': f"{cost_at_stop:.2f}",
-                'Price (₹/L)': f"{route_data.loc[i, 'Price']:.4f}"
-            })
-        if i < len(distances):
-            cumulative_distance += distances[i]
+    total_cost, total_fuel = 0, 0
+
+    for i in np.flatnonzero(plan.purchase > MIN_PURCHASE_LITRES):
+        purchased_fuel = plan.purchase[i]
+        cost_at_stop = purchased_fuel * prices[i]
+        total_cost += cost_at_stop
+        total_fuel += purchased_fuel
+        filling_table.append({
+            'Location': route.districts[i],
+            'Distance (km)': f"{chainage[i]:.2f}",
+            'Arrival Fuel (L)': f"{plan.fuel_level[i]:.2f}",
+            'Purchased Fuel (L)': f"{purchased_fuel:.2f}",
+            'Depart Fuel (L)': f"{plan.fuel_level[i] + purchased_fuel:.2f}",
+            'Fuel Cost (₹)': f"{cost_at_stop:.2f}",
+            'Price (₹/L)': f"{prices[i]:.4f}",
+            'Price Source': f"estimate ±{route.uncertainty[i]:.2f}" if imputed[i] else 'quote'
+        })
 
     fuel_chart_data = pd.DataFrame({
-        'Distance (km)': [sum(distances[:i]) for i in route_data.index],
-        'Fuel Level (liters)': [pulp.value(fuel_level[i]) for i in route_data.index]
+        'Distance (km)': chainage,
+        'Fuel Level (liters)': plan.fuel_level
     }).dropna()
 
     st.session_state['results'] = {
         'filling_table': filling_table,
         'total_cost': total_cost,
         'total_fuel': total_fuel,
-        'coords': coords,
-        'route_data': route_data,
-        'stop': {i: pulp.value(stop[i]) for i in route_data.index},
-        'purchase': {i: pulp.value(purchase[i]) for i in route_data.index},
-        'fuel_chart_data': fuel_chart_data
+        'stop_cost_total': stop_cost * int(plan.stop.sum()),
+        'distance_source': route.distance_source,
+        'route': route,
+        'purchase': plan.purchase,
+        'fuel_chart_data': fuel_chart_data,
+        'status': plan.status,
+        'solver': plan.solver,
+        'cross_check_cost': cross_check.total_cost if cross_check is not None and cross_check.is_optimal else None
     }
 
 if st.session_state['results']:
     results = st.session_state['results']
 
+    if results.get('status', 'Optimal') != 'Optimal':
+        st.error(f"No feasible fuel plan ({results['status']}). Check the starting, ending and buffer fuel against the tank capacity.")
+    if results.get('cross_check_cost') is not None:
+        st.caption(f"Cross-check ({results['solver']} vs greedy): "
+                   f"₹{results['total_cost']:.2f} vs ₹{results['cross_check_cost']:.2f} "
+                   f"(difference ₹{results['total_cost'] - results['cross_check_cost']:.2f})")
+
     st.subheader("✅ Recommended Fuel Stops")
+    if results.get('distance_source'):
+        st.caption(f"Distances between districts: {results['distance_source']}")
     filling_df = pd.DataFrame(results['filling_table'])
     st.table(filling_df)
 
     st.subheader("💰 Total Fuel Purchased and Cost")
     st.write(f"Total Fuel Purchased: {results['total_fuel']:.2f} liters")
     st.write(f"Total Cost: ₹{results['total_cost']:.2f}")
+    if results.get('stop_cost_total'):
+        st.write(f"Stop Costs: ₹{results['stop_cost_total']:.2f}")
+
+    st.subheader("🔎 Cheapest Diesel Ahead")
+    route = results['route']
+    price_index = route_price_index(route.name, route.chainage, route.price, st.session_state['price_indexes'])
+    from_km = st.number_input("From (km along the route)", value=0.0, min_value=0.0)
+    within_km = st.number_input("Next (km)", value=300.0, min_value=1.0)
+    cheapest_price, cheapest_idx = price_index.cheapest_ahead(from_km, within_km)
+    if cheapest_idx < 0:
+        st.write(f"No priced district between km {from_km:.0f} and {from_km + within_km:.0f}.")
+    else:
+        st.table(pd.DataFrame([{
+            'Location': route.districts[cheapest_idx],
+            'Distance (km)': f"{route.chainage[cheapest_idx]:.2f}",
+            'Km Ahead': f"{route.chainage[cheapest_idx] - from_km:.2f}",
+            'Price (₹/L)': f"{cheapest_price:.4f}",
+        }]))
 
     st.subheader("🗺️ Route Map with Recommended Stops")
-    m = folium.Map(location=results['coords'][0], zoom_start=6)
-    for idx, coord in enumerate(results['coords']):
-        district = results['route_data'].loc[idx, 'Intersected District']
-        price = results['route_data'].loc[idx, 'Price']
-        popup = f"{district}<br>Price: ₹{price}/L"
-        if results['stop'][idx] > 0 and results['purchase'][idx] > 0.01:
-            folium.Marker(coord, popup=popup, icon=folium.Icon(color='green', icon='info-sign')).add_to(m)
-        else:
-            folium.CircleMarker(coord, radius=5, color='blue', fill=True, fill_opacity=0.7,
-                                tooltip=f"{district}: ₹{price}/L").add_to(m)
-    st_folium(m, width=700, height=500)
+    # Base map (tiles and road line) is built once per route; only the stop overlay changes between runs
+    from map_render import base_map, show_map, stop_overlay
+    show_map(base_map(route.name, route.lat, route.lon),
+             stop_overlay(route, results['purchase'], cheapest_idx, f"Cheapest in the next {within_km:.0f} km"),
+             key=f"route_map_{route.name}")
 
     st.subheader("📊 Fuel Level Along the Route")
+    import altair as alt
     chart = alt.Chart(results['fuel_chart_data']).mark_line(point=True).encode(
         x='Distance (km)',
         y='Fuel Level (liters)'
@@ -136,3 +233,86 @@ if st.session_state['results']:
     st.altair_chart(chart)
 else:
     st.info("Adjust parameters and click 'Run Optimization'.")
+
+if os.path.exists(STATIONS_FILE_PATH):
+    with st.expander("⛽ Fuel Stations Along the Route"):
+        corridor_km = st.slider("Corridor width each side (km)", 0.5, 20.0, DEFAULT_BUFFER_KM, step=0.5)
+        corridor_df = route_stations(route_selected, corridor_km)
+        if corridor_df is None:
+            st.caption(f"No route geometry for {route_selected}.")
+        else:
+            if price_date is not None:
+                corridor_df = fill_station_prices(corridor_df, district_price_table(price_store.snapshot(price_date),
+                                                                                    load_matches()))
+            st.caption(f"{len(corridor_df)} stations within {corridor_km} km of the route")
+            st.dataframe(corridor_df.round({STATION_CHAINAGE_COLUMN: 1, STATION_OFFSET_COLUMN: 2}), hide_index=True)
+
+            detour_cost = st.number_input("Cost per Detour km (₹)", value=0.0, min_value=0.0,
+                                          help="Driver time and wear for leaving the route; detour fuel is always counted.")
+            if st.button("⛽ Plan Over These Stations") and 'Price' in corridor_df.columns:
+                from detour_solver import solve_detour_refuelling
+                candidates = corridor_df[np.isfinite(corridor_df['Price'].to_numpy(dtype=float))]
+                station_plan = solve_detour_refuelling(
+                    candidates[STATION_CHAINAGE_COLUMN], 2 * candidates[STATION_OFFSET_COLUMN], candidates['Price'],
+                    load_route_line(route_geojson_path(route_selected)).length_km, mileage, start_fuel, end_fuel,
+                    buffer_fuel, tank_capacity, stop_cost=stop_cost, detour_cost_per_km=detour_cost)
+                if not station_plan.is_optimal:
+                    st.error(f"No feasible plan over these stations ({station_plan.status}).")
+                else:
+                    stops = candidates[station_plan.stop].assign(**{
+                        'Purchased Fuel (L)': station_plan.purchase[station_plan.stop].round(2),
+                        'Road Fuel (L)': station_plan.fuel_level[station_plan.stop].round(2)})
+                    st.dataframe(stops.round({STATION_CHAINAGE_COLUMN: 1, STATION_OFFSET_COLUMN: 2}), hide_index=True)
+                    st.write(f"Fuel ₹{station_plan.total_cost:.2f} + stops and detours ₹{station_plan.extra_cost:.2f} "
+                             f"({station_plan.detour_total_km:.1f} detour km)")
+                    if st.session_state['results']:
+                        st.caption(f"District-centroid plan (no detours): ₹{st.session_state['results']['total_cost']:.2f}")
+
+with st.expander("🧭 Multi-Leg Itinerary"):
+    leg_names = st.multiselect("Legs, in driving order", list(route_table.names),
+                               default=[name for name in route_chains()[0] if name in route_table.names])
+    leg_end_fuel = st.number_input("Minimum Fuel at Each Leg End (liters)", value=buffer_fuel, min_value=0.0)
+    if st.button("🧭 Plan Itinerary") and leg_names:
+        try:
+            check_chain(leg_names)
+        except ValueError as error:
+            st.error(str(error))
+        else:
+            priced_table = route_table.with_prices(district_price_table(price_store.snapshot(price_date),
+                                                                        load_matches())) \
+                if price_date is not None else route_table
+            legs = [priced_table.route(name) for name in leg_names]
+            # Kept per trip and vehicle; new prices re-walk only the part of the trip they affect
+            itinerary_key = (tuple(leg_names), mileage, start_fuel, end_fuel, buffer_fuel, tank_capacity, leg_end_fuel)
+            itinerary = st.session_state['itineraries'].get(itinerary_key)
+            if itinerary is None:
+                itinerary = Itinerary(legs, mileage, start_fuel, end_fuel, buffer_fuel, tank_capacity, leg_end_fuel)
+                st.session_state['itineraries'][itinerary_key] = itinerary
+            else:
+                itinerary.reprice(np.concatenate([leg.price for leg in legs]))
+            trip_plan = itinerary.plan()
+            if not trip_plan.is_optimal:
+                st.error(f"No feasible plan over the whole trip ({trip_plan.status}).")
+            else:
+                st.table(itinerary.leg_table(trip_plan).round(2))
+                separate = itinerary.leg_by_leg()
+                st.write(f"Trip Cost: ₹{trip_plan.total_cost:.2f} for {trip_plan.total_fuel:.2f} liters")
+                if separate.is_optimal:
+                    st.write(f"Planned leg by leg: ₹{separate.total_cost:.2f} "
+                             f"(the trip plan saves ₹{separate.total_cost - trip_plan.total_cost:.2f})")
+                else:
+                    st.write(f"Planned leg by leg the trip is {separate.status.lower()}.")
+                if itinerary.last_refresh:
+                    refresh = itinerary.last_refresh
+                    st.caption(f"Re-planned from the last prices: {refresh['prices']} changed, re-walked "
+                               f"{refresh['walked']} of {refresh['steps']} steps")
+
+cache_stats = plan_cache.stats()
+st.sidebar.caption(f"Plan cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hits "
+                   f"({cache_stats['disk_hits']} from disk), {cache_stats['misses']} misses, "
+                   f"~{cache_stats['saved_seconds']:.2f} s of solver time saved")
+workbook = startup['workbook']
+st.sidebar.caption(f"Cold start: imports {startup['imports']:.2f} s, data {startup['data']:.2f} s "
+                   f"(workbook from {workbook.get('source', '?')} in {workbook.get('seconds', 0) * 1000:.0f} ms); "
+                   f"loaded on demand so far: "
+                   f"{', '.join(name for name in DEFERRED_MODULES if name in sys.modules) or 'none'}")
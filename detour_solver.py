@@ -0,0 +1,229 @@
+"""Refuelling over off-route station candidates, paying for the detour to each.
+
+fuel_solver plans on points that lie on the route.  A station found by
+station_corridor sits `offset` km off the road: stopping there costs
+`detour_km` (out and back, by default 2 x offset) of fuel, plus an optional
+fixed cost per stop and a cost per detour km (driver time, wear).  With those
+costs the cheapest plan is no longer "next cheaper station", so this is a
+dynamic programme over (candidate, fuel level) states.
+
+State.  Fuel is discretised in `fuel_step` litres, but the level on the road
+changes continuously as the truck drives.  The DP therefore tracks
+
+    s = fuel in the tank + route fuel consumed so far (start to here)
+
+which driving does not change; only purchases and detours move it.  At
+candidate j the valid road levels are buffer <= s - C_j <= tank, a window of
+(tank - buffer) / fuel_step grid points that slides right along the route.
+
+Transition.  Passing candidate j, either skip it (V unchanged) or stop:
+drive out (s drops by the outbound detour), buy up to level b, drive back:
+
+    stop(b - back) = fixed_j + p_j * b + min_{a <= b} (V(a + out) - p_j * a)
+
+The inner term is a prefix minimum, so one candidate costs O(window) numpy
+work and the whole route O(candidates x window).  Detour fuel is rounded up
+to the grid so every DP plan is feasible.  The chosen stops are then re-solved
+exactly with fuel_solver's greedy (exact detour fuel, no grid), and stops the
+greedy leaves empty are dropped.  The grid can cost up to about one fuel_step
+of fuel per stop against the true optimum (the stop set itself is not
+re-optimised), and plans that only work with less than a step of slack are
+reported infeasible; a smaller fuel_step tightens both at proportional cost.
+
+Timings (synthetic 1,500 km route, 0.25 L grid, 300 L tank): 1,000
+candidates ~0.07 s, 10,000 candidates ~0.7 s.
+"""
+import argparse
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from fuel_solver import MIN_PURCHASE_LITRES, RefuelPlan, STATUS_INFEASIBLE, solve_refuelling
+
+DEFAULT_FUEL_STEP = 0.25
+# Fuel on a grid point is compared with a bound after subtracting; absorbs float noise
+GRID_TOLERANCE = 1e-9
+
+
+@dataclass
+class DetourPlan(RefuelPlan):
+    chainage: np.ndarray = None     # km along the route of each candidate
+    detour_km: np.ndarray = None    # extra km driven when stopping at each candidate
+    stop_cost: float = 0.0
+    detour_cost_per_km: float = 0.0
+
+    @property
+    def detour_total_km(self):
+        return float(self.detour_km[self.stop].sum())
+
+    @property
+    def extra_cost(self):
+        """Fixed stop costs plus detour km costs (not the detour fuel, which is in total_cost)."""
+        return float(self.stop.sum()) * self.stop_cost + self.detour_total_km * self.detour_cost_per_km
+
+    @property
+    def objective(self):
+        return self.total_cost + self.extra_cost
+
+
+def _grid_bounds(levels, base, step):
+    """Lowest / highest grid index whose fuel is at least / at most `levels`."""
+    return np.ceil((levels - base) / step - GRID_TOLERANCE).astype(np.int64), \
+        np.floor((levels - base) / step + GRID_TOLERANCE).astype(np.int64)
+
+
+def _dp_stops(route_fuel, out_fuel, back_fuel, prices, fixed_costs, end_route_fuel, start_fuel, end_level,
+              buffer_fuel, tank_capacity, step):
+    """Indices of the candidates the discretised DP stops at, or None if no plan exists."""
+    n = len(prices)
+    # Grid anchored so the start level is a grid point and every s >= buffer is a non-negative index
+    start_index = int(np.ceil((start_fuel - buffer_fuel) / step - GRID_TOLERANCE))
+    base = start_fuel - start_index * step
+    low, _ = _grid_bounds(buffer_fuel + route_fuel, base, step)
+    _, high = _grid_bounds(tank_capacity + route_fuel, base, step)
+    out_steps = np.ceil(out_fuel / step - GRID_TOLERANCE).astype(np.int64)
+    # The return leg takes what is left of the rounded-up detour
+    back_steps = np.ceil((out_fuel + back_fuel) / step - GRID_TOLERANCE).astype(np.int64) - out_steps
+    end_low, _ = _grid_bounds(end_level + end_route_fuel, base, step)
+    _, end_high = _grid_bounds(tank_capacity + end_route_fuel, base, step)
+    size = int(max(end_high, high.max() if n else 0, start_index)) + 1
+
+    value = np.full(size, np.inf)
+    value[start_index] = 0.0
+    sources = []
+    for j in range(n):
+        lo, hi = int(low[j]), int(high[j])
+        # Levels below the buffer at this chainage were never reachable
+        value[:lo] = np.inf
+        out, back = int(out_steps[j]), int(back_steps[j])
+        window = hi - lo + 1
+        if window <= out + back or not np.isfinite(value[lo + out:hi + 1]).any():
+            sources.append(None)
+            continue
+        price = prices[j] * step
+        # A[a] = V(a + out) - p * a for arrival index a in [lo, hi - out]; padded to the window
+        arrival = np.full(window, np.inf)
+        arrival[:window - out] = value[lo + out:hi + 1] - price * np.arange(lo, hi - out + 1)
+        best = np.minimum.accumulate(arrival)
+        best_source = np.maximum.accumulate(np.where(arrival == best, np.arange(window), -1))
+        # Road index after the stop is b - back for bought-to index b in [lo + back, hi]
+        stop = fixed_costs[j] + price * np.arange(lo + back, hi + 1) + best[back:]
+        road = slice(lo, hi + 1 - back)
+        better = stop < value[road]
+        value[road] = np.where(better, stop, value[road])
+        sources.append((lo, np.where(better, best_source[back:] + lo, -1).astype(np.int32)))
+
+    value[:end_low] = np.inf
+    final = int(np.argmin(value[:end_high + 1])) if end_high >= 0 else 0
+    if end_high < 0 or not np.isfinite(value[final]):
+        return None
+
+    stops, k = [], final
+    for j in range(n - 1, -1, -1):
+        if sources[j] is None:
+            continue
+        lo, source = sources[j]
+        if 0 <= k - lo < len(source) and source[k - lo] >= 0:
+            stops.append(j)
+            k = int(source[k - lo]) + int(out_steps[j])
+    return np.array(stops[::-1], dtype=np.int64)
+
+
+def _exact_plan(stops, chainage_fuel, out_fuel, back_fuel, prices, end_route_fuel, start_fuel, end_fuel,
+                buffer_fuel, tank_capacity):
+    """Exact cheapest purchases at a fixed set of stops, via the fixed-route greedy.
+
+    Node 0 is the route start (priced above every stop, so the greedy only buys
+    there if it must); node i + 1 is stop i; the last node is the destination.
+    """
+    node_prices = np.concatenate(([prices.max() + 1.0], prices[stops], [prices.max() + 1.0]))
+    node_fuel = np.concatenate(([0.0], chainage_fuel[stops], [end_route_fuel]))
+    segments = np.diff(node_fuel)
+    segments[1:] += back_fuel[stops]
+    segments[:-1] += out_fuel[stops]
+    return solve_refuelling(node_prices, segments, start_fuel, end_fuel, buffer_fuel, tank_capacity)
+
+
+def solve_detour_refuelling(chainage, detour_km, prices, route_km, mileage, start_fuel, end_fuel, buffer_fuel,
+                            tank_capacity, stop_cost=0.0, detour_cost_per_km=0.0, fuel_step=DEFAULT_FUEL_STEP):
+    """Cheapest plan over candidate stations along a route.
+
+    chainage: km along the route of each candidate, in route order (e.g. from
+    StationIndex.corridor).  detour_km: extra km to visit each (out and back).
+    route_km: length of the route; the plan starts at 0 and ends there.
+    The objective is fuel cost + stop_cost per stop + detour_cost_per_km per
+    detour km; returns a DetourPlan with one entry per candidate, where
+    fuel_level is the fuel on the road as the truck passes the candidate.
+    """
+    chainage = np.asarray(chainage, dtype=float)
+    detour_km = np.asarray(detour_km, dtype=float)
+    prices = np.asarray(prices, dtype=float)
+    n = len(chainage)
+    if not len(detour_km) == len(prices) == n:
+        raise ValueError(f"Expected {n} detour distances and prices, got {len(detour_km)} and {len(prices)}")
+    if np.any(np.diff(chainage) < 0):
+        raise ValueError("Candidates must be in route order (non-decreasing chainage)")
+
+    end_level = buffer_fuel if end_fuel is None else max(buffer_fuel, end_fuel)
+    route_fuel = chainage / mileage
+    end_route_fuel = route_km / mileage
+    # Half the detour is driven before buying, half after
+    out_fuel = back_fuel = detour_km / 2 / mileage
+    usable = np.isfinite(prices)
+    candidates = np.flatnonzero(usable)
+
+    def plan(purchase, status):
+        # Detour fuel is charged where the plan stops, by the same cut-off as `stop`
+        detour_fuel = detour_km / mileage * (purchase > MIN_PURCHASE_LITRES)
+        levels = start_fuel - route_fuel + np.concatenate(([0.0], np.cumsum(purchase - detour_fuel)[:-1]))
+        return DetourPlan(purchase=purchase, fuel_level=levels, prices=prices, status=status,
+                          solver="detour-dp", chainage=chainage, detour_km=detour_km,
+                          stop_cost=float(stop_cost), detour_cost_per_km=float(detour_cost_per_km))
+
+    if not buffer_fuel <= start_fuel <= tank_capacity:
+        return plan(np.zeros(n), STATUS_INFEASIBLE)
+    stops = _dp_stops(route_fuel[candidates], out_fuel[candidates], back_fuel[candidates], prices[candidates],
+                      stop_cost + detour_cost_per_km * detour_km[candidates], end_route_fuel, start_fuel,
+                      end_level, buffer_fuel, tank_capacity, fuel_step)
+    if stops is None:
+        return plan(np.zeros(n), STATUS_INFEASIBLE)
+    stops = candidates[stops]
+
+    while True:
+        exact = _exact_plan(stops, route_fuel, out_fuel, back_fuel, prices, end_route_fuel, start_fuel,
+                            end_fuel, buffer_fuel, tank_capacity)
+        bought = exact.purchase[1:-1]
+        empty = bought <= MIN_PURCHASE_LITRES
+        if not empty.any() or not exact.is_optimal:
+            break
+        stops = stops[~empty]
+    if exact.is_optimal and exact.purchase[0] > MIN_PURCHASE_LITRES:
+        # The route start is no station; a plan that needs fuel there has nowhere to buy it
+        return plan(np.zeros(n), STATUS_INFEASIBLE)
+    purchase = np.zeros(n)
+    if exact.is_optimal:
+        purchase[stops] = bought
+    return plan(purchase, exact.status)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the detour-aware DP on synthetic station candidates.")
+    parser.add_argument('--candidates', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--route-km', type=float, default=1500.0)
+    parser.add_argument('--stop-cost', type=float, default=200.0)
+    parser.add_argument('--detour-cost', type=float, default=10.0, help="₹ per detour km")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for count in args.candidates:
+        chainage = np.sort(rng.uniform(0, args.route_km, count))
+        detour_km = 2 * rng.exponential(1.5, count)
+        prices = 88 + 4 * np.sin(chainage / 150) + rng.normal(0, 0.6, count)
+        started = time.perf_counter()
+        result = solve_detour_refuelling(chainage, detour_km, prices, args.route_km, mileage=4.0, start_fuel=200,
+                                         end_fuel=50, buffer_fuel=30, tank_capacity=300, stop_cost=args.stop_cost,
+                                         detour_cost_per_km=args.detour_cost)
+        print(f"  {count} candidates: {time.perf_counter() - started:.3f} s, {result.status}, "
+              f"{int(result.stop.sum())} stops, {result.detour_total_km:.1f} detour km, "
+              f"fuel ₹{result.total_cost:.2f} + stops/detours ₹{result.extra_cost:.2f}")
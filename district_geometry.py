@@ -0,0 +1,262 @@
+"""District polygons decoded from the India districts TopoJSON, as flat arrays.
+
+All rings of all districts live in one (N, 2) lon/lat vertex array with ring
+offsets, grouped by district, so that point-in-polygon tests run as NumPy
+operations over a district's edges instead of Python geometry objects.
+"""
+import json
+
+import numpy as np
+
+DISTRICTS_FILE_PATH = 'india-districts.json'
+GEOJSON_DISTRICT_PROPERTY = 'district'
+GEOJSON_STATE_PROPERTY = 'st_nm'
+
+# Points x edges evaluated per chunk in point-in-polygon tests
+PIP_CHUNK = 2_000_000
+
+
+def decode_arcs(topology):
+    """Absolute lon/lat coordinates of every TopoJSON arc."""
+    arcs = topology['arcs']
+    lengths = np.array([len(arc) for arc in arcs])
+    points = np.array([point[:2] for arc in arcs for point in arc], dtype=float)
+    transform = topology.get('transform')
+    if transform:
+        # Quantized arcs are delta-encoded: cumulative sum within each arc
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        totals = np.cumsum(points, axis=0)
+        base = np.repeat(totals[starts] - points[starts], lengths, axis=0)
+        points = (totals - base) * transform['scale'] + transform['translate']
+    return np.split(points, np.cumsum(lengths)[:-1])
+
+
+def simplify_line(points, tolerance):
+    """Douglas-Peucker simplification of one (n, 2) line; endpoints are kept."""
+    n = len(points)
+    if tolerance <= 0 or n <= 2:
+        return points
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b <= a + 1:
+            continue
+        inner = points[a + 1:b]
+        direction = points[b] - points[a]
+        length = np.hypot(*direction)
+        offset = inner - points[a]
+        if length == 0:
+            distance = np.hypot(offset[:, 0], offset[:, 1])
+        else:
+            distance = np.abs(direction[0] * offset[:, 1] - direction[1] * offset[:, 0]) / length
+        i = int(np.argmax(distance))
+        if distance[i] > tolerance:
+            keep[a + 1 + i] = True
+            stack.append((a, a + 1 + i))
+            stack.append((a + 1 + i, b))
+    return points[keep]
+
+
+def _ring_coords(arc_refs, arcs):
+    parts = []
+    for k, ref in enumerate(arc_refs):
+        arc = arcs[ref] if ref >= 0 else arcs[~ref][::-1]
+        parts.append(arc if k == 0 else arc[1:])
+    return np.concatenate(parts)
+
+
+def districts_in_bbox(bbox, box):
+    """Rows of `bbox` (one min lon, min lat, max lon, max lat per district) that overlap `box`."""
+    min_x, min_y, max_x, max_y = box
+    overlaps = (bbox[:, 0] <= max_x) & (bbox[:, 2] >= min_x) & (bbox[:, 1] <= max_y) & (bbox[:, 3] >= min_y)
+    return np.flatnonzero(overlaps)
+
+
+def district_name_index(names):
+    """Case-insensitive name -> district indices, for `lookup_districts`."""
+    index = {}
+    for i, name in enumerate(names):
+        index.setdefault(str(name).strip().lower(), []).append(i)
+    return index
+
+
+def lookup_districts(name_index, states, name, state=None):
+    """Indices of districts with this name (and state, if given), case-insensitive."""
+    matches = name_index.get(str(name).strip().lower(), [])
+    if state is not None:
+        state = str(state).strip().lower()
+        matches = [i for i in matches if str(states[i]).strip().lower() == state]
+    return list(matches)
+
+
+class DistrictPolygons:
+    """Every district's rings (outer and holes) in flat arrays.
+
+    xy: (N, 2) lon/lat vertices; each ring is closed (first == last vertex).
+    ring_offsets: (R + 1,) start of each ring in xy.
+    district_rings: (D + 1,) start of each district's rings in ring_offsets.
+    """
+
+    def __init__(self, names, states, properties, xy, ring_offsets, district_rings):
+        self.names = np.asarray(names, dtype=object)
+        self.states = np.asarray(states, dtype=object)
+        self.properties = properties
+        self.xy = np.asarray(xy, dtype=float)
+        self.ring_offsets = np.asarray(ring_offsets, dtype=np.int64)
+        self.district_rings = np.asarray(district_rings, dtype=np.int64)
+        self._bbox = None
+        self._centroids = None
+        self._name_index = None
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_topojson(cls, path=DISTRICTS_FILE_PATH, tolerance=0.0):
+        with open(path, 'r', encoding='utf-8') as f:
+            topology = json.load(f)
+        if topology.get('type', '').lower() != 'topology' or not topology.get('objects'):
+            raise ValueError(f"'{path}' is not a TopoJSON topology")
+        return cls.from_topology(topology, tolerance)
+
+    @classmethod
+    def from_topology(cls, topology, tolerance=0.0):
+        """Decode a parsed TopoJSON topology.  A positive tolerance (degrees)
+        simplifies the shared arcs before rings are assembled, so neighbouring
+        districts stay gap-free; rings that would collapse are kept unsimplified."""
+        full_arcs = decode_arcs(topology)
+        arcs = [simplify_line(arc, tolerance) for arc in full_arcs] if tolerance > 0 else full_arcs
+        object_key = list(topology['objects'].keys())[0]
+
+        names, states, properties, rings, district_rings = [], [], [], [], [0]
+        for geometry in topology['objects'][object_key]['geometries']:
+            if geometry['type'] == 'Polygon':
+                polygons = [geometry['arcs']]
+            elif geometry['type'] == 'MultiPolygon':
+                polygons = geometry['arcs']
+            else:
+                continue
+            props = geometry.get('properties', {})
+            names.append(props.get(GEOJSON_DISTRICT_PROPERTY))
+            states.append(props.get(GEOJSON_STATE_PROPERTY))
+            properties.append(props)
+            for polygon in polygons:
+                for ring in polygon:
+                    coords = _ring_coords(ring, arcs)
+                    rings.append(coords if len(coords) >= 4 else _ring_coords(ring, full_arcs))
+            district_rings.append(len(rings))
+
+        ring_offsets = np.concatenate(([0], np.cumsum([len(ring) for ring in rings])))
+        return cls(names, states, properties, np.concatenate(rings), ring_offsets, district_rings)
+
+    def subset(self, districts):
+        """DistrictPolygons holding only the given district indices, in that order."""
+        districts = np.asarray(districts, dtype=np.int64)
+        ring_counts = self.district_rings[districts + 1] - self.district_rings[districts]
+        rings = np.concatenate([np.arange(self.district_rings[d], self.district_rings[d + 1]) for d in districts]) \
+            if len(districts) else np.zeros(0, dtype=np.int64)
+        lengths = self.ring_offsets[rings + 1] - self.ring_offsets[rings]
+        xy = np.concatenate([self.xy[self.ring_offsets[r]:self.ring_offsets[r + 1]] for r in rings]) \
+            if len(rings) else np.zeros((0, 2))
+        return DistrictPolygons(self.names[districts], self.states[districts],
+                                [self.properties[d] for d in districts], xy,
+                                np.concatenate(([0], np.cumsum(lengths))),
+                                np.concatenate(([0], np.cumsum(ring_counts))))
+
+    def vertex_range(self, district):
+        """Slice of xy holding all rings of one district."""
+        first, last = self.district_rings[district], self.district_rings[district + 1]
+        return slice(self.ring_offsets[first], self.ring_offsets[last])
+
+    @property
+    def bbox(self):
+        """(D, 4) array of min lon, min lat, max lon, max lat."""
+        if self._bbox is None:
+            starts = self.ring_offsets[self.district_rings[:-1]]
+            self._bbox = np.column_stack((np.minimum.reduceat(self.xy[:, 0], starts),
+                                          np.minimum.reduceat(self.xy[:, 1], starts),
+                                          np.maximum.reduceat(self.xy[:, 0], starts),
+                                          np.maximum.reduceat(self.xy[:, 1], starts)))
+        return self._bbox
+
+    @property
+    def centroids(self):
+        """(D, 2) area centroids (lon, lat) in the lon/lat plane, holes subtracted."""
+        if self._centroids is None:
+            x0, y0 = self.xy[:-1, 0], self.xy[:-1, 1]
+            x1, y1 = self.xy[1:, 0], self.xy[1:, 1]
+            cross = x0 * y1 - x1 * y0
+            # Drop the pairs that straddle two rings
+            cross[self.ring_offsets[1:-1] - 1] = 0.0
+            vertex_district = np.repeat(np.arange(len(self)), np.diff(self.ring_offsets[self.district_rings]))[:-1]
+            area2 = np.bincount(vertex_district, cross, minlength=len(self))
+            cx = np.bincount(vertex_district, (x0 + x1) * cross, minlength=len(self)) / (3 * area2)
+            cy = np.bincount(vertex_district, (y0 + y1) * cross, minlength=len(self)) / (3 * area2)
+            self._centroids = np.column_stack((cx, cy))
+        return self._centroids
+
+    def edges(self, district):
+        """(x0, y0, x1, y1) arrays of a district's ring edges."""
+        vertices = self.vertex_range(district)
+        first, last = self.district_rings[district], self.district_rings[district + 1]
+        xy = self.xy[vertices]
+        valid = np.ones(len(xy) - 1, dtype=bool)
+        valid[self.ring_offsets[first + 1:last] - vertices.start - 1] = False
+        start, end = xy[:-1][valid], xy[1:][valid]
+        return start[:, 0], start[:, 1], end[:, 0], end[:, 1]
+
+    def contains(self, district, lon, lat):
+        """Even-odd point-in-polygon test of many points against one district."""
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        x0, y0, x1, y1 = self.edges(district)
+        inside = np.zeros(len(lon), dtype=bool)
+        step = max(1, PIP_CHUNK // max(len(x0), 1))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for lo in range(0, len(lon), step):
+                px, py = lon[lo:lo + step, None], lat[lo:lo + step, None]
+                straddles = (y0 > py) != (y1 > py)
+                x_cross = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+                inside[lo:lo + step] = np.count_nonzero(straddles & (px < x_cross), axis=1) % 2 == 1
+        return inside
+
+    def assign_points(self, lon, lat, candidates=None):
+        """Index of the district containing each point, or -1.
+
+        Points are sorted by longitude once; each district's bounding box then
+        selects its candidate points with two binary searches before the exact
+        point-in-polygon test.
+        """
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        result = np.full(len(lon), -1, dtype=np.int64)
+        if len(lon) == 0:
+            return result
+        order = np.argsort(lon, kind='stable')
+        sorted_lon = lon[order]
+        bbox = self.bbox
+        if candidates is None:
+            candidates = self.districts_in_bbox((lon.min(), lat.min(), lon.max(), lat.max()))
+        for district in candidates:
+            min_x, min_y, max_x, max_y = bbox[district]
+            lo = np.searchsorted(sorted_lon, min_x, side='left')
+            hi = np.searchsorted(sorted_lon, max_x, side='right')
+            if lo >= hi:
+                continue
+            points = order[lo:hi]
+            points = points[(lat[points] >= min_y) & (lat[points] <= max_y) & (result[points] < 0)]
+            if len(points):
+                result[points[self.contains(district, lon[points], lat[points])]] = district
+        return result
+
+    def districts_in_bbox(self, box):
+        """Districts whose bounding box overlaps (min lon, min lat, max lon, max lat)."""
+        return districts_in_bbox(self.bbox, box)
+
+    def lookup(self, name, state=None):
+        """Indices of districts with this name (and state, if given), case-insensitive."""
+        if self._name_index is None:
+            self._name_index = district_name_index(self.names)
+        return lookup_districts(self._name_index, self.states, name, state)
@@ -0,0 +1,280 @@
+"""Match price-CSV city names to GeoJSON districts, once, and remember the answer.
+
+    python district_matcher.py                  # match new CSV cities, print the low-confidence ones
+
+The CSV spells places its own way ('Gulbarga', 'Chhindware', 'East Imphal',
+'Ambedkarnagar') and has no state column, so an exact lower-case join misses
+about 130 of its 697 cities.  Matching runs in passes over a blocked index of
+the ~730 district names:
+
+    exact      same normalised name (accents, punctuation, 'district' removed)
+    alias      a known rename / translation in DISTRICT_ALIASES
+    compact    same name ignoring spaces or word order
+    words      one name's words all start words of the other ('Kaimur' / 'Kaimur Bhabhua')
+    phonetic   same consonant skeleton after transliteration folding (aa/a, bh/b, v/w...)
+    fuzzy      best SequenceMatcher ratio among districts sharing character trigrams
+
+Only districts sharing trigrams or the phonetic key with a name are scored,
+and a district already claimed by an exact/alias match is not handed to a
+fuzzy one.  A name that several states use ('Aurangabad', 'Bilaspur') maps to
+all of them unless a state hint ('City, State' or a State column) picks one
+by st_nm.
+
+Results go to DISTRICT_MATCHES_PATH with a confidence per city; later runs
+reuse them and only match names they have not seen.  Entries edited to
+"method": "manual" are kept even when the district file changes.
+"""
+import difflib
+import json
+import os
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from district_geometry import DISTRICTS_FILE_PATH
+from district_store import open_store
+from plan_cache import file_fingerprint
+from price_store import price_key
+
+DISTRICT_MATCHES_PATH = 'district_matches.json'
+MATCHES_VERSION = 1
+
+# Below this a city is recorded as unmatched (with its best candidate, for review)
+MIN_CONFIDENCE = 0.8
+PHONETIC_CONFIDENCE = 0.9
+COMPACT_CONFIDENCE = 0.95
+WORDS_CONFIDENCE = 0.85
+# Candidates (by shared trigrams) scored per name
+MAX_CANDIDATES = 12
+
+# Renamed or translated districts that no spelling similarity would find
+DISTRICT_ALIASES = {
+    'allahabad': 'prayagraj', 'bangalore': 'bengaluru', 'bangalore rural': 'bengaluru rural',
+    'belgaum': 'belagavi', 'bellary': 'ballari', 'gulbarga': 'kalaburagi', 'gurgaon': 'gurugram',
+    'mysore': 'mysuru', 'shimoga': 'shivamogga', 'tumkur': 'tumakuru', 'chikmagalur': 'chikkamagaluru',
+    'khandwa': 'east nimar', 'khargone': 'west nimar', 'kawardha': 'kabeerdham', 'mewat': 'nuh',
+    'greater mumbai': 'mumbai suburban', 'mumbai city': 'mumbai', 'kashi ram nagar': 'kasganj',
+    'kanpur urban': 'kanpur nagar', 'kanpur rural': 'kanpur dehat', 'sant ravi nagar': 'bhadohi',
+    'paschim medinipur': 'medinipur west', 'purba medinipur': 'medinipur east',
+    'east singhbhum': 'purbi singhbhum', 'west singhbhum': 'pashchimi singhbhum',
+    'tuticorin': 'thoothukkudi', 'pondicherry': 'puducherry', 'cuddapah': 'ysr', 'sonapur': 'subarnapur',
+    'kutch': 'kachchh', 'deogarh': 'debagarh', 'maunathbhanjan': 'mau',
+    'shd bhagat singh ngr': 'shahid bhagat singh nagar',
+}
+
+_DROP_WORDS = {'district', 'dist', 'the'}
+# Transliteration variants folded before the phonetic key is taken (order matters)
+_PHONETIC_FOLDS = [('chh', 'c'), ('ksh', 'x'), ('ck', 'k'), ('aa', 'a'), ('ee', 'i'), ('oo', 'u'), ('ph', 'f'), ('bh', 'b'),
+                   ('dh', 'd'), ('th', 't'), ('kh', 'k'), ('gh', 'g'), ('ch', 'c'), ('sh', 's'), ('jh', 'j'),
+                   ('w', 'v'), ('z', 'j'), ('q', 'k'), ('y', 'i')]
+
+
+def normalize_name(name):
+    """Lower-case ASCII words: accents, punctuation and filler words removed."""
+    text = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode().lower()
+    text = re.sub(r'[^a-z0-9]+', ' ', text.replace('&', ' and '))
+    words = [word for word in text.split() if word not in _DROP_WORDS]
+    return ' '.join(words)
+
+
+def _compact(name):
+    return name.replace(' ', '')
+
+
+def _sorted_words(name):
+    return ''.join(sorted(name.split()))
+
+
+def phonetic_key(name):
+    """Consonant skeleton of a normalised name after folding common transliteration variants."""
+    text = _compact(name)
+    for variant, replacement in _PHONETIC_FOLDS:
+        text = text.replace(variant, replacement)
+    if not text:
+        return ''
+    skeleton = text[0] + re.sub(r'[aeiouh]', '', text[1:])
+    return re.sub(r'(.)\1+', r'\1', skeleton)
+
+
+def _trigrams(name):
+    padded = f"#{_compact(name)}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _words_contained(name, other):
+    """True if every word of the shorter name starts a distinct word of the longer one."""
+    short, long = sorted((name.split(), other.split()), key=len)
+    remaining = list(long)
+    for word in short:
+        hit = next((w for w in remaining if w == word or (len(word) >= 4 and w.startswith(word))), None)
+        if hit is None:
+            return False
+        remaining.remove(hit)
+    return True
+
+
+def _split_state(city):
+    """('Aurangabad', 'maharashtra') for 'Aurangabad, Maharashtra'; (city, None) otherwise."""
+    name, _, state = str(city).partition(',')
+    return (name, normalize_name(state)) if state.strip() else (str(city), None)
+
+
+class DistrictMatcher:
+    """Blocked index over district names (with st_nm) for matching free-text city names."""
+
+    def __init__(self, names, states):
+        self.names = list(names)
+        self.states = list(states)
+        self.normalized = [normalize_name(name) for name in self.names]
+        self.state_keys = [normalize_name(state) for state in self.states]
+        self.index = {(name, state): i for i, (name, state) in enumerate(zip(self.names, self.states))}
+        self.by_name, self.by_compact, self.by_phonetic, self.by_trigram = {}, {}, {}, {}
+        for i, name in enumerate(self.normalized):
+            self.by_name.setdefault(name, []).append(i)
+            for key in {_compact(name), _sorted_words(name)}:
+                self.by_compact.setdefault(key, []).append(i)
+            self.by_phonetic.setdefault(phonetic_key(name), []).append(i)
+            for trigram in _trigrams(name):
+                self.by_trigram.setdefault(trigram, []).append(i)
+
+    @classmethod
+    def from_store(cls, districts_path=DISTRICTS_FILE_PATH):
+        store = open_store(districts_path)
+        return cls(store.meta['names'], store.meta['states'])
+
+    def _pick_state(self, indices, state):
+        """Restrict same-name districts to the hinted state, when it is one of theirs."""
+        if state:
+            in_state = [i for i in indices if self.state_keys[i] == state]
+            if in_state:
+                return in_state
+        return indices
+
+    def _entry(self, city, indices, confidence, method, state):
+        indices = self._pick_state(sorted(set(indices)), state)
+        return {'city': city, 'districts': [[self.names[i], self.states[i]] for i in indices],
+                'confidence': round(float(confidence), 3), 'method': method}
+
+    def _exact(self, city, name, state):
+        alias = DISTRICT_ALIASES.get(name)
+        for method, key, table in (('exact', name, self.by_name),
+                                   ('alias', alias, self.by_name),
+                                   ('alias', alias and _compact(alias), self.by_compact),
+                                   ('compact', _compact(name), self.by_compact),
+                                   ('compact', _sorted_words(name), self.by_compact)):
+            if key and key in table:
+                return self._entry(city, table[key], COMPACT_CONFIDENCE if method == 'compact' else 1.0,
+                                   method, state)
+        return None
+
+    def _fuzzy(self, city, name, state, claimed):
+        shared = {}
+        for trigram in _trigrams(name):
+            for i in self.by_trigram.get(trigram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        candidates = set(sorted(shared, key=shared.get, reverse=True)[:MAX_CANDIDATES])
+        phonetic = set(self.by_phonetic.get(phonetic_key(name), ()))
+        candidates = (candidates | phonetic) - claimed
+        if state:
+            candidates = set(self._pick_state(list(candidates), state)) or candidates
+        best, best_score, best_method = [], 0.0, 'unmatched'
+        for i in candidates:
+            candidate = self.normalized[i]
+            score = max(difflib.SequenceMatcher(None, _compact(name), _compact(candidate)).ratio(),
+                        difflib.SequenceMatcher(None, _sorted_words(name), _sorted_words(candidate)).ratio())
+            method = 'fuzzy'
+            if i in phonetic and score < PHONETIC_CONFIDENCE:
+                score, method = PHONETIC_CONFIDENCE, 'phonetic'
+            elif score < WORDS_CONFIDENCE and _words_contained(name, candidate):
+                score, method = WORDS_CONFIDENCE, 'words'
+            if score > best_score + 1e-9:
+                best, best_score, best_method = [i], score, method
+            elif abs(score - best_score) <= 1e-9 and self.normalized[i] == self.normalized[best[0]]:
+                best.append(i)  # same name in another state
+        if best_score < MIN_CONFIDENCE:
+            entry = self._entry(city, [], best_score, 'unmatched', state)
+            entry['candidate'] = [[self.names[i], self.states[i]] for i in best]
+            return entry
+        return self._entry(city, best, best_score, best_method, state)
+
+    def match_all(self, cities, states=None):
+        """{city key: entry} for city names (optionally 'City, State' or with a states list)."""
+        states = [None] * len(cities) if states is None else [normalize_name(s) if s else None for s in states]
+        queries = []
+        for city, state in zip(cities, states):
+            name, name_state = _split_state(city)
+            queries.append((str(city), normalize_name(name), state or name_state))
+
+        entries, pending, claimed = {}, [], set()
+        for city, name, state in queries:
+            entry = self._exact(city, name, state)
+            if entry is None:
+                pending.append((city, name, state))
+                continue
+            entries[price_key([city])[0]] = entry
+            claimed.update(self.index[tuple(district)] for district in entry['districts'])
+        for city, name, state in pending:
+            entries[price_key([city])[0]] = self._fuzzy(city, name, state, claimed)
+        return entries
+
+
+def load_matches(path=DISTRICT_MATCHES_PATH):
+    """{city key: entry} persisted by resolve_cities (empty if none)."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('matches', {})
+
+
+def resolve_cities(cities, states=None, districts_path=DISTRICTS_FILE_PATH, path=DISTRICT_MATCHES_PATH):
+    """{city key: entry} for the given cities, matching only names not already in `path`."""
+    districts_fingerprint = file_fingerprint(districts_path)
+    saved = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    matches = saved.get('matches', {})
+    if saved.get('districts_fingerprint') != districts_fingerprint or saved.get('version') != MATCHES_VERSION:
+        matches = {key: entry for key, entry in matches.items() if entry.get('method') == 'manual'}
+
+    cities = list(cities)
+    keys = price_key(cities)
+    new = [i for i, key in enumerate(keys) if key not in matches]
+    new = list({keys[i]: i for i in new}.values())
+    if new:
+        matcher = DistrictMatcher.from_store(districts_path)
+        matches.update(matcher.match_all([cities[i] for i in new],
+                                         None if states is None else [states[i] for i in new]))
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MATCHES_VERSION, 'districts_fingerprint': districts_fingerprint,
+                       'matches': dict(sorted(matches.items()))}, f, ensure_ascii=False, indent=1)
+    methods = pd.Series([matches[key]['method'] for key in set(keys)]).value_counts()
+    print(f"  District matches: {len(set(keys)) - len(new)} reused, {len(new)} matched now "
+          f"({', '.join(f'{count} {method}' for method, count in methods.items())})")
+    return {key: matches[key] for key in keys}
+
+
+def district_price_keys(districts, states, matches):
+    """Price-store key of each (district, state): the matched CSV city's key, or the
+    district's own normalised name where no city matched it."""
+    by_district = {}
+    # Higher-confidence matches win when two cities land on the same district
+    for key, entry in sorted(matches.items(), key=lambda item: item[1]['confidence']):
+        for district, state in entry['districts']:
+            by_district[(district, state)] = key
+    fallback = price_key(districts)
+    return np.array([by_district.get((district, state), own)
+                     for district, state, own in zip(districts, states, fallback)], dtype=object)
+
+
+if __name__ == '__main__':
+    from price_store import SEED_CSV_PATH, CSV_CITY_COLUMN
+    cities_df = pd.read_csv(SEED_CSV_PATH, encoding='utf-8-sig')
+    resolved = resolve_cities(cities_df[CSV_CITY_COLUMN].astype(str).tolist())
+    for entry in sorted(resolved.values(), key=lambda e: e['confidence']):
+        if entry['method'] not in ('exact', 'alias', 'manual') and entry['confidence'] < 0.95:
+            target = entry['districts'] or entry.get('candidate')
+            print(f"  {entry['confidence']:.2f} {entry['method']:9} {entry['city']} -> "
+                  f"{', '.join(f'{d} ({s})' for d, s in target) if target else '-'}")
@@ -0,0 +1,211 @@
+"""Compact binary store of the district boundaries, built once from the TopoJSON.
+
+    python district_store.py            # (re)build .district_store/ from india-districts.json
+
+The store is a directory of .npy arrays plus a small meta.json:
+
+    meta.json               names, states, properties, quantization, levels, source hash
+    bbox.npy, centroids.npy (D, 4) / (D, 2) float64, from the full-resolution rings
+    district_polygons.npy   (D + 1,) start of each district's polygons
+    polygon_rings.npy       (P + 1,) start of each polygon's rings (outer ring first)
+    xy_<level>.npy          (N, 2) int32 lon/lat quantized to QUANTUM degrees
+    rings_<level>.npy       (R + 1,) start of each ring in xy_<level>
+
+Level 0 is the full geometry; higher levels are simplified with the tolerances
+in LEVEL_TOLERANCES (shared arcs are simplified once, so neighbours stay
+gap-free).  Arrays are memory-mapped, so opening the store reads only meta.json
+and districts are dequantized on demand, by bounding box or name.  The store is
+rebuilt automatically when the source file changes.
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from district_geometry import (DISTRICTS_FILE_PATH, DistrictPolygons, district_name_index, districts_in_bbox,
+                               lookup_districts)
+from plan_cache import file_fingerprint
+
+STORE_DIR = '.district_store'
+STORE_VERSION = 1
+
+# Douglas-Peucker tolerance (degrees) of each simplification level
+LEVEL_TOLERANCES = (0.0, 0.001, 0.005, 0.02)
+# Level embedded in the country-wide HTML maps
+MAP_LEVEL = 3
+# Quantization step in degrees (~0.1 m); int32 covers +/- 2000 degrees
+QUANTUM = 1e-6
+# Decimal places written to GeoJSON output
+GEOJSON_PRECISION = 5
+
+
+def _polygon_ring_counts(topology):
+    """Rings per polygon and polygons per district, in DistrictPolygons order."""
+    object_key = list(topology['objects'].keys())[0]
+    ring_counts, polygon_counts = [], []
+    for geometry in topology['objects'][object_key]['geometries']:
+        if geometry['type'] == 'Polygon':
+            polygons = [geometry['arcs']]
+        elif geometry['type'] == 'MultiPolygon':
+            polygons = geometry['arcs']
+        else:
+            continue
+        ring_counts.extend(len(polygon) for polygon in polygons)
+        polygon_counts.append(len(polygons))
+    return ring_counts, polygon_counts
+
+
+def build_store(source=DISTRICTS_FILE_PATH, store_dir=STORE_DIR, tolerances=LEVEL_TOLERANCES):
+    """Convert the district TopoJSON into a store directory."""
+    started = time.perf_counter()
+    with open(source, 'r', encoding='utf-8') as f:
+        topology = json.load(f)
+    if topology.get('type', '').lower() != 'topology' or not topology.get('objects'):
+        raise ValueError(f"'{source}' is not a TopoJSON topology")
+
+    os.makedirs(store_dir, exist_ok=True)
+    ring_counts, polygon_counts = _polygon_ring_counts(topology)
+    translate = None
+    for level, tolerance in enumerate(tolerances):
+        polygons = DistrictPolygons.from_topology(topology, tolerance)
+        if level == 0:
+            translate = np.floor(polygons.xy.min(axis=0))
+            np.save(os.path.join(store_dir, 'bbox.npy'), polygons.bbox)
+            np.save(os.path.join(store_dir, 'centroids.npy'), polygons.centroids)
+            np.save(os.path.join(store_dir, 'district_polygons.npy'),
+                    np.concatenate(([0], np.cumsum(polygon_counts))).astype(np.int64))
+            np.save(os.path.join(store_dir, 'polygon_rings.npy'),
+                    np.concatenate(([0], np.cumsum(ring_counts))).astype(np.int64))
+            meta = {'names': polygons.names.tolist(), 'states': polygons.states.tolist(),
+                    'properties': polygons.properties}
+        quantized = np.rint((polygons.xy - translate) / QUANTUM).astype(np.int32)
+        np.save(os.path.join(store_dir, f'xy_{level}.npy'), quantized)
+        np.save(os.path.join(store_dir, f'rings_{level}.npy'), polygons.ring_offsets)
+        print(f"  Level {level} (tolerance {tolerance} deg): {len(quantized)} vertices")
+
+    meta.update({'version': STORE_VERSION, 'source_fingerprint': file_fingerprint(source),
+                 'quantum': QUANTUM, 'translate': translate.tolist(), 'levels': list(tolerances)})
+    # meta.json last: a store without it is incomplete and gets rebuilt
+    with open(os.path.join(store_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    print(f"  District store written to {store_dir} in {time.perf_counter() - started:.2f} s")
+
+
+class DistrictStore:
+    """Read-only, memory-mapped view of a store directory."""
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.names = np.asarray(self.meta['names'], dtype=object)
+        self.states = np.asarray(self.meta['states'], dtype=object)
+        self.levels = self.meta['levels']
+        self._translate = np.asarray(self.meta['translate'], dtype=float)
+        self._arrays = {}
+        self._name_index = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def _array(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.store_dir, f'{name}.npy'), mmap_mode='r')
+        return self._arrays[name]
+
+    @property
+    def bbox(self):
+        return self._array('bbox')
+
+    @property
+    def centroids(self):
+        return self._array('centroids')
+
+    def _district_rings(self):
+        return np.asarray(self._array('polygon_rings'))[np.asarray(self._array('district_polygons'))]
+
+    def districts_in_bbox(self, box):
+        """Districts whose bounding box overlaps (min lon, min lat, max lon, max lat)."""
+        return districts_in_bbox(self.bbox, box)
+
+    def lookup(self, name, state=None):
+        """Indices of districts with this name (and state, if given), case-insensitive."""
+        if self._name_index is None:
+            self._name_index = district_name_index(self.names)
+        return lookup_districts(self._name_index, self.states, name, state)
+
+    def _rings(self, level, districts):
+        """Dequantized vertices and ring offsets of the given districts' rings."""
+        xy, ring_offsets = self._array(f'xy_{level}'), self._array(f'rings_{level}')
+        district_rings = self._district_rings()
+        rings = np.concatenate([np.arange(district_rings[d], district_rings[d + 1]) for d in districts]) \
+            if len(districts) else np.zeros(0, dtype=np.int64)
+        starts, ends = ring_offsets[rings], ring_offsets[rings + 1]
+        quantized = np.concatenate([xy[s:e] for s, e in zip(starts, ends)]) if len(rings) \
+            else np.zeros((0, 2), dtype=np.int32)
+        offsets = np.concatenate(([0], np.cumsum(ends - starts)))
+        return quantized * self.meta['quantum'] + self._translate, offsets
+
+    def polygons(self, level=0, districts=None):
+        """DistrictPolygons for the given district indices (all by default)."""
+        districts = np.arange(len(self)) if districts is None else np.asarray(districts, dtype=np.int64)
+        xy, ring_offsets = self._rings(level, districts)
+        district_rings = self._district_rings()
+        ring_counts = district_rings[districts + 1] - district_rings[districts]
+        polygons = DistrictPolygons(self.names[districts], self.states[districts],
+                                    [self.meta['properties'][d] for d in districts], xy, ring_offsets,
+                                    np.concatenate(([0], np.cumsum(ring_counts))))
+        # Full-resolution values, so results do not depend on the level or quantization
+        polygons._bbox = np.asarray(self.bbox[districts])
+        polygons._centroids = np.asarray(self.centroids[districts])
+        return polygons
+
+    def geojson(self, level=MAP_LEVEL, districts=None, precision=GEOJSON_PRECISION):
+        """GeoJSON FeatureCollection (dict) of the given districts at one level."""
+        districts = np.arange(len(self)) if districts is None else np.asarray(districts, dtype=np.int64)
+        xy, ring_offsets = self._rings(level, districts)
+        coords = np.round(xy, precision).tolist()
+        district_polygons = np.asarray(self._array('district_polygons'))
+        polygon_rings = np.asarray(self._array('polygon_rings'))
+
+        features, ring = [], 0
+        for d in districts:
+            polygons = []
+            for p in range(district_polygons[d], district_polygons[d + 1]):
+                rings = []
+                for _ in range(polygon_rings[p + 1] - polygon_rings[p]):
+                    rings.append(coords[ring_offsets[ring]:ring_offsets[ring + 1]])
+                    ring += 1
+                polygons.append(rings)
+            geometry = {'type': 'Polygon', 'coordinates': polygons[0]} if len(polygons) == 1 \
+                else {'type': 'MultiPolygon', 'coordinates': polygons}
+            features.append({'type': 'Feature', 'properties': self.meta['properties'][d], 'geometry': geometry})
+        return {'type': 'FeatureCollection', 'features': features}
+
+
+_stores = {}
+
+
+def open_store(source=DISTRICTS_FILE_PATH, store_dir=STORE_DIR):
+    """DistrictStore for a district TopoJSON, building or refreshing it if needed."""
+    fingerprint = file_fingerprint(source)
+    cached = _stores.get(store_dir)
+    if cached and cached.meta['source_fingerprint'] == fingerprint:
+        return cached
+
+    meta_path = os.path.join(store_dir, 'meta.json')
+    store = DistrictStore(store_dir) if os.path.exists(meta_path) else None
+    if store is None or store.meta.get('version') != STORE_VERSION or \
+            (fingerprint is not None and store.meta['source_fingerprint'] != fingerprint):
+        if fingerprint is None:
+            raise FileNotFoundError(source)
+        print(f"--- Building district store from {source} ---")
+        build_store(source, store_dir)
+        store = DistrictStore(store_dir)
+    _stores[store_dir] = store
+    return store
+
+
+if __name__ == '__main__':
+    build_store()
@@ -0,0 +1,132 @@
+"""Batch refuelling plans for every route x vehicle x load x start-fuel combination.
+
+Usage:
+    python fuel_batch.py --start-fuel 100 150 200 250 --output fuel_plans.csv
+
+Every (vehicle, load, start fuel) combination on a route shares the route's
+prices, so they are solved together with fuel_solver.solve_refuelling_batch
+(one vectorised pass per route).  Routes are spread over a process pool when
+there are enough of them to pay for the worker start-up.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from geo_distance import SEGMENT_DISTANCE_COLUMN
+from fuel_solver import MIN_PURCHASE_LITRES, solve_refuelling_batch
+from route_chainage import add_road_chainage
+from vehicles import vehicle_mileage, TANK_CAPACITY
+
+ROUTES_FILE_PATH = 'routes_districts_prices_filled_mean.xlsx'
+
+# Below this many routes a process pool costs more than it saves
+MIN_ROUTES_FOR_POOL = 8
+
+PLAN_COLUMNS = ['Route Name', 'Vehicle', 'Load Status', 'Mileage (km/l)', 'Start Fuel (L)', 'Status',
+                'Total Fuel (L)', 'Total Cost (₹)', 'Stops', 'Stop Plan']
+
+
+def route_arrays(routes_df):
+    """Split the route table into per-route (districts, prices, segment km) arrays,
+    using road kilometres where the route polyline is available."""
+    if SEGMENT_DISTANCE_COLUMN not in routes_df.columns:
+        routes_df = add_road_chainage(routes_df)
+    routes = {}
+    for route_name, route_data in routes_df.groupby('Route Name', sort=False):
+        routes[route_name] = (route_data['Intersected District'].to_numpy(),
+                              route_data['Price'].to_numpy(dtype=float),
+                              route_data[SEGMENT_DISTANCE_COLUMN].to_numpy()[:-1])
+    return routes
+
+
+def vehicle_states(vehicles=None):
+    vehicles = vehicle_mileage if vehicles is None else vehicles
+    return [(vehicle, load, mileage) for vehicle, loads in vehicles.items() for load, mileage in loads.items()]
+
+
+def batch_inputs(distances, states, start_fuels):
+    """Segment fuel and start fuel for every (vehicle state, start fuel) pair on a route, one row per pair."""
+    start_fuels = np.asarray(start_fuels, dtype=float)
+    mileages = np.array([mileage for _, _, mileage in states], dtype=float)
+    segments = np.repeat(distances[None, :] / mileages[:, None], len(start_fuels), axis=0)
+    return segments, np.tile(start_fuels, len(states))
+
+
+def plan_rows(route_name, districts, prices, purchase, feasible, states, start_fuels):
+    """Table rows for a route's batch of plans, in `batch_inputs` order."""
+    costs = purchase @ prices
+    litres = purchase.sum(axis=1)
+    stops = purchase > MIN_PURCHASE_LITRES
+    starts = np.tile(np.asarray(start_fuels, dtype=float), len(states))
+
+    rows = []
+    for k, start in enumerate(starts):
+        vehicle, load, mileage = states[k // len(start_fuels)]
+        stop_idx = np.flatnonzero(stops[k])
+        rows.append((route_name, vehicle, load, mileage, start,
+                     'Optimal' if feasible[k] else 'Infeasible',
+                     litres[k], costs[k], len(stop_idx),
+                     '; '.join(f"{districts[i]} {purchase[k, i]:.1f} L" for i in stop_idx)))
+    return rows
+
+
+def plan_route(route_name, districts, prices, distances, states, start_fuels, end_fuel, buffer_fuel, tank_capacity):
+    """All plans for one route, as a list of table rows."""
+    segments, starts = batch_inputs(distances, states, start_fuels)
+    purchase, _, feasible = solve_refuelling_batch(prices, segments, starts, end_fuel, buffer_fuel, tank_capacity)
+    return plan_rows(route_name, districts, prices, purchase, feasible, states, start_fuels)
+
+
+def _plan_route_task(args):
+    return plan_route(*args)
+
+
+def run_batch(routes_df, start_fuels, end_fuel=None, buffer_fuel=30.0, tank_capacity=TANK_CAPACITY,
+              vehicles=None, workers=None):
+    """Solve every route x vehicle x load x start-fuel plan and return one tidy DataFrame."""
+    states = vehicle_states(vehicles)
+    tasks = [(route_name, districts, prices, distances, states, start_fuels, end_fuel, buffer_fuel, tank_capacity)
+             for route_name, (districts, prices, distances) in route_arrays(routes_df).items()]
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) >= MIN_ROUTES_FOR_POOL:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_plan_route_task, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+    else:
+        results = [_plan_route_task(task) for task in tasks]
+
+    return pd.DataFrame([row for rows in results for row in rows], columns=PLAN_COLUMNS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve refuelling plans for every route, vehicle and load status.")
+    parser.add_argument('--routes', default=ROUTES_FILE_PATH, help="Route/district/price workbook")
+    parser.add_argument('--start-fuel', type=float, nargs='+', default=[200.0], help="Starting fuel levels (L)")
+    parser.add_argument('--end-fuel', type=float, default=50.0, help="Minimum fuel at the destination (L)")
+    parser.add_argument('--buffer-fuel', type=float, default=30.0, help="Minimum fuel at any district (L)")
+    parser.add_argument('--tank-capacity', type=float, default=TANK_CAPACITY)
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument('--output', default='fuel_plans.csv', help="Output .csv or .xlsx")
+    args = parser.parse_args()
+
+    routes_df = pd.read_excel(args.routes)
+    started = time.perf_counter()
+    plans_df = run_batch(routes_df, args.start_fuel, args.end_fuel, args.buffer_fuel, args.tank_capacity,
+                         workers=args.workers)
+    elapsed = time.perf_counter() - started
+    print(f"Solved {len(plans_df)} plans in {elapsed:.3f} s ({len(plans_df) / max(elapsed, 1e-9):.0f} plans/s)")
+    print(f"  Infeasible plans: {(plans_df['Status'] != 'Optimal').sum()}")
+
+    if args.output.endswith('.xlsx'):
+        plans_df.to_excel(args.output, index=False)
+    else:
+        plans_df.to_csv(args.output, index=False, encoding='utf-8')
+    print(f"Plans saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""Matrix-form refuelling LP/MILP with pluggable solver backends.
+
+Same model as app.py / fuel_solver.solve_refuelling_pulp, but the constraint
+matrix is assembled in one go as a sparse CSR array instead of one PuLP
+constraint object per district, so build time scales with the number of
+nonzeros.  Use it when the greedy in fuel_solver is not enough, e.g. with a
+fixed cost per stop, which turns `stop` into real binaries.
+
+Column layout: [purchase (n) | fuel_level (n) | stop (n, only with stop costs)].
+Row layout:    [fuel balance (n) | tank capacity (n) | purchase <= M * stop (n)].
+
+Backends: "highs" (highspy, keeps the model and warm-starts from the previous
+basis/solution), "scipy" (scipy.optimize.milp, HiGHS without warm start) and
+"cbc" (PuLP/CBC built from the matrix rows, warm-started with the previous
+solution).  "auto" picks the first one that is installed.
+"""
+import numpy as np
+from scipy import sparse
+
+from fuel_solver import RefuelPlan, STATUS_INFEASIBLE, STATUS_OPTIMAL, min_levels
+
+BACKENDS = ("highs", "scipy", "cbc")
+
+
+def available_backends():
+    found = []
+    try:
+        import highspy  # noqa: F401
+        found.append("highs")
+    except ImportError:
+        pass
+    try:
+        from scipy.optimize import milp  # noqa: F401
+        found.append("scipy")
+    except ImportError:
+        pass
+    try:
+        import pulp  # noqa: F401
+        found.append("cbc")
+    except ImportError:
+        pass
+    return found
+
+
+class SparseRefuelModel:
+    """Refuelling model for one route and vehicle.
+
+    Prices and start fuel are solve-time inputs; everything that shapes the
+    constraint matrix (segment fuel, buffer, tank, end fuel, stop costs) is
+    fixed at construction.  Re-solving with new prices or start fuel reuses the
+    backend's previous basis where the backend supports it.
+    """
+
+    def __init__(self, fuel_needed_segments, buffer_fuel, tank_capacity, end_fuel=None, stop_cost=0.0,
+                 backend="auto"):
+        self.segments = np.asarray(fuel_needed_segments, dtype=float)
+        self.n = n = len(self.segments) + 1
+        self.buffer_fuel = float(buffer_fuel)
+        self.tank_capacity = float(tank_capacity)
+        self.stop_cost = np.broadcast_to(np.asarray(stop_cost, dtype=float), (n,)).copy()
+        self.with_stops = bool(np.any(self.stop_cost > 0))
+        self.backend = self._pick_backend(backend)
+        self.num_cols = 3 * n if self.with_stops else 2 * n
+
+        self.A, self.row_lower, self.row_upper = self._build_rows()
+
+        self.col_lower = np.zeros(self.num_cols)
+        self.col_upper = np.full(self.num_cols, np.inf)
+        self.col_lower[n:2 * n] = min_levels(n, buffer_fuel, end_fuel)
+        self.col_upper[n:2 * n] = tank_capacity
+        self.integrality = np.zeros(self.num_cols, dtype=np.uint8)
+        if self.with_stops:
+            self.col_upper[2 * n:] = 1.0
+            self.integrality[2 * n:] = 1
+
+        self._highs = None
+        self._pulp = None
+        self._last_solution = None
+
+    def _pick_backend(self, backend):
+        found = available_backends()
+        if backend == "auto":
+            if not found:
+                raise ImportError("No LP backend available; install highspy, scipy or pulp")
+            return found[0]
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS} or 'auto'")
+        if backend not in found:
+            raise ImportError(f"Backend '{backend}' is not installed")
+        return backend
+
+    def _build_rows(self):
+        n = self.n
+        idx = np.arange(n)
+        purchase, level, stop = idx, n + idx, 2 * n + idx
+        later = idx[1:]
+
+        # fuel_level[i] - fuel_level[i-1] - purchase[i-1] = -segment[i-1]; row 0 pins the start fuel
+        rows = [idx, later, later]
+        cols = [level, level[:-1], purchase[:-1]]
+        vals = [np.ones(n), -np.ones(n - 1), -np.ones(n - 1)]
+        # purchase[i] + fuel_level[i] <= tank capacity
+        rows += [n + idx, n + idx]
+        cols += [purchase, level]
+        vals += [np.ones(n), np.ones(n)]
+        num_rows = 2 * n
+        if self.with_stops:
+            # purchase[i] - (tank - buffer) * stop[i] <= 0
+            rows += [2 * n + idx, 2 * n + idx]
+            cols += [purchase, stop]
+            vals += [np.ones(n), np.full(n, -(self.tank_capacity - self.buffer_fuel))]
+            num_rows = 3 * n
+
+        A = sparse.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                              shape=(num_rows, self.num_cols))
+
+        row_lower = np.full(num_rows, -np.inf)
+        row_upper = np.zeros(num_rows)
+        row_lower[1:n] = row_upper[1:n] = -self.segments
+        row_upper[n:2 * n] = self.tank_capacity
+        return A, row_lower, row_upper
+
+    def costs(self, prices):
+        c = np.zeros(self.num_cols)
+        c[:self.n] = prices
+        if self.with_stops:
+            c[2 * self.n:] = self.stop_cost
+        return c
+
+    def solve(self, prices, start_fuel):
+        prices = np.asarray(prices, dtype=float)
+        if len(prices) != self.n:
+            raise ValueError(f"Expected {self.n} prices, got {len(prices)}")
+        self.row_lower[0] = self.row_upper[0] = start_fuel
+        c = self.costs(prices)
+
+        solution = getattr(self, f"_solve_{self.backend}")(c, float(start_fuel))
+        if solution is None:
+            return RefuelPlan(purchase=np.zeros(self.n), fuel_level=np.full(self.n, float(start_fuel)),
+                              prices=prices, status=STATUS_INFEASIBLE, solver=f"sparse-{self.backend}")
+        self._last_solution = solution
+        purchase = np.where(solution[:self.n] > 1e-9, solution[:self.n], 0.0)
+        return RefuelPlan(purchase=purchase, fuel_level=solution[self.n:2 * self.n].copy(), prices=prices,
+                          status=STATUS_OPTIMAL, solver=f"sparse-{self.backend}")
+
+    def _solve_highs(self, c, start_fuel):
+        import highspy
+
+        h = self._highs
+        if h is None:
+            h = highspy.Highs()
+            h.setOptionValue("output_flag", False)
+            inf = highspy.kHighsInf
+            lp = highspy.HighsLp()
+            lp.num_col_ = self.num_cols
+            lp.num_row_ = self.A.shape[0]
+            lp.col_cost_ = c
+            lp.col_lower_ = self.col_lower
+            lp.col_upper_ = np.where(np.isinf(self.col_upper), inf, self.col_upper)
+            lp.row_lower_ = np.where(np.isinf(self.row_lower), -inf, self.row_lower)
+            lp.row_upper_ = self.row_upper
+            lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+            lp.a_matrix_.start_ = self.A.indptr
+            lp.a_matrix_.index_ = self.A.indices
+            lp.a_matrix_.value_ = self.A.data
+            if self.with_stops:
+                lp.integrality_ = [highspy.HighsVarType.kInteger if flag else highspy.HighsVarType.kContinuous
+                                   for flag in self.integrality]
+            h.passModel(lp)
+            self._highs = h
+        else:
+            # Only the objective and the start-fuel row change; HiGHS keeps the basis for the LP
+            h.changeColsCost(self.n, np.arange(self.n, dtype=np.int32), c[:self.n])
+            h.changeRowBounds(0, start_fuel, start_fuel)
+            if self.with_stops and self._last_solution is not None:
+                sol = highspy.HighsSolution()
+                sol.col_value = list(self._last_solution)
+                h.setSolution(sol)
+
+        h.run()
+        if h.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            return None
+        return np.asarray(h.getSolution().col_value)
+
+    def _solve_scipy(self, c, start_fuel):
+        from scipy.optimize import Bounds, LinearConstraint, milp
+
+        res = milp(c, constraints=LinearConstraint(self.A, self.row_lower, self.row_upper),
+                   bounds=Bounds(self.col_lower, self.col_upper), integrality=self.integrality)
+        if res.status != 0:
+            return None
+        return res.x
+
+    def _solve_cbc(self, c, start_fuel):
+        import pulp
+
+        if self._pulp is None:
+            names = ["purchase", "fuel_level", "stop"]
+            variables = [
+                pulp.LpVariable(f"{names[j // self.n]}_{j % self.n}",
+                                lowBound=self.col_lower[j],
+                                upBound=None if np.isinf(self.col_upper[j]) else self.col_upper[j],
+                                cat='Binary' if self.integrality[j] else 'Continuous')
+                for j in range(self.num_cols)
+            ]
+            prob = pulp.LpProblem("FuelOptimization", pulp.LpMinimize)
+            indptr, indices, data = self.A.indptr, self.A.indices, self.A.data
+            for r in range(self.A.shape[0]):
+                cols = slice(indptr[r], indptr[r + 1])
+                expr = pulp.LpAffineExpression(zip([variables[j] for j in indices[cols]], data[cols]))
+                if self.row_lower[r] == self.row_upper[r]:
+                    constraint = expr == self.row_upper[r]
+                else:
+                    constraint = expr <= self.row_upper[r]
+                prob += constraint, f"row_{r}"
+            self._pulp = (prob, variables)
+
+        prob, variables = self._pulp
+        prob.setObjective(pulp.LpAffineExpression(zip(variables, c)))
+        prob.constraints["row_0"].constant = -start_fuel
+
+        warm = self._last_solution is not None
+        if warm:
+            start = np.clip(self._last_solution, self.col_lower, self.col_upper)
+            for var, value in zip(variables, start):
+                var.setInitialValue(value)
+        prob.solve(pulp.PULP_CBC_CMD(msg=False, warmStart=warm))
+        if pulp.LpStatus[prob.status] != "Optimal":
+            return None
+        return np.array([var.value() or 0.0 for var in variables])
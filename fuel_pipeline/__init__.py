@@ -0,0 +1,3 @@
+"""Staged data pipeline behind the route and price map scripts (see stages.py)."""
+from .context import PipelineConfig, PipelineError
+from .runner import STAGE_ORDER, main, run_pipeline
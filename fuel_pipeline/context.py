@@ -0,0 +1,101 @@
+"""Configuration, run state and shared resources for the pipeline stages."""
+import json
+import os
+from dataclasses import dataclass, field
+
+from district_geometry import DISTRICTS_FILE_PATH
+from district_matcher import DISTRICT_MATCHES_PATH
+from ors_client import CONFIG_FILE_PATH, OrsClient
+from point_districts import CITY_CHECK_FILE
+from price_store import PRICE_STORE_DIR
+from route_chainage import ROUTES_GEOJSON_DIR
+from route_config import cities_coords_provided, routes_to_process_config
+from route_districts import ROUTES_AND_DISTRICTS_FILE, ROUTES_DISTRICTS_PRICES_FILE
+
+PIPELINE_DIR = '.pipeline'
+
+
+class PipelineError(Exception):
+    """A stage cannot continue (missing input file, bad CSV, no API key...)."""
+
+
+@dataclass
+class PipelineConfig:
+    prices_csv: str = 'india-diesel-22may25.csv'
+    price_date: str = None  # effective date of prices_csv; default: from its file name
+    price_store_dir: str = PRICE_STORE_DIR
+    districts_file: str = DISTRICTS_FILE_PATH
+    district_matches: str = DISTRICT_MATCHES_PATH
+    routes_dir: str = ROUTES_GEOJSON_DIR
+    ors_config: str = CONFIG_FILE_PATH
+    reference_city: str = "Toranagallu, Karnataka"
+    profile: str = 'driving-car'
+    cities_geojson: str = 'csv_geocoded_cities_v3.geojson'
+    distances_csv: str = 'cities_with_distances_from_reference.csv'
+    city_check: str = CITY_CHECK_FILE
+    routes_workbook: str = ROUTES_AND_DISTRICTS_FILE
+    prices_workbook: str = ROUTES_DISTRICTS_PRICES_FILE
+    routes_map: str = 'india_routes_and_cities_map_v3.html'
+    price_map: str = 'india_diesel_prices_map_city_based.html'
+    work_dir: str = PIPELINE_DIR
+    routes: dict = field(default_factory=lambda: dict(routes_to_process_config))
+    cities_coords: dict = field(default_factory=lambda: dict(cities_coords_provided))
+
+    def work_path(self, *parts):
+        """Path of an intermediate file under work_dir."""
+        return os.path.join(self.work_dir, *parts)
+
+
+class PipelineState:
+    """Input fingerprints each stage (and each route) last completed with, in state.json."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fingerprints = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.fingerprints = json.load(f)
+
+    def get(self, key):
+        return self.fingerprints.get(key)
+
+    def set(self, key, fingerprint):
+        self.fingerprints[key] = fingerprint
+
+    def discard(self, key):
+        self.fingerprints.pop(key, None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.fingerprints, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+
+class Context:
+    """What a stage gets: the config, the run state and a lazily created ORS client
+    (stages that find everything cached never need an API key)."""
+
+    def __init__(self, config, state):
+        self.config = config
+        self.state = state
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            try:
+                self._client = OrsClient.from_config(self.config.ors_config)
+            except FileNotFoundError:
+                raise PipelineError(f"'{self.config.ors_config}' not found. Please create it with your "
+                                    f"OpenRouteService API key.")
+            except KeyError:
+                raise PipelineError(f"'openrouteservice_api_key' not found in '{self.config.ors_config}'.")
+        return self._client
+
+    def close(self):
+        if self._client is not None:
+            self._client.report()
+            self._client.close()
+            self._client = None
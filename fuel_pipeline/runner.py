@@ -0,0 +1,85 @@
+"""Command-line runner: runs the requested stages in order, skipping up-to-date ones.
+
+    python -m fuel_pipeline                         # every stage
+    python -m fuel_pipeline --stages route render   # only these
+    python -m fuel_pipeline --force render          # re-run render even if up to date
+"""
+import argparse
+import os
+import time
+
+from .context import Context, PipelineConfig, PipelineError, PipelineState
+from .stages import STAGES
+
+STAGE_ORDER = [stage.name for stage in STAGES]
+
+
+def run_pipeline(stages=None, config=None, force=()):
+    """Run `stages` (default: all) in pipeline order; returns {stage: 'ran' | 'skipped'}.
+
+    A stage is skipped when its input fingerprint matches the one recorded after
+    its last successful run and all its outputs still exist.  Fingerprints are
+    computed just before a stage runs, so a stage sees its predecessors' fresh
+    outputs.
+    """
+    config = config or PipelineConfig()
+    wanted = set(STAGE_ORDER if not stages else stages)
+    unknown = wanted - set(STAGE_ORDER)
+    if unknown:
+        raise PipelineError(f"Unknown stage(s): {', '.join(sorted(unknown))}. Known: {', '.join(STAGE_ORDER)}")
+
+    ctx = Context(config, PipelineState(config.work_path('state.json')))
+    results = {}
+    try:
+        for stage in STAGES:
+            if stage.name not in wanted:
+                continue
+            fingerprint = stage.fingerprint(ctx)
+            key = f'stage:{stage.name}'
+            up_to_date = ctx.state.get(key) == fingerprint and all(os.path.exists(p) for p in stage.outputs(ctx))
+            if up_to_date and stage.name not in force:
+                print(f"--- {stage.name}: up to date, skipped ---")
+                results[stage.name] = 'skipped'
+                continue
+            print(f"--- {stage.name} ---")
+            started = time.perf_counter()
+            ctx.state.discard(key)
+            try:
+                stage.run(ctx)
+            finally:
+                # Keep per-route progress even when the stage fails part-way
+                ctx.state.save()
+            ctx.state.set(key, fingerprint)
+            ctx.state.save()
+            results[stage.name] = 'ran'
+            print(f"  {stage.name} done in {time.perf_counter() - started:.1f} s")
+    finally:
+        ctx.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diesel price / route data pipeline.")
+    parser.add_argument('--stages', nargs='+', choices=STAGE_ORDER, help="Stages to run (default: all)")
+    parser.add_argument('--force', nargs='*', choices=STAGE_ORDER,
+                        help="Re-run these stages (all selected stages if none given) even if up to date")
+    parser.add_argument('--prices', help="Diesel prices CSV")
+    parser.add_argument('--price-date', help="Effective date of the prices CSV (YYYY-MM-DD)")
+    parser.add_argument('--reference-city', help="City the distances stage measures from")
+    args = parser.parse_args(argv)
+
+    config = PipelineConfig()
+    if args.prices:
+        config.prices_csv = args.prices
+    if args.price_date:
+        config.price_date = args.price_date
+    if args.reference_city:
+        config.reference_city = args.reference_city
+    force = () if args.force is None else args.force or args.stages or STAGE_ORDER
+
+    try:
+        run_pipeline(args.stages, config, force)
+    except PipelineError as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
@@ -0,0 +1,433 @@
+"""The pipeline stages, in run order.
+
+    ingest     prices CSV -> .pipeline/cities.csv (unique cities, raw and numeric price)
+    geocode    cities + route endpoints + reference city -> .pipeline/locations.json
+    locate     city points x district polygons -> city_district_check.csv (flags misplaced geocodes)
+    route      one directions request per changed route -> routes_geojson_output/
+    distances  journaled matrix requests -> distances CSV and cities GeoJSON
+    intersect  route polylines x district polygons -> the two route workbooks
+    render     districts, routes and cities -> the routes map HTML
+    price_map  districts x prices -> the diesel price choropleth HTML
+
+Every stage declares its inputs (files and parameters) and outputs; the
+runner skips a stage whose input fingerprint matches its last completed run.
+The route and render stages also keep per-route fingerprints, so changing one
+route refetches and re-simplifies only that route.
+"""
+import json
+import os
+
+import folium
+import numpy as np
+import pandas as pd
+
+from district_geometry import GEOJSON_DISTRICT_PROPERTY, GEOJSON_STATE_PROPERTY
+from district_matcher import district_price_keys, resolve_cities
+from district_store import MAP_LEVEL, open_store
+from geocode_store import default_store, geocode_location
+from map_render import route_layer
+from plan_cache import file_fingerprint
+from point_districts import STATUS_MISMATCH, STATUS_OUTSIDE, check_city_locations, print_flagged
+from price_store import open_price_store, parse_price, price_key
+from road_distances import road_distances_km
+from route_chainage import route_geojson_path
+from route_districts import INTERSECTION_CACHE_FILE, attach_prices, configured_routes, intersect_routes
+from run_journal import RunJournal, run_key
+
+from .context import PipelineError
+
+CSV_CITY_COLUMN = 'City'
+CSV_PRICE_COLUMN = 'Price'
+PRICE_NUMERIC_COLUMN = 'Price (INR/L)'
+
+MAP_CENTER = [20.5937, 78.9629]
+# Cities per geocode/matrix batch between journal syncs
+JOURNAL_BATCH_SIZE = 250
+
+
+class Stage:
+    def __init__(self, name, run, inputs, outputs):
+        self.name = name
+        self.run = run
+        self.inputs = inputs
+        self.outputs = outputs
+
+    def fingerprint(self, ctx):
+        """Hash of the stage's parameters and the content of its input files."""
+        files, params = self.inputs(ctx)
+        return run_key(params, {path: file_fingerprint(path) for path in files})
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _route_endpoints(config):
+    return {route_name: (info['cities'][0], info['cities'][-1]) for route_name, info in config.routes.items()}
+
+
+def load_cities(config):
+    return pd.read_csv(config.work_path('cities.csv'), encoding='utf-8')
+
+
+def load_locations(config):
+    """{name: (lat, lon) or None} from the geocode stage."""
+    return {name: tuple(coords) if coords else None
+            for name, coords in _read_json(config.work_path('locations.json')).items()}
+
+
+# --- ingest ---
+
+def ingest_prices(ctx):
+    config = ctx.config
+    if not os.path.exists(config.prices_csv):
+        raise PipelineError(f"CSV file '{config.prices_csv}' not found.")
+    prices_df = pd.read_csv(config.prices_csv, encoding='utf-8-sig')
+    if CSV_CITY_COLUMN not in prices_df.columns or CSV_PRICE_COLUMN not in prices_df.columns:
+        raise PipelineError(f"CSV must contain '{CSV_CITY_COLUMN}' and '{CSV_PRICE_COLUMN}' columns.")
+    cities_df = prices_df[[CSV_CITY_COLUMN, CSV_PRICE_COLUMN]].drop_duplicates(subset=[CSV_CITY_COLUMN])
+    cities_df[PRICE_NUMERIC_COLUMN] = parse_price(cities_df[CSV_PRICE_COLUMN]).to_numpy()
+    os.makedirs(config.work_dir, exist_ok=True)
+    cities_df.to_csv(config.work_path('cities.csv'), index=False, encoding='utf-8')
+    print(f"  {len(cities_df)} unique cities, {cities_df[PRICE_NUMERIC_COLUMN].notna().sum()} with a numeric price.")
+
+    # Keep the snapshot in the time-versioned store the app reads as-of prices from
+    price_store = open_price_store(config.price_store_dir, seed_files=())
+    try:
+        if not price_store.ingest_csv(config.prices_csv, config.price_date):
+            print("  Price store already holds this snapshot.")
+    except ValueError as e:
+        print(f"  WARNING: not added to the price store: {e} (use --price-date)")
+
+
+# --- geocode ---
+
+def geocode_all(ctx):
+    config = ctx.config
+    csv_names = load_cities(config)[CSV_CITY_COLUMN].astype(str).tolist()
+    route_names = [name for endpoints in _route_endpoints(config).values() for name in endpoints]
+    names = list(dict.fromkeys(route_names + [config.reference_city] + csv_names))
+    csv_only = set(csv_names) - set(route_names) - {config.reference_city}
+
+    store = default_store()
+    locations, unresolved = {}, []
+    for name in names:
+        if name in config.cities_coords:
+            locations[name] = config.cities_coords[name]
+            continue
+        found, coords = store.get(name)
+        if found:
+            locations[name] = coords
+        else:
+            unresolved.append(name)
+    if unresolved:
+        print(f"  Geocoding {len(unresolved)} locations via API...")
+        results = ctx.client.map(lambda name: geocode_location(name, ctx.client, is_city_from_csv=name in csv_only,
+                                                               store=store), unresolved)
+        locations.update(zip(unresolved, results))
+
+    _write_json(config.work_path('locations.json'),
+                {name: list(locations[name]) if locations[name] else None for name in names})
+    print(f"  {sum(coords is not None for coords in locations.values())}/{len(names)} locations resolved "
+          f"({len(unresolved)} looked up).")
+
+
+# --- locate ---
+
+def locate_cities(ctx):
+    config = ctx.config
+    city_names = load_cities(config)[CSV_CITY_COLUMN].astype(str).tolist()
+    locations = load_locations(config)
+    coords = np.array([locations.get(name) or (np.nan, np.nan) for name in city_names], dtype=float).reshape(-1, 2)
+    check_df = check_city_locations(city_names, coords[:, 0], coords[:, 1], config.districts_file,
+                                    config.district_matches)
+    print_flagged(check_df)
+    check_df.to_csv(config.city_check, index=False, encoding='utf-8')
+    print(f"  Saved {config.city_check}")
+
+
+def load_flagged_cities(config):
+    """{city: note} for cities the locate stage found outside their named district."""
+    if not os.path.exists(config.city_check):
+        return {}
+    check_df = pd.read_csv(config.city_check, encoding='utf-8')
+    flagged = check_df[check_df['Status'].isin([STATUS_MISMATCH, STATUS_OUTSIDE])]
+    return {row['City']: f"geocoded in {row['Located District'] if pd.notna(row['Located District']) else 'no district'}"
+                         f", not {row['Named District']}" for row in flagged.to_dict('records')}
+
+
+# --- route ---
+
+def _route_request(config, locations, route_name):
+    start, end = _route_endpoints(config)[route_name]
+    if not locations.get(start) or not locations.get(end):
+        return None
+    # ORS expects [lon, lat]
+    return [[locations[start][1], locations[start][0]], [locations[end][1], locations[end][0]]]
+
+
+def fetch_routes(ctx):
+    config = ctx.config
+    locations = load_locations(config)
+    os.makedirs(config.routes_dir, exist_ok=True)
+
+    todo = []
+    for route_name in config.routes:
+        coordinates = _route_request(config, locations, route_name)
+        if coordinates is None:
+            print(f"  Skipping route '{route_name}' due to geocoding failure of endpoints.")
+            continue
+        fingerprint = run_key(coordinates, config.profile)
+        path = route_geojson_path(route_name, config.routes_dir)
+        recorded = ctx.state.get(f'route:{route_name}')
+        if os.path.exists(path) and (recorded == fingerprint or recorded is None):
+            # Unchanged (or fetched before the pipeline kept state): keep the file
+            ctx.state.set(f'route:{route_name}', fingerprint)
+            continue
+        todo.append((route_name, coordinates, fingerprint, path))
+
+    print(f"  {len(todo)} of {len(config.routes)} routes to fetch.")
+
+    def fetch(item):
+        try:
+            return ctx.client.directions(coordinates=item[1], profile=config.profile, format='geojson',
+                                         instructions=False)
+        except Exception as e:
+            return e
+
+    for (route_name, _, fingerprint, path), response in zip(todo, ctx.client.map(fetch, todo) if todo else []):
+        if isinstance(response, Exception):
+            print(f"  ERROR fetching route for {route_name}: {response}")
+        elif response and response.get('features'):
+            with open(path, 'w') as f_route_geojson:
+                json.dump(response, f_route_geojson, indent=2)
+            ctx.state.set(f'route:{route_name}', fingerprint)
+            print(f"  Route GeoJSON saved to: {path}")
+        else:
+            print(f"  WARNING: Could not get route geometry for {route_name}.")
+
+
+# --- distances ---
+
+def distance_column(config):
+    return f'Distance_from_{config.reference_city.split(",")[0].replace(" ", "_")}_km'
+
+
+def reference_distances(ctx):
+    config = ctx.config
+    cities_df = load_cities(config)
+    locations = load_locations(config)
+    reference = locations.get(config.reference_city)
+    if not reference:
+        print(f"  WARNING: Could not determine coordinates for the reference city '{config.reference_city}'. "
+              f"Distances will be N/A.")
+
+    city_names = cities_df[CSV_CITY_COLUMN].astype(str).tolist()
+    journal = RunJournal(config.work_path('distances.journal.jsonl'),
+                         run_key(file_fingerprint(config.prices_csv), config.reference_city, reference, config.profile))
+    pending = [name for name in city_names if name not in journal and locations.get(name)]
+    print(f"  {len(journal)} cities already in the journal, {len(pending)} to process.")
+
+    for batch_start in range(0, len(pending), JOURNAL_BATCH_SIZE):
+        batch = pending[batch_start:batch_start + JOURNAL_BATCH_SIZE]
+        if reference:
+            distances_km, failed = road_distances_km(ctx.client, [reference], [locations[name] for name in batch],
+                                                     profile=config.profile)
+        else:
+            distances_km, failed = np.full((1, len(batch)), np.nan), np.zeros((1, len(batch)), dtype=bool)
+        for name, distance_km, distance_failed in zip(batch, distances_km[0], failed[0]):
+            if not distance_failed: # failed requests are retried on the next run
+                journal.append(name, {'distance_km': round(float(distance_km), 2) if np.isfinite(distance_km) else None})
+        journal.sync()
+        print(f"    Processed {min(batch_start + JOURNAL_BATCH_SIZE, len(pending))}/{len(pending)} pending cities...")
+    journal.close()
+
+    # Merge the journal with the geocodes, in CSV order
+    column = distance_column(config)
+    rows, features = [], []
+    for city_name, price in zip(city_names, cities_df[CSV_PRICE_COLUMN]):
+        coords = locations.get(city_name)
+        distance_km = journal.get(city_name, {}).get('distance_km')
+        rows.append({CSV_CITY_COLUMN: city_name, CSV_PRICE_COLUMN: price,
+                     'Latitude': coords[0] if coords else None, 'Longitude': coords[1] if coords else None,
+                     column: distance_km})
+        if coords:
+            features.append({"type": "Feature",
+                             "geometry": {"type": "Point", "coordinates": [coords[1], coords[0]]}, # [lon, lat]
+                             "properties": {"city_name_csv": city_name, "price_csv": price, "latitude": coords[0],
+                                            "longitude": coords[1], "distance_from_reference_km": distance_km}})
+    pd.DataFrame(rows).to_csv(config.distances_csv, index=False, encoding='utf-8')
+    print(f"  CSV with city details and distances saved to: {config.distances_csv}")
+    with open(config.cities_geojson, 'w', encoding='utf-8') as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f, indent=2)
+    print(f"  Geocoded city locations (with distances) saved to: {config.cities_geojson}")
+
+
+# --- intersect ---
+
+def intersect_districts(ctx):
+    config = ctx.config
+    routes = configured_routes(config.routes_dir, config.routes)
+    routes_df, recomputed = intersect_routes(routes, config.districts_file, INTERSECTION_CACHE_FILE)
+    print(f"  Recomputed {len(recomputed)} route(s), reused {len(routes) - len(recomputed)}.")
+    routes_df.to_excel(config.routes_workbook, index=False)
+    attach_prices(routes_df, config.prices_csv, config.districts_file, config.district_matches) \
+        .to_excel(config.prices_workbook, index=False)
+    print(f"  Saved {config.routes_workbook} and {config.prices_workbook}")
+
+
+# --- render ---
+
+def render_routes_map(ctx):
+    config = ctx.config
+    india_map = folium.Map(location=MAP_CENTER, zoom_start=5, tiles="CartoDB positron")
+
+    district_store = open_store(config.districts_file)
+    folium.GeoJson(district_store.geojson(MAP_LEVEL), name='District Boundaries',
+                   style_function=lambda x: {'color': '#888888', 'weight': 0.5, 'fillOpacity': 0.05}).add_to(india_map)
+
+    route_group = folium.FeatureGroup(name="Driving Routes")
+    for route_name in config.routes:
+        path = route_geojson_path(route_name, config.routes_dir)
+        if os.path.exists(path):
+            folium.GeoJson(route_layer(path, config.work_path('render')), name=f"Route: {route_name}",
+                           tooltip=route_name,
+                           style_function=lambda x: {'color': 'blue', 'weight': 3, 'opacity': 0.7}).add_to(route_group)
+    route_group.add_to(india_map)
+
+    cities_df = load_cities(config)
+    locations = load_locations(config)
+    distances = {}
+    if os.path.exists(config.distances_csv):
+        distances_df = pd.read_csv(config.distances_csv, encoding='utf-8')
+        if distance_column(config) in distances_df.columns:
+            distances = dict(zip(distances_df[CSV_CITY_COLUMN].astype(str), distances_df[distance_column(config)]))
+    reference_label = config.reference_city.split(',')[0]
+
+    flagged = load_flagged_cities(config)
+    city_markers_group = folium.FeatureGroup(name="Diesel Price Cities")
+    for city_name, price in zip(cities_df[CSV_CITY_COLUMN].astype(str), cities_df[CSV_PRICE_COLUMN]):
+        coords = locations.get(city_name)
+        if not coords:
+            continue
+        tooltip_text = f"City: {city_name}<br>Diesel Price: {price}"
+        if pd.notna(distances.get(city_name, np.nan)):
+            tooltip_text += f"<br>Dist. from {reference_label}: {distances[city_name]} km"
+        # Orange: the point is not inside the district the name refers to
+        color = 'orange' if city_name in flagged else 'red'
+        if city_name in flagged:
+            tooltip_text += f"<br>Check location: {flagged[city_name]}"
+        folium.CircleMarker(location=coords, radius=5, color=color, fill=True, fill_color=color, fill_opacity=0.7,
+                            tooltip=tooltip_text).add_to(city_markers_group)
+    city_markers_group.add_to(india_map)
+
+    folium.LayerControl().add_to(india_map)
+    india_map.save(config.routes_map)
+    print(f"  Map saved to: {config.routes_map}")
+
+
+# --- price_map ---
+
+def render_price_map(ctx):
+    config = ctx.config
+    cities_df = load_cities(config).dropna(subset=[PRICE_NUMERIC_COLUMN])
+    matches = resolve_cities(cities_df[CSV_CITY_COLUMN].astype(str).tolist(), districts_path=config.districts_file,
+                             path=config.district_matches)
+    cities_df['join_key'] = price_key(cities_df[CSV_CITY_COLUMN])
+    # If multiple prices for the same city, take the last
+    by_key = cities_df.drop_duplicates('join_key', keep='last').set_index('join_key')
+
+    districts = open_store(config.districts_file).geojson(MAP_LEVEL)
+    keys = district_price_keys([f['properties'].get(GEOJSON_DISTRICT_PROPERTY) for f in districts['features']],
+                               [f['properties'].get(GEOJSON_STATE_PROPERTY) for f in districts['features']], matches)
+    for feature, key in zip(districts['features'], keys):
+        props = dict(feature['properties'])
+        matched = key in by_key.index
+        props['map_key'] = f"{props.get(GEOJSON_DISTRICT_PROPERTY)}_GEOID_{props.get(GEOJSON_STATE_PROPERTY)}"
+        props['display_name_for_tooltip'] = by_key.at[key, CSV_CITY_COLUMN] if matched else props.get(GEOJSON_DISTRICT_PROPERTY)
+        props['display_price_for_tooltip'] = str(by_key.at[key, CSV_PRICE_COLUMN]) if matched else 'N/A'
+        props['price_for_map'] = float(by_key.at[key, PRICE_NUMERIC_COLUMN]) if matched else None
+        props['match_for_tooltip'] = f"{matches[key]['method']} ({matches[key]['confidence']:.2f})" \
+            if matched and key in matches else 'N/A'
+        feature['properties'] = props
+    prices = pd.DataFrame([(f['properties']['map_key'], f['properties']['price_for_map'])
+                           for f in districts['features']], columns=['map_key', 'price_for_map'])
+    num_matched = prices['price_for_map'].notna().sum()
+    print(f"  {num_matched} of {len(prices)} districts matched with a diesel price.")
+
+    india_map = folium.Map(location=MAP_CENTER, zoom_start=5, tiles="CartoDB positron")
+    if num_matched > 0:
+        folium.Choropleth(geo_data=districts, name='Diesel Prices', data=prices, columns=['map_key', 'price_for_map'],
+                          key_on='feature.properties.map_key', fill_color='YlOrRd', fill_opacity=0.7,
+                          line_opacity=0.3, legend_name='Diesel Price (INR)', nan_fill_color='gainsboro',
+                          highlight=True).add_to(india_map)
+        folium.GeoJson(
+            districts, name="District Information",
+            style_function=lambda x: {'color': 'transparent', 'fillColor': 'transparent', 'weight': 0},
+            tooltip=folium.features.GeoJsonTooltip(
+                fields=['display_name_for_tooltip', GEOJSON_STATE_PROPERTY, 'display_price_for_tooltip',
+                        'match_for_tooltip'],
+                aliases=['City/District:', 'State:', 'Diesel Price (CSV):', 'Name Match:'],
+                localize=True, sticky=False, labels=True,
+                style="""background-color: #F0EFEF; border: 1px solid black; border-radius: 3px; box-shadow: 3px;"""),
+            highlight_function=lambda x: {'weight': 1, 'color': 'black', 'fillOpacity': 0.1}
+        ).add_to(india_map)
+    else:
+        print("  WARNING: No districts were matched with price data. Showing base district map.")
+        folium.GeoJson(districts, name="District Boundaries (No Price Data Matched)",
+                       tooltip=folium.features.GeoJsonTooltip(fields=[GEOJSON_DISTRICT_PROPERTY,
+                                                                      GEOJSON_STATE_PROPERTY])).add_to(india_map)
+    folium.LayerControl().add_to(india_map)
+    india_map.save(config.price_map)
+    print(f"  Map saved to: {config.price_map}")
+
+
+def _route_files(config):
+    return [route_geojson_path(route_name, config.routes_dir) for route_name in config.routes]
+
+
+STAGES = [
+    Stage('ingest', ingest_prices,
+          inputs=lambda ctx: ([ctx.config.prices_csv], {'price_date': ctx.config.price_date}),
+          outputs=lambda ctx: [ctx.config.work_path('cities.csv'),
+                               os.path.join(ctx.config.price_store_dir, 'manifest.json')]),
+    Stage('geocode', geocode_all,
+          inputs=lambda ctx: ([ctx.config.work_path('cities.csv')],
+                              {'routes': _route_endpoints(ctx.config), 'reference': ctx.config.reference_city,
+                               'provided': ctx.config.cities_coords}),
+          outputs=lambda ctx: [ctx.config.work_path('locations.json')]),
+    Stage('locate', locate_cities,
+          inputs=lambda ctx: ([ctx.config.work_path('cities.csv'), ctx.config.work_path('locations.json'),
+                               ctx.config.districts_file, ctx.config.district_matches], {}),
+          outputs=lambda ctx: [ctx.config.city_check]),
+    Stage('route', fetch_routes,
+          inputs=lambda ctx: ([ctx.config.work_path('locations.json')],
+                              {'routes': _route_endpoints(ctx.config), 'profile': ctx.config.profile}),
+          outputs=lambda ctx: _route_files(ctx.config)),
+    Stage('distances', reference_distances,
+          inputs=lambda ctx: ([ctx.config.work_path('cities.csv'), ctx.config.work_path('locations.json')],
+                              {'reference': ctx.config.reference_city, 'profile': ctx.config.profile}),
+          outputs=lambda ctx: [ctx.config.distances_csv, ctx.config.cities_geojson]),
+    Stage('intersect', intersect_districts,
+          inputs=lambda ctx: (_route_files(ctx.config) + [ctx.config.districts_file, ctx.config.prices_csv,
+                                                          ctx.config.district_matches],
+                              {'routes': list(ctx.config.routes)}),
+          outputs=lambda ctx: [ctx.config.routes_workbook, ctx.config.prices_workbook]),
+    Stage('render', render_routes_map,
+          inputs=lambda ctx: (_route_files(ctx.config) + [ctx.config.districts_file, ctx.config.work_path('cities.csv'),
+                                                          ctx.config.work_path('locations.json'),
+                                                          ctx.config.distances_csv, ctx.config.city_check],
+                              {'routes': list(ctx.config.routes), 'reference': ctx.config.reference_city}),
+          outputs=lambda ctx: [ctx.config.routes_map]),
+    Stage('price_map', render_price_map,
+          inputs=lambda ctx: ([ctx.config.work_path('cities.csv'), ctx.config.districts_file,
+                               ctx.config.district_matches], {}),
+          outputs=lambda ctx: [ctx.config.price_map]),
+]
@@ -0,0 +1,253 @@
+"""Refuelling solver for a fixed route of districts.
+
+The refuelling model in app.py (buy `purchase[i]` at district i, keep
+`fuel_level[i]` between the buffer and the tank capacity) has no cost on the
+`stop` binaries, so it is the classic fixed-route gas-station problem.  It is
+solved exactly here in O(n) with a next-cheaper-station (monotone stack)
+greedy instead of building a PuLP model and starting CBC on every click.
+
+Fuel levels are arrival levels, as in app.py: `fuel_level[0]` is the starting
+fuel and `fuel_level[i + 1] = fuel_level[i] + purchase[i] - segment[i]`.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+STATUS_OPTIMAL = "Optimal"
+STATUS_INFEASIBLE = "Infeasible"
+
+# Purchases below this many litres are treated as "no stop" (same cut-off app.py uses)
+MIN_PURCHASE_LITRES = 0.01
+
+
+@dataclass
+class RefuelPlan:
+    purchase: np.ndarray     # litres bought at each district
+    fuel_level: np.ndarray   # litres in the tank on arrival at each district
+    prices: np.ndarray
+    status: str = STATUS_OPTIMAL
+    solver: str = "greedy"
+
+    @property
+    def total_cost(self):
+        return float(np.dot(self.purchase, self.prices))
+
+    @property
+    def total_fuel(self):
+        return float(self.purchase.sum())
+
+    @property
+    def stop(self):
+        return self.purchase > MIN_PURCHASE_LITRES
+
+    @property
+    def is_optimal(self):
+        return self.status == STATUS_OPTIMAL
+
+
+def next_cheaper_stations(prices):
+    """For every district, the index of the first later district that is no more
+    expensive, or n - 1 (the destination) if there is none."""
+    prices = np.asarray(prices, dtype=float)
+    n = len(prices)
+    next_cheaper = np.full(n, n - 1, dtype=np.int64)
+    stack = []
+    for i in range(n - 1, -1, -1):
+        while stack and prices[stack[-1]] > prices[i]:
+            stack.pop()
+        if stack:
+            next_cheaper[i] = stack[-1]
+        stack.append(i)
+    return next_cheaper
+
+
+def purchase_bounds(fuel_needed_segments, start_fuel, min_level, tank_capacity):
+    """Bounds on the cumulative litres bought up to and including each district.
+
+    Returns (lower, upper) arrays of length n - 1 (nothing is bought at the
+    destination).  `min_level` is the lowest allowed arrival level per district.
+    Works row-wise on 2-D inputs (one row per vehicle / start level) as well.
+    """
+    segments = np.asarray(fuel_needed_segments, dtype=float)
+    consumed = np.cumsum(segments, axis=-1)
+    consumed = np.concatenate((np.zeros(consumed.shape[:-1] + (1,)), consumed), axis=-1)
+    start = np.asarray(start_fuel, dtype=float)[..., None]
+    need = np.maximum.accumulate(consumed[..., 1:] + min_level[..., 1:] - start, axis=-1)
+    lower = np.maximum(need, 0.0)
+    upper = tank_capacity + consumed[..., :-1] - start
+    return lower, upper
+
+
+def min_levels(n, buffer_fuel, end_fuel=None):
+    """Per-district minimum arrival level: the buffer everywhere, and at least
+    `end_fuel` at the destination.  An array `end_fuel` gives one row per value."""
+    if end_fuel is None or np.ndim(end_fuel) == 0:
+        levels = np.full(n, float(buffer_fuel))
+        if end_fuel is not None:
+            levels[-1] = max(levels[-1], float(end_fuel))
+        return levels
+    levels = np.full((len(end_fuel), n), float(buffer_fuel))
+    levels[:, -1] = np.maximum(buffer_fuel, end_fuel)
+    return levels
+
+
+def greedy_purchases(next_cheaper, lower, upper):
+    """Cumulative purchase through each district under the next-cheaper rule.
+
+    At each district buy just enough to cover every requirement until the next
+    district that is no more expensive, capped by what the tank can hold.
+    """
+    m = len(lower)
+    bought = np.empty(m)
+    total = 0.0
+    for i in range(m):
+        target = lower[next_cheaper[i] - 1]
+        total = max(total, min(upper[i], target))
+        bought[i] = total
+    return bought
+
+
+def resume_greedy_purchases(next_cheaper, lower, upper, bought, start, settled_from):
+    """Redo `greedy_purchases` in place from `start`, keeping `bought` before it.
+
+    Past `settled_from` (where next_cheaper is as it was when `bought` was
+    walked) the walk stops as soon as it matches the old total: from there on
+    it would retrace the old plan.  Returns how many districts were walked.
+    """
+    m = len(lower)
+    total = bought[start - 1] if start > 0 else 0.0
+    for i in range(start, m):
+        total = max(total, min(upper[i], lower[next_cheaper[i] - 1]))
+        if i >= settled_from and total == bought[i]:
+            return i - start + 1
+        bought[i] = total
+    return m - start
+
+
+def greedy_purchases_batch(next_cheaper, lower, upper, bought=None, start=0):
+    """`greedy_purchases` for k plans at once (one row of lower / upper each).
+
+    Passing the `bought` of an earlier run keeps its columns before `start` and
+    resumes the walk there: prices only enter through next_cheaper, so after a
+    price change the plans are unchanged up to the first district whose
+    next-cheaper district moved.
+    """
+    k, m = lower.shape
+    bought = np.empty((k, m)) if bought is None else bought
+    total = bought[:, start - 1].copy() if start > 0 else np.zeros(k)
+    for i in range(start, m):
+        total = np.maximum(total, np.minimum(upper[:, i], lower[:, next_cheaper[i] - 1]))
+        bought[:, i] = total
+    return bought
+
+
+def solve_refuelling(prices, fuel_needed_segments, start_fuel, end_fuel, buffer_fuel, tank_capacity,
+                     next_cheaper=None):
+    """Cheapest purchase plan along a route.
+
+    prices: price per litre at each of the n districts, in route order.
+    fuel_needed_segments: litres needed to drive from district i to i + 1 (n - 1 values).
+    end_fuel: minimum fuel on arrival at the last district (None for just the buffer).
+    next_cheaper: `next_cheaper_stations(prices)` if already known, e.g. kept
+    current by a price_index.RoutePriceIndex.
+    """
+    prices = np.asarray(prices, dtype=float)
+    n = len(prices)
+    if len(fuel_needed_segments) != n - 1:
+        raise ValueError(f"Expected {n - 1} segment fuel values for {n} districts, got {len(fuel_needed_segments)}")
+
+    level = min_levels(n, buffer_fuel, end_fuel)
+    lower, upper = purchase_bounds(fuel_needed_segments, start_fuel, level, tank_capacity)
+    feasible = buffer_fuel <= start_fuel <= tank_capacity and bool(np.all(lower <= upper + 1e-9))
+
+    if n < 2:
+        purchase = np.zeros(n)
+    elif not feasible:
+        purchase = np.zeros(n)
+    else:
+        if next_cheaper is None:
+            next_cheaper = next_cheaper_stations(prices)
+        bought = greedy_purchases(next_cheaper, lower, upper)
+        purchase = np.diff(np.concatenate(([0.0], bought, [bought[-1]])))
+
+    return plan_from_purchases(prices, fuel_needed_segments, start_fuel, purchase,
+                               STATUS_OPTIMAL if feasible else STATUS_INFEASIBLE)
+
+
+def solve_refuelling_batch(prices, fuel_needed_segments, start_fuel, end_fuel, buffer_fuel, tank_capacity,
+                           next_cheaper=None):
+    """`solve_refuelling` for many vehicles / start levels on the same route at once.
+
+    fuel_needed_segments: (k, n - 1) array, one row per plan.
+    start_fuel, end_fuel: scalars or length-k arrays.
+    next_cheaper: as in `solve_refuelling`.
+    Returns (purchase, fuel_level, feasible) with shapes (k, n), (k, n), (k,).
+    The greedy walks the route once; every step is vectorised over the k plans.
+    """
+    prices = np.asarray(prices, dtype=float)
+    segments = np.atleast_2d(np.asarray(fuel_needed_segments, dtype=float))
+    k, n = segments.shape[0], len(prices)
+    if segments.shape[1] != n - 1:
+        raise ValueError(f"Expected {n - 1} segment fuel values for {n} districts, got {segments.shape[1]}")
+    start = np.broadcast_to(np.asarray(start_fuel, dtype=float), (k,))
+    end = None if end_fuel is None else np.broadcast_to(np.asarray(end_fuel, dtype=float), (k,))
+
+    level = np.broadcast_to(min_levels(n, buffer_fuel, end), (k, n))
+    lower, upper = purchase_bounds(segments, start, level, tank_capacity)
+    feasible = (start >= buffer_fuel) & (start <= tank_capacity) & np.all(lower <= upper + 1e-9, axis=1)
+
+    purchase = np.zeros((k, n))
+    if n >= 2:
+        if next_cheaper is None:
+            next_cheaper = next_cheaper_stations(prices)
+        purchase[:, :n - 1] = greedy_purchases_batch(next_cheaper, lower, upper)
+        purchase[:, 1:n - 1] = np.diff(purchase[:, :n - 1], axis=1)
+        purchase[~feasible] = 0.0
+
+    fuel_level = np.empty((k, n))
+    fuel_level[:, 0] = start
+    fuel_level[:, 1:] = start[:, None] + np.cumsum(purchase[:, :-1] - segments, axis=1)
+    return purchase, fuel_level, feasible
+
+
+def plan_from_purchases(prices, fuel_needed_segments, start_fuel, purchase, status=STATUS_OPTIMAL, solver="greedy"):
+    segments = np.asarray(fuel_needed_segments, dtype=float)
+    fuel_level = start_fuel + np.concatenate(([0.0], np.cumsum(purchase[:-1] - segments)))
+    return RefuelPlan(purchase=purchase, fuel_level=fuel_level, prices=np.asarray(prices, dtype=float),
+                      status=status, solver=solver)
+
+
+def solve_refuelling_pulp(prices, fuel_needed_segments, start_fuel, end_fuel, buffer_fuel, tank_capacity):
+    """The original app.py MILP, kept as a cross-check for `solve_refuelling`."""
+    import pulp
+
+    prices = np.asarray(prices, dtype=float)
+    n = len(prices)
+    index = range(n)
+
+    prob = pulp.LpProblem("FuelOptimization", pulp.LpMinimize)
+
+    purchase = pulp.LpVariable.dicts("purchase", index, lowBound=0)
+    fuel_level = pulp.LpVariable.dicts("fuel_level", index, lowBound=buffer_fuel, upBound=tank_capacity)
+    stop = pulp.LpVariable.dicts("stop", index, cat='Binary')
+
+    prob += pulp.lpSum([purchase[i] * prices[i] for i in index])
+
+    for idx in index:
+        if idx == 0:
+            prob += fuel_level[idx] == start_fuel
+        else:
+            prob += fuel_level[idx] == fuel_level[idx - 1] + purchase[idx - 1] - fuel_needed_segments[idx - 1]
+
+        prob += purchase[idx] <= (tank_capacity - buffer_fuel) * stop[idx]
+        prob += purchase[idx] + fuel_level[idx] <= tank_capacity
+
+    if end_fuel is not None:
+        prob += fuel_level[n - 1] >= end_fuel
+
+    prob.solve(pulp.PULP_CBC_CMD(msg=False))
+
+    status = pulp.LpStatus[prob.status]
+    bought = np.array([pulp.value(purchase[i]) or 0.0 for i in index])
+    return plan_from_purchases(prices, fuel_needed_segments, start_fuel, bought,
+                               STATUS_OPTIMAL if status == "Optimal" else STATUS_INFEASIBLE, solver="pulp")
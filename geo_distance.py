@@ -0,0 +1,102 @@
+"""Vectorised WGS-84 distances for route tables.
+
+`geodesic_km` is Vincenty's inverse formula evaluated over whole NumPy arrays.
+Against geopy's `geodesic` (Karney's algorithm on the same ellipsoid) it agrees
+to better than 1 mm for any pair of points that are not nearly antipodal,
+which covers every route inside India by a wide margin; pairs where the
+iteration does not converge (within ~0.5 degrees of antipodal) fall back to
+the spherical great-circle distance and can be off by up to ~0.5%.
+"""
+import numpy as np
+
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+EARTH_RADIUS_KM = 6371.0088  # mean radius, for the spherical fallback
+
+SEGMENT_DISTANCE_COLUMN = 'Segment Distance (km)'
+CHAINAGE_COLUMN = 'Chainage (km)'
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance on the mean-radius sphere."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def geodesic_km(lat1, lon1, lat2, lon2, tolerance=1e-12, max_iterations=200):
+    """Ellipsoidal (WGS-84) distance in km between arrays of points."""
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (lat1, lon1, lat2, lon2)))
+    f = WGS84_F
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sinU1, cosU1, sinU2, cosU2 = np.sin(U1), np.cos(U1), np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cosU2 * sin_lam, cosU1 * sinU2 - sinU1 * cosU2 * cos_lam)
+            cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_next = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            converged = np.abs(lam_next - lam) <= tolerance
+            lam = lam_next
+            if converged.all():
+                break
+
+        u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+        distance = WGS84_B * A * (sigma - delta_sigma) / 1000.0
+
+    if not converged.all():
+        fallback = ~converged | ~np.isfinite(distance)
+        distance = np.where(fallback, haversine_km(lat1, lon1, lat2, lon2), distance)
+    return distance
+
+
+def segment_distances_km(lat, lon):
+    """Distance from each point to the next one (n - 1 values)."""
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    return geodesic_km(lat[:-1], lon[:-1], lat[1:], lon[1:])
+
+
+def chainage_km(segment_distances):
+    """Cumulative distance from the first point (n values, starting at 0)."""
+    return np.concatenate(([0.0], np.cumsum(segment_distances)))
+
+
+def add_route_distances(routes_df, route_column='Route Name', lat_column='District Latitude (Centroid)',
+                        lon_column='District Longitude (Centroid)'):
+    """Add segment distance (to the next district, NaN at a route's last row) and
+    chainage columns to a route table whose rows are in route order.
+
+    Computed in one vectorised pass over the whole table, masking the hops
+    between the last row of one route and the first row of the next.
+    """
+    routes_df = routes_df.copy()
+    route = routes_df[route_column].to_numpy()
+    segments = segment_distances_km(routes_df[lat_column], routes_df[lon_column])
+    same_route = route[:-1] == route[1:]
+    segments = np.where(same_route, segments, np.nan)
+
+    routes_df[SEGMENT_DISTANCE_COLUMN] = np.append(segments, np.nan)
+    hops = np.concatenate(([0.0], np.nan_to_num(segments)))
+    # Restart the running total at the first row of every route
+    totals = np.cumsum(hops)
+    starts = np.concatenate(([True], ~same_route))
+    routes_df[CHAINAGE_COLUMN] = totals - np.maximum.accumulate(np.where(starts, totals, 0.0))
+    return routes_df
@@ -0,0 +1,174 @@
+"""Persistent geocode store shared by the route and map scripts.
+
+Geocodes live in a SQLite file keyed by the normalised location name, so a
+re-run only calls the geocoder for names it has never seen.  Failures are
+stored as negative entries with a TTL (a day for "no result", an hour for
+request errors) and are retried once they expire instead of being forgotten at
+the end of the run.
+
+On open, the store seeds itself from the scripts' previous outputs
+(csv_geocoded_cities_v3.geojson and cities_with_distances_from_reference.csv)
+whenever those files change.  Seeded points never overwrite geocoder results
+but do replace negative entries.
+"""
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from ors_client import OrsError
+from plan_cache import file_fingerprint
+
+GEOCODE_STORE_PATH = '.geocode_store.sqlite'
+SEED_GEOJSON_PATH = 'csv_geocoded_cities_v3.geojson'
+SEED_CSV_PATH = 'cities_with_distances_from_reference.csv'
+
+NO_RESULT_TTL_SECONDS = 24 * 3600
+ERROR_TTL_SECONDS = 3600
+
+
+def _key(name):
+    return str(name).strip().lower()
+
+
+def _seed_points(path):
+    """(name, lat, lon) tuples from a previous GeoJSON or CSV output."""
+    if path.endswith('.geojson'):
+        with open(path, 'r', encoding='utf-8') as f:
+            features = json.load(f).get('features', [])
+        points = [(feature['properties'].get('city_name_csv'), feature['properties'].get('latitude'),
+                   feature['properties'].get('longitude')) for feature in features]
+    else:
+        cities_df = pd.read_csv(path, encoding='utf-8')
+        points = zip(cities_df['City'], cities_df['Latitude'], cities_df['Longitude'])
+    return [(str(name), float(lat), float(lon)) for name, lat, lon in points
+            if name is not None and lat is not None and lon is not None
+            and math.isfinite(float(lat)) and math.isfinite(float(lon))]
+
+
+class GeocodeStore:
+    def __init__(self, path=GEOCODE_STORE_PATH, seed_files=(SEED_GEOJSON_PATH, SEED_CSV_PATH)):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS geocodes (
+            key TEXT PRIMARY KEY, name TEXT, lat REAL, lon REAL, source TEXT,
+            updated_at REAL, expires_at REAL)""")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS seeds (path TEXT PRIMARY KEY, fingerprint TEXT)")
+        self.conn.commit()
+        self.hits = self.negative_hits = self.misses = 0
+        for seed_path in seed_files:
+            self.seed(seed_path)
+
+    def seed(self, path):
+        """Load points from a previous output file if it changed since the last seed."""
+        fingerprint = file_fingerprint(path)
+        if fingerprint is None:
+            return 0
+        with self.lock:
+            row = self.conn.execute("SELECT fingerprint FROM seeds WHERE path = ?", (path,)).fetchone()
+            if row and row[0] == fingerprint:
+                return 0
+        points = _seed_points(path)
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                """INSERT INTO geocodes (key, name, lat, lon, source, updated_at, expires_at)
+                   VALUES (?, ?, ?, ?, ?, ?, NULL)
+                   ON CONFLICT(key) DO UPDATE SET name = excluded.name, lat = excluded.lat, lon = excluded.lon,
+                       source = excluded.source, updated_at = excluded.updated_at, expires_at = NULL
+                   WHERE geocodes.lat IS NULL""",
+                [(_key(name), name, lat, lon, f'seed:{os.path.basename(path)}', now) for name, lat, lon in points])
+            self.conn.execute("INSERT OR REPLACE INTO seeds (path, fingerprint) VALUES (?, ?)", (path, fingerprint))
+            self.conn.commit()
+        print(f"  Geocode store: seeded {len(points)} locations from {path}")
+        return len(points)
+
+    def get(self, name):
+        """(found, (lat, lon) or None).  found is False for unknown names and expired negatives."""
+        with self.lock:
+            row = self.conn.execute("SELECT lat, lon, expires_at FROM geocodes WHERE key = ?",
+                                    (_key(name),)).fetchone()
+        if row is None or (row[2] is not None and row[2] <= time.time()):
+            self.misses += 1
+            return False, None
+        if row[0] is None:
+            self.negative_hits += 1
+            return True, None
+        self.hits += 1
+        return True, (row[0], row[1])
+
+    def put(self, name, coords, source='ors', ttl_seconds=None):
+        """Store a geocode, or a negative entry (coords None) that expires after ttl_seconds."""
+        now = time.time()
+        lat, lon = coords if coords is not None else (None, None)
+        if coords is None and ttl_seconds is None:
+            ttl_seconds = NO_RESULT_TTL_SECONDS
+        expires_at = now + ttl_seconds if ttl_seconds is not None else None
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (_key(name), str(name), lat, lon, source, now, expires_at))
+            self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            positive, negative = self.conn.execute(
+                "SELECT COUNT(lat), COUNT(*) - COUNT(lat) FROM geocodes").fetchone()
+        return dict(hits=self.hits, negative_hits=self.negative_hits, misses=self.misses,
+                    positive_entries=positive, negative_entries=negative)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def default_store():
+    """The store at GEOCODE_STORE_PATH, opened (and seeded) on first use."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = GeocodeStore()
+    return _default_store
+
+
+def geocode_location(location_name, ors_client, is_city_from_csv=False, store=None):
+    """(lat, lon) of a location, from the store or else the ORS geocoder; None if it cannot be found."""
+    store = default_store() if store is None else store
+    found, coords = store.get(location_name)
+    if found:
+        return coords
+    print(f"  Geocoding via API: {location_name} ...") # Indicate API call
+    search_text = location_name
+    if is_city_from_csv and "," not in location_name: # Add ", India" for potentially ambiguous city names from CSV
+        search_text = f"{location_name}, India"
+    try:
+        # Rate limiting and retries are handled by the client
+        geocode_result = ors_client.pelias_search(text=search_text, size=1, boundary_country=['IND'])
+    except OrsError as e:
+        print(f"    API ERROR geocoding {location_name}: {e}")
+        store.put(location_name, None, source='error', ttl_seconds=ERROR_TTL_SECONDS)
+        return None
+    except Exception as e:
+        print(f"    OTHER ERROR geocoding {location_name}: {e}")
+        store.put(location_name, None, source='error', ttl_seconds=ERROR_TTL_SECONDS)
+        return None
+
+    if geocode_result and geocode_result.get('features'):
+        coords_lon_lat = geocode_result['features'][0]['geometry']['coordinates']
+        result = (coords_lon_lat[1], coords_lon_lat[0]) # (lat, lon)
+        store.put(location_name, result)
+        print(f"    API SUCCESS: {location_name} -> {result}")
+        return result
+    print(f"    API WARNING: Could not geocode {location_name}.")
+    store.put(location_name, None)
+    return None
@@ -0,0 +1,239 @@
+"""Refuelling over a chain of routes, with fuel carried from one leg into the next.
+
+    python itinerary.py                                    # the longest chain in route_config
+    python itinerary.py "Raigarh - Toranagallu" "Toranagallu - Baghola" --start-fuel 150
+
+Planning one route at a time makes every leg arrive with `end_fuel` and never
+buys on one leg for the next, however cheap its diesel.  An Itinerary joins
+the legs' districts into one route and solves it with fuel_solver's exact
+greedy.  A leg's last district and the next leg's first are linked by the
+great-circle distance between them, which is zero when they are the same
+district.  The arrival minimums are:
+
+    buffer_fuel     everywhere
+    leg_end_fuel    at the end of every leg but the last (optional)
+    end_fuel        at the end of the trip
+
+`reprice` applies new prices, e.g. after one leg's quotes change.  Segment
+fuel, purchase bounds and feasibility do not depend on prices and are kept.
+The trip's RoutePriceIndex re-finds only the next-cheaper entries the change
+can affect, so every purchase before the first entry that moved (the solved
+prefix) stands.  The greedy walk resumes there and stops where it rejoins the
+old plan past the last entry that moved (the solved suffix), since from there
+on it would retrace it.
+"""
+import argparse
+import time
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+from fuel_solver import (MIN_PURCHASE_LITRES, STATUS_INFEASIBLE, STATUS_OPTIMAL, greedy_purchases, min_levels,
+                         plan_from_purchases, purchase_bounds, resume_greedy_purchases, solve_refuelling)
+from geo_distance import haversine_km
+from price_index import RoutePriceIndex
+from route_config import routes_to_process_config
+from vehicles import TANK_CAPACITY
+
+LEG_COLUMNS = ['Leg', 'Route', 'Km', 'Start Fuel (L)', 'Purchased Fuel (L)', 'Fuel Cost (₹)', 'Arrival Fuel (L)',
+               'Stops']
+
+
+def route_chains(routes_config=routes_to_process_config):
+    """Every maximal chain of configured routes where each route starts in the city the previous one ends in,
+    longest first."""
+    ends = {name: (route['cities'][0], route['cities'][-1]) for name, route in routes_config.items()}
+    starting_in = {}
+    for name, (start, _) in ends.items():
+        starting_in.setdefault(start, []).append(name)
+    chains = []
+    for name, (start, _) in ends.items():
+        if any(ends[other][1] == start for other in ends if other != name):
+            continue
+        chain, seen = [name], {name}
+        while True:
+            following = [other for other in starting_in.get(ends[chain[-1]][1], []) if other not in seen]
+            if not following:
+                break
+            chain.append(following[0])
+            seen.add(following[0])
+        chains.append(chain)
+    return sorted(chains, key=len, reverse=True)
+
+
+def check_chain(route_names, routes_config=routes_to_process_config):
+    """ValueError if a configured route does not start where the previous configured route ends."""
+    for previous, name in zip(route_names, route_names[1:]):
+        if previous in routes_config and name in routes_config:
+            arrival, departure = routes_config[previous]['cities'][-1], routes_config[name]['cities'][0]
+            if arrival != departure:
+                raise ValueError(f"'{name}' starts in {departure}, but '{previous}' ends in {arrival}")
+
+
+class Itinerary:
+    def __init__(self, legs, mileage, start_fuel, end_fuel=None, buffer_fuel=30.0, tank_capacity=TANK_CAPACITY,
+                 leg_end_fuel=None):
+        """`legs` are route_table.RouteViews in driving order."""
+        if not legs:
+            raise ValueError("An itinerary needs at least one leg")
+        self.legs = [leg.name for leg in legs]
+        self.leg_offsets = np.concatenate(([0], np.cumsum([len(leg) for leg in legs])))
+        self.districts = np.concatenate([leg.districts for leg in legs])
+        self.start_fuel = float(start_fuel)
+        self.end_fuel, self.buffer_fuel, self.tank_capacity = end_fuel, buffer_fuel, tank_capacity
+        self.leg_end_fuel = leg_end_fuel
+
+        segment_km, chainage, trip_km = [], [], 0.0
+        for k, leg in enumerate(legs):
+            chainage.append(trip_km + leg.chainage - leg.chainage[0])
+            segment_km.append(leg.segment_km[:-1])
+            trip_km += leg.chainage[-1] - leg.chainage[0]
+            if k + 1 < len(legs):
+                join_km = float(haversine_km(leg.lat[-1], leg.lon[-1], legs[k + 1].lat[0], legs[k + 1].lon[0]))
+                segment_km.append([join_km])
+                trip_km += join_km
+        self.chainage = np.concatenate(chainage)
+        self.segment_km = np.concatenate(segment_km)
+        self.segments = self.segment_km / mileage
+
+        n = len(self.districts)
+        self.min_level = min_levels(n, buffer_fuel, end_fuel)
+        if leg_end_fuel is not None:
+            leg_ends = self.leg_offsets[1:-1] - 1
+            self.min_level[leg_ends] = np.maximum(self.min_level[leg_ends], leg_end_fuel)
+        self.lower, self.upper = purchase_bounds(self.segments, start_fuel, self.min_level, tank_capacity)
+        self.feasible = buffer_fuel <= start_fuel <= tank_capacity and bool(np.all(self.lower <= self.upper + 1e-9))
+
+        self.index = RoutePriceIndex(self.chainage, np.concatenate([leg.price for leg in legs]))
+        self.bought = greedy_purchases(self.index.next_cheaper, self.lower, self.upper) if n >= 2 else np.zeros(0)
+        self.last_refresh = {}
+
+    def __len__(self):
+        return len(self.districts)
+
+    def plan(self):
+        """The trip's RefuelPlan, one entry per district of every leg."""
+        purchase = np.zeros(len(self))
+        if self.feasible and len(self) >= 2:
+            purchase = np.diff(np.concatenate(([0.0], self.bought, [self.bought[-1]])))
+        return plan_from_purchases(self.index.prices, self.segments, self.start_fuel, purchase,
+                                   STATUS_OPTIMAL if self.feasible else STATUS_INFEASIBLE)
+
+    def reprice(self, prices, leg=None):
+        """Apply new prices: for every district of the trip, or for leg number `leg` only.
+        Returns how many greedy steps were re-walked."""
+        started = time.perf_counter()
+        lo, hi = (0, len(self)) if leg is None else (self.leg_offsets[leg], self.leg_offsets[leg + 1])
+        prices = np.asarray(prices, dtype=float)
+        old = self.index.prices[lo:hi]
+        changed = lo + np.flatnonzero(~((old == prices) | (np.isnan(old) & np.isnan(prices))))
+        moved = self.index.update_many(changed, prices[changed - lo])
+        walked = 0
+        if len(moved) and len(self.bought):
+            walked = resume_greedy_purchases(self.index.next_cheaper, self.lower, self.upper, self.bought,
+                                             int(moved.min()), int(moved.max()) + 1)
+        self.last_refresh = {'prices': len(changed), 'moved': len(moved), 'walked': walked,
+                             'steps': len(self.bought), 'seconds': time.perf_counter() - started}
+        return walked
+
+    def leg_table(self, plan=None):
+        """Per-leg fuel and cost of a plan of this itinerary (its own by default)."""
+        plan = self.plan() if plan is None else plan
+        rows = []
+        for k, name in enumerate(self.legs):
+            lo, hi = self.leg_offsets[k], self.leg_offsets[k + 1]
+            purchase = plan.purchase[lo:hi]
+            rows.append((k + 1, name, self.chainage[hi - 1] - self.chainage[lo], plan.fuel_level[lo],
+                         purchase.sum(), purchase @ plan.prices[lo:hi], plan.fuel_level[hi - 1],
+                         '; '.join(f"{self.districts[lo + i]} {purchase[i]:.1f} L"
+                                   for i in np.flatnonzero(purchase > MIN_PURCHASE_LITRES))))
+        return pd.DataFrame(rows, columns=LEG_COLUMNS)
+
+    def leg_by_leg(self):
+        """The same trip planned one leg at a time, as app.py does: every leg must arrive with `end_fuel` (and
+        `leg_end_fuel`), and the next leg starts with what is left.  One RefuelPlan over the whole trip,
+        Infeasible if any leg is."""
+        purchase = np.zeros(len(self))
+        fuel, status = self.start_fuel, STATUS_OPTIMAL
+        leg_end = max(level for level in (self.end_fuel, self.leg_end_fuel) if level is not None) \
+            if self.end_fuel is not None or self.leg_end_fuel is not None else None
+        for k in range(len(self.legs)):
+            lo, hi = self.leg_offsets[k], self.leg_offsets[k + 1]
+            leg_plan = solve_refuelling(self.index.prices[lo:hi], self.segments[lo:hi - 1], fuel,
+                                        self.end_fuel if hi == len(self) else leg_end, self.buffer_fuel,
+                                        self.tank_capacity)
+            if not leg_plan.is_optimal:
+                status = STATUS_INFEASIBLE
+                break
+            purchase[lo:hi] = leg_plan.purchase
+            if hi < len(self):
+                fuel = leg_plan.fuel_level[-1] - self.segments[hi - 1]
+        return plan_from_purchases(self.index.prices, self.segments, self.start_fuel, purchase, status,
+                                   solver="greedy per leg")
+
+
+def main():
+    from geo_distance import add_route_distances
+    from route_chainage import add_road_chainage
+    from route_table import RouteTable
+    from table_cache import read_table
+    from vehicles import vehicle_mileage
+
+    parser = argparse.ArgumentParser(description="Plan refuelling over a chain of routes, carrying fuel across legs.")
+    parser.add_argument('routes', nargs='*', help="Route names in driving order (default: the longest configured chain)")
+    parser.add_argument('--workbook', default='routes_districts_prices_filled_mean.xlsx')
+    parser.add_argument('--vehicle', default=next(iter(vehicle_mileage)))
+    parser.add_argument('--load', default='Load', choices=['Load', 'Empty'])
+    parser.add_argument('--start-fuel', type=float, default=200.0)
+    parser.add_argument('--end-fuel', type=float, default=50.0)
+    parser.add_argument('--buffer-fuel', type=float, default=30.0)
+    parser.add_argument('--leg-end-fuel', type=float, default=None, help="Minimum fuel at the end of every leg (L)")
+    args = parser.parse_args()
+
+    route_names = args.routes or route_chains()[0]
+    try:
+        check_chain(route_names)
+    except ValueError as error:
+        raise SystemExit(str(error))
+    table = RouteTable(add_road_chainage(add_route_distances(read_table(args.workbook))))
+    unknown = [name for name in route_names if name not in table.names]
+    if unknown:
+        raise SystemExit(f"No route {', '.join(repr(name) for name in unknown)} in {args.workbook}.")
+    legs = [table.route(name) for name in route_names]
+    mileage = vehicle_mileage[args.vehicle][args.load]
+
+    started = time.perf_counter()
+    itinerary = Itinerary(legs, mileage, args.start_fuel, args.end_fuel, args.buffer_fuel,
+                          leg_end_fuel=args.leg_end_fuel)
+    plan = itinerary.plan()
+    elapsed = time.perf_counter() - started
+    print(f"{' -> '.join(route_names)}: {len(itinerary)} districts, {itinerary.chainage[-1]:.0f} km, "
+          f"solved in {elapsed * 1000:.1f} ms")
+    if not plan.is_optimal:
+        raise SystemExit(f"No feasible plan over the whole trip ({plan.status}).")
+    print(itinerary.leg_table(plan).round(2).to_string(index=False))
+
+    separate = itinerary.leg_by_leg()
+    if separate.is_optimal:
+        print(f"Trip plan ₹{plan.total_cost:.2f} ({plan.total_fuel:.1f} L) vs leg by leg ₹{separate.total_cost:.2f} "
+              f"({separate.total_fuel:.1f} L): saves ₹{separate.total_cost - plan.total_cost:.2f}")
+    else:
+        print(f"Trip plan ₹{plan.total_cost:.2f}; planned leg by leg the trip is {separate.status.lower()}")
+
+    # Re-plan after each leg's prices rise by 1 ₹/L, against solving the trip from scratch
+    for k, leg in enumerate(legs):
+        walked = itinerary.reprice(leg.price + 1.0, leg=k)
+        refresh = itinerary.last_refresh
+        started = time.perf_counter()
+        fresh = Itinerary([replace(other, price=other.price + 1.0) if i == k else other for i, other in enumerate(legs)],
+                          mileage, args.start_fuel, args.end_fuel, args.buffer_fuel, leg_end_fuel=args.leg_end_fuel)
+        full_seconds = time.perf_counter() - started
+        assert np.allclose(fresh.bought, itinerary.bought)
+        print(f"  Leg {k + 1} prices +1: {refresh['moved']} next-cheaper entries moved, re-walked {walked} of "
+              f"{refresh['steps']} steps in {refresh['seconds'] * 1000:.2f} ms (full solve {full_seconds * 1000:.2f} ms)")
+        itinerary.reprice(leg.price, leg=k)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""Route maps for the app: one cached base map per route and a light overlay per run.
+
+    python map_render.py "Toranagallu - Baghola"                 # payload and timing
+    python map_render.py "Toranagallu - Baghola" --output map.html
+
+app.py used to build a new folium.Map on every rerun, with one Marker or
+CircleMarker object per district, and st_folium re-mounted it each time.
+Here the map is split in two:
+
+    base_map(...)       tiles, the simplified road line and the view; built
+                        once per route (and route file version), then reused
+    stop_overlay(...)   the run's districts as ONE GeoJSON layer of canvas
+                        circle markers, clustered where they overlap
+
+`show_map` hands the base map to st_folium with the overlay as its dynamic
+feature group.  The base map's script is the same on every rerun, so the
+component keeps its key and only the overlay is redrawn.  The map returns no
+state, so panning or zooming does not rerun the script either.
+
+The road line is simplified and cached the same way as the pipeline's render
+stage does it (per route file, under .pipeline/render), at the coarser
+ROUTE_MAP_TOLERANCE.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import folium
+import numpy as np
+from folium.plugins import MarkerCluster
+
+from district_geometry import simplify_line
+from fuel_solver import MIN_PURCHASE_LITRES
+from plan_cache import file_fingerprint
+from route_chainage import ROUTES_GEOJSON_DIR, route_geojson_path
+
+# Shared with the pipeline's render stage
+RENDER_CACHE_DIR = os.path.join('.pipeline', 'render')
+# Simplification (degrees) of route lines: ~50 m on the pipeline's overview map, ~200 m on the app's route
+# map, where it is under a pixel or two at the zoom levels a route is viewed at
+ROUTE_RENDER_TOLERANCE = 0.0005
+ROUTE_MAP_TOLERANCE = 0.002
+MAP_TILES = 'OpenStreetMap'
+# Markers closer than this on screen merge into a cluster
+CLUSTER_RADIUS_PX = 30
+# (colour, radius in px) of each kind of district marker
+MARKER_STYLES = {'stop': ('green', 9), 'cheapest': ('orange', 8), 'district': ('blue', 5)}
+
+
+def route_layer(path, cache_dir=RENDER_CACHE_DIR, tolerance=ROUTE_RENDER_TOLERANCE):
+    """Simplified route GeoJSON for drawing, cached per route file version and tolerance;
+    None if the file is missing."""
+    fingerprint = file_fingerprint(path)
+    if fingerprint is None:
+        return None
+    cache_path = os.path.join(cache_dir, f"{fingerprint}_{tolerance:g}.json")
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    with open(path, 'r', encoding='utf-8') as f:
+        route_geojson = json.load(f)
+    for feature in route_geojson.get('features', []):
+        geometry = feature['geometry']
+        if geometry['type'] == 'LineString':
+            line = np.asarray(geometry['coordinates'], dtype=float)[:, :2]
+            geometry['coordinates'] = np.round(simplify_line(line, tolerance), 5).tolist()
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(route_geojson, f, ensure_ascii=False, indent=2)
+    print(f"  Simplified route layer for {os.path.basename(path)}")
+    return route_geojson
+
+
+_base_maps = {}
+
+
+def base_map(route_name, lat, lon, routes_dir=ROUTES_GEOJSON_DIR):
+    """The route's base map, built once per route file version and framed on its districts (lat/lon)."""
+    path = route_geojson_path(route_name, routes_dir)
+    key = (route_name, file_fingerprint(path))
+    if key in _base_maps:
+        return _base_maps[key]
+
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    route_map = folium.Map(location=[float(np.nanmean(lat)), float(np.nanmean(lon))], zoom_start=6,
+                           tiles=MAP_TILES, prefer_canvas=True)
+    road = route_layer(path, tolerance=ROUTE_MAP_TOLERANCE)
+    if road is not None:
+        folium.GeoJson(road, name='Road',
+                       style_function=lambda x: {'color': '#3366cc', 'weight': 4, 'opacity': 0.7}).add_to(route_map)
+    route_map.fit_bounds([[float(np.nanmin(lat)), float(np.nanmin(lon))],
+                          [float(np.nanmax(lat)), float(np.nanmax(lon))]])
+    _base_maps[key] = route_map
+    return route_map
+
+
+def stop_features(route, purchase, cheapest_idx=-1, cheapest_note=''):
+    """GeoJSON FeatureCollection of a route_table.RouteView's districts, tagged 'stop', 'cheapest' or 'district'."""
+    features = []
+    for i in range(len(route)):
+        kind = 'stop' if purchase[i] > MIN_PURCHASE_LITRES else 'cheapest' if i == cheapest_idx else 'district'
+        label = f"{route.districts[i]}<br>Price: ₹{route.price[i]:.2f}/L"
+        if route.imputed[i]:
+            label += " (est.)"
+        if kind == 'stop':
+            label += f"<br>Buy {purchase[i]:.1f} L"
+        elif kind == 'cheapest' and cheapest_note:
+            label = f"{cheapest_note}<br>{label}"
+        features.append({'type': 'Feature', 'id': str(i),
+                         'geometry': {'type': 'Point',
+                                      'coordinates': [round(float(route.lon[i]), 5), round(float(route.lat[i]), 5)]},
+                         'properties': {'kind': kind, 'label': label}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def _marker_style(feature):
+    colour, radius = MARKER_STYLES[feature['properties']['kind']]
+    return {'color': colour, 'fillColor': colour, 'fillOpacity': 0.8, 'weight': 1, 'radius': radius}
+
+
+def stop_overlay(route, purchase, cheapest_idx=-1, cheapest_note=''):
+    """One run's districts as a single clustered GeoJSON layer, in a FeatureGroup for st_folium."""
+    overlay = folium.FeatureGroup(name='Stops')
+    cluster = MarkerCluster(options={'maxClusterRadius': CLUSTER_RADIUS_PX, 'showCoverageOnHover': False})
+    folium.GeoJson(stop_features(route, purchase, cheapest_idx, cheapest_note), marker=folium.CircleMarker(),
+                   style_function=_marker_style,
+                   tooltip=folium.GeoJsonTooltip(['label'], labels=False)).add_to(cluster)
+    cluster.add_to(overlay)
+    return overlay
+
+
+# st_folium attaches the overlay to the map it is given, so a shared base map is drawn by one session at a time
+_draw_lock = threading.Lock()
+
+
+def show_map(route_map, overlay, key, width=700, height=500):
+    """Draw a cached base map with this run's overlay in Streamlit."""
+    from streamlit_folium import st_folium
+
+    with _draw_lock:
+        try:
+            return st_folium(route_map, key=key, width=width, height=height, feature_group_to_add=overlay,
+                             returned_objects=[])
+        finally:
+            # Detach the overlay again, leaving the cached base map as built
+            route_map._children.pop(overlay.get_name(), None)
+
+
+if __name__ == '__main__':
+    from fuel_solver import solve_refuelling
+    from geo_distance import add_route_distances
+    from route_chainage import add_road_chainage
+    from route_table import RouteTable
+    from table_cache import read_table
+    from vehicles import TANK_CAPACITY, vehicle_mileage
+
+    parser = argparse.ArgumentParser(description="Build one route's map and report its payload.")
+    parser.add_argument('route', help="Route name, e.g. 'Toranagallu - Baghola'")
+    parser.add_argument('--workbook', default='routes_districts_prices_filled_mean.xlsx')
+    parser.add_argument('--output', default=None, help="Also save the map as standalone HTML")
+    args = parser.parse_args()
+
+    table = RouteTable(add_road_chainage(add_route_distances(read_table(args.workbook))))
+    route = table.route(args.route)
+    mileage = next(iter(next(iter(vehicle_mileage.values())).values()))
+    plan = solve_refuelling(route.price, route.segment_km[:-1] / mileage, 200.0, 50.0, 30.0, TANK_CAPACITY)
+
+    started = time.perf_counter()
+    route_map = base_map(route.name, route.lat, route.lon)
+    base_html = route_map.get_root().render()
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    base_map(route.name, route.lat, route.lon)
+    warm = time.perf_counter() - started
+    started = time.perf_counter()
+    overlay = stop_overlay(route, plan.purchase)
+    overlay.add_to(route_map)
+    full_html = route_map.get_root().render()
+    overlay_seconds = time.perf_counter() - started
+
+    print(f"{route.name}: {len(route)} districts, {int((plan.purchase > MIN_PURCHASE_LITRES).sum())} stops")
+    print(f"  Base map: {len(base_html.encode()) / 1024:.1f} KB, built in {cold * 1000:.1f} ms "
+          f"({warm * 1000:.3f} ms when cached)")
+    print(f"  Overlay:  {(len(full_html.encode()) - len(base_html.encode())) / 1024:.1f} KB, "
+          f"built in {overlay_seconds * 1000:.1f} ms")
+    if args.output:
+        route_map.save(args.output)
+        print(f"Map saved to: {args.output}")
@@ -0,0 +1,206 @@
+"""Rate-limited, concurrent OpenRouteService client.
+
+Replaces openrouteservice.Client plus the fixed `time.sleep(1.6)` after every
+call in the route scripts.  Each endpoint family (geocode, directions, matrix)
+has a token bucket sized to its ORS quota, so calls go out back-to-back until
+the burst allowance is spent and then at the quota rate.  Up to
+`max_concurrency` requests are in flight at once; `map` runs a function over
+many items on the client's thread pool.
+
+429 and 5xx responses (and connection errors) are retried with exponential
+backoff and jitter, honouring Retry-After; a 429 also pauses the endpoint's
+bucket for every thread.  Per-endpoint latency, retry and error counts are
+available from `stats()` / `report()`.
+
+Point `ors_base_url` in config.json at `python ors_stub_server.py` to run the
+scripts without an API key or network access.
+"""
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+ORS_BASE_URL = 'https://api.openrouteservice.org'
+CONFIG_FILE_PATH = 'config.json'
+
+# Requests per minute of the free ORS plan, per endpoint family
+DEFAULT_RATE_LIMITS = {'geocode': 100, 'directions': 40, 'matrix': 40}
+DEFAULT_BURST = 10
+DEFAULT_MAX_CONCURRENCY = 4
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_BACKOFF_SECONDS = 60.0
+
+
+class OrsError(Exception):
+    """A request that failed for good (non-retryable status or retries exhausted)."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate_per_minute` refill, up to `burst` tokens."""
+
+    def __init__(self, rate_per_minute, burst=DEFAULT_BURST):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Take one token, sleeping until one is available; returns the time waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds):
+        """Hold back every caller for at least `seconds` (after a 429)."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 1.0 - seconds * self.rate)
+
+
+class OrsClient:
+    def __init__(self, api_key, base_url=ORS_BASE_URL, rate_limits=None, burst=DEFAULT_BURST,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, max_retries=5, backoff_seconds=1.0, timeout=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        limits = dict(DEFAULT_RATE_LIMITS, **(rate_limits or {}))
+        self.buckets = {endpoint: TokenBucket(rate, burst) for endpoint, rate in limits.items()}
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._pool = None
+        self._session = requests.Session()
+        self._session.headers.update({'Authorization': api_key, 'Accept': 'application/json, application/geo+json'})
+        self._metrics_lock = threading.Lock()
+        self._latencies = {endpoint: [] for endpoint in limits}
+        self._counts = {endpoint: {'retries': 0, 'errors': 0, 'throttled_seconds': 0.0} for endpoint in limits}
+
+    @classmethod
+    def from_config(cls, path=CONFIG_FILE_PATH, **kwargs):
+        """Client configured from config.json: `openrouteservice_api_key` plus the
+        optional `ors_base_url`, `ors_rate_limits` and `ors_max_concurrency`."""
+        with open(path) as f:
+            config = json.load(f)
+        return cls(config['openrouteservice_api_key'],
+                   base_url=config.get('ors_base_url', ORS_BASE_URL),
+                   rate_limits=config.get('ors_rate_limits'),
+                   max_concurrency=config.get('ors_max_concurrency', DEFAULT_MAX_CONCURRENCY), **kwargs)
+
+    def _retry_delay(self, attempt, response):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), MAX_BACKOFF_SECONDS)
+            except ValueError:
+                pass
+        return min(self.backoff_seconds * 2 ** attempt * (0.5 + random.random()), MAX_BACKOFF_SECONDS)
+
+    def _request(self, endpoint, method, path, params=None, body=None):
+        bucket = self.buckets[endpoint]
+        for attempt in range(self.max_retries + 1):
+            waited = bucket.acquire()
+            response, error = None, None
+            with self._slots:
+                started = time.perf_counter()
+                try:
+                    response = self._session.request(method, self.base_url + path, params=params, json=body,
+                                                     timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+                latency = time.perf_counter() - started
+            with self._metrics_lock:
+                self._latencies[endpoint].append(latency)
+                self._counts[endpoint]['throttled_seconds'] += waited
+
+            if response is not None and response.status_code < 400:
+                return response.json()
+            retryable = error is not None or response.status_code in RETRY_STATUS_CODES
+            if not retryable or attempt == self.max_retries:
+                with self._metrics_lock:
+                    self._counts[endpoint]['errors'] += 1
+                if error is not None:
+                    raise OrsError(f"{endpoint} request failed: {error}")
+                raise OrsError(f"{endpoint} request failed with HTTP {response.status_code}: {response.text[:200]}",
+                               status_code=response.status_code)
+
+            delay = self._retry_delay(attempt, response)
+            if response is not None and response.status_code == 429:
+                bucket.pause(delay)
+            with self._metrics_lock:
+                self._counts[endpoint]['retries'] += 1
+            time.sleep(delay)
+
+    def pelias_search(self, text, size=1, boundary_country=None):
+        """Forward geocode (GET /geocode/search); returns the GeoJSON response."""
+        params = {'text': text, 'size': size}
+        if boundary_country:
+            params['boundary.country'] = ','.join(boundary_country)
+        return self._request('geocode', 'GET', '/geocode/search', params=params)
+
+    def directions(self, coordinates, profile='driving-car', format='geojson', instructions=False):
+        """Route through [lon, lat] coordinates (POST /v2/directions/{profile}/{format})."""
+        return self._request('directions', 'POST', f'/v2/directions/{profile}/{format}',
+                             body={'coordinates': coordinates, 'instructions': instructions})
+
+    def matrix(self, locations, profile='driving-car', sources=None, destinations=None, metrics=('distance',)):
+        """Many-to-many distances/durations between [lon, lat] locations (POST /v2/matrix/{profile}).
+        Distances are in metres; unroutable pairs are None."""
+        body = {'locations': locations, 'metrics': list(metrics)}
+        if sources is not None:
+            body['sources'] = list(sources)
+        if destinations is not None:
+            body['destinations'] = list(destinations)
+        return self._request('matrix', 'POST', f'/v2/matrix/{profile}', body=body)
+
+    def map(self, fn, items):
+        """fn(item) for every item on the client's thread pool, results in input order."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='ors')
+        return list(self._pool.map(fn, items))
+
+    def stats(self):
+        """Per endpoint: calls, latency percentiles (s), retries, errors and time spent throttled."""
+        with self._metrics_lock:
+            stats = {}
+            for endpoint, latencies in self._latencies.items():
+                if not latencies:
+                    continue
+                latencies = np.asarray(latencies)
+                stats[endpoint] = dict(calls=len(latencies), mean=float(latencies.mean()),
+                                       p50=float(np.percentile(latencies, 50)),
+                                       p95=float(np.percentile(latencies, 95)), max=float(latencies.max()),
+                                       **self._counts[endpoint])
+            return stats
+
+    def report(self):
+        for endpoint, s in self.stats().items():
+            print(f"  ORS {endpoint}: {s['calls']} calls, latency mean {s['mean'] * 1000:.0f} ms / "
+                  f"p95 {s['p95'] * 1000:.0f} ms, {s['retries']} retries, {s['errors']} errors, "
+                  f"{s['throttled_seconds']:.1f} s throttled")
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        self._session.close()
@@ -0,0 +1,171 @@
+"""Local stand-in for the OpenRouteService endpoints the route scripts use.
+
+Usage:
+    python ors_stub_server.py --port 8089 --latency 0.05 --error-rate 0.1
+
+then set "ors_base_url": "http://127.0.0.1:8089" in config.json.
+
+Geocoding returns the coordinates from route_config.py for known cities and a
+deterministic point inside India (derived from the text) for anything else;
+texts containing 'nowhere' return no features.  Directions return a straight
+polyline between the coordinates, and directions and matrix both report the
+same road-like distance (1.3 x great circle).  --error-rate answers that
+fraction of requests with 429 or 503 to exercise the client's retries.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from geo_distance import haversine_km
+from route_config import cities_coords_provided
+
+ROAD_FACTOR = 1.3
+# Same cap as the public ORS matrix endpoint
+MATRIX_MAX_PAIRS = 3500
+SPEED_KMH = 50.0
+
+
+def stub_geocode(text):
+    """(lat, lon) for a search text, or None."""
+    if 'nowhere' in text.lower():
+        return None
+    for name in (text, text.removesuffix(', India')):
+        if name in cities_coords_provided:
+            return cities_coords_provided[name]
+    digest = hashlib.sha256(text.strip().lower().encode('utf-8')).digest()
+    return 8.0 + 24.0 * digest[0] / 255, 69.0 + 20.0 * digest[1] / 255
+
+
+def stub_distance_m(a, b):
+    """Road-like distance in metres between two [lon, lat] points."""
+    return float(haversine_km(a[1], a[0], b[1], b[0])) * ROAD_FACTOR * 1000.0
+
+
+class OrsStubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    error_rate = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _check(self):
+        """Simulated latency, auth and injected failures; True if the request may proceed."""
+        time.sleep(self.latency)
+        if not self.headers.get('Authorization'):
+            self._send(403, {'error': 'Access to this API has been disallowed'})
+            return False
+        if random.random() < self.error_rate:
+            if random.random() < 0.5:
+                self._send(429, {'error': 'Rate Limit Exceeded'}, {'Retry-After': '0.2'})
+            else:
+                self._send(503, {'error': 'Service Unavailable'})
+            return False
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/geocode/search':
+            self._send(404, {'error': f'Unknown endpoint {url.path}'})
+            return
+        if not self._check():
+            return
+        text = parse_qs(url.query).get('text', [''])[0]
+        coords = stub_geocode(text)
+        features = [] if coords is None else [{
+            'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [coords[1], coords[0]]},
+            'properties': {'label': text, 'confidence': 1.0}}]
+        self._send(200, {'type': 'FeatureCollection', 'features': features})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        except ValueError:
+            self._send(400, {'error': 'Invalid JSON body'})
+            return
+        if len(parts) == 4 and parts[:2] == ['v2', 'directions']:
+            if self._check():
+                self._directions(request)
+        elif len(parts) == 3 and parts[:2] == ['v2', 'matrix']:
+            if self._check():
+                self._matrix(request)
+        else:
+            self._send(404, {'error': f'Unknown endpoint {url.path}'})
+
+    def _matrix(self, request):
+        locations = request.get('locations') or []
+        sources = request.get('sources', list(range(len(locations))))
+        destinations = request.get('destinations', list(range(len(locations))))
+        if len(sources) * len(destinations) > MATRIX_MAX_PAIRS:
+            self._send(400, {'error': {'code': 6004, 'message': f'Request exceeds {MATRIX_MAX_PAIRS} routes'}})
+            return
+        distances = [[round(stub_distance_m(locations[s], locations[d]), 2) for d in destinations] for s in sources]
+        response = {'sources': [{'location': locations[s]} for s in sources],
+                    'destinations': [{'location': locations[d]} for d in destinations]}
+        if 'distance' in request.get('metrics', ['duration']):
+            response['distances'] = distances
+        if 'duration' in request.get('metrics', ['duration']):
+            response['durations'] = [[d / 1000.0 / SPEED_KMH * 3600.0 for d in row] for row in distances]
+        self._send(200, response)
+
+    def _directions(self, request):
+        coordinates = request.get('coordinates') or []
+        if len(coordinates) < 2:
+            self._send(400, {'error': {'code': 2003, 'message': 'Need at least two coordinates'}})
+            return
+        line, segments = [], []
+        for a, b in zip(coordinates[:-1], coordinates[1:]):
+            line.extend([a[0] + t * (b[0] - a[0]), a[1] + t * (b[1] - a[1])] for t in np.linspace(0.0, 1.0, 11)[:-1])
+            distance = stub_distance_m(a, b)
+            segments.append({'distance': distance, 'duration': distance / 1000.0 / SPEED_KMH * 3600.0})
+        line.append(list(coordinates[-1]))
+        summary = {'distance': sum(s['distance'] for s in segments), 'duration': sum(s['duration'] for s in segments)}
+        self._send(200, {'type': 'FeatureCollection', 'features': [{
+            'type': 'Feature', 'geometry': {'type': 'LineString', 'coordinates': line},
+            'properties': {'summary': summary, 'segments': segments}}]})
+
+
+def serve(port=8089, latency=0.0, error_rate=0.0):
+    """Start the stub in a background thread and return the server (call .shutdown() to stop)."""
+    handler = type('ConfiguredOrsStubHandler', (OrsStubHandler,), {'latency': latency, 'error_rate': error_rate})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenRouteService stub for testing the route scripts.")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered 429/503")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.error_rate)
+    print(f"ORS stub listening on http://127.0.0.1:{server.server_address[1]} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""Current refuelling plans for every lane, kept up to date from price deltas.
+
+    python plan_book.py                          # replay the price store day by day
+    python plan_book.py --start-fuel 100 200 --output plan_changes.csv
+
+A PlanBook solves every route x vehicle x load x start-fuel plan once (the
+same batch as fuel_batch.py) and indexes which routes, and which positions on
+them, each (district, state) appears at.  `apply_prices` then:
+
+1. keeps only the districts whose price actually moved;
+2. looks up the routes that touch them (nothing else is visited);
+3. updates each such route's RoutePriceIndex, which re-finds only the
+   next-cheaper entries the change can affect;
+4. resumes the batch greedy at the first district whose next-cheaper entry
+   moved, keeping every plan's purchases before it; if none moved, the
+   purchases stand and only their cost is repriced;
+5. reports the plans whose cost or stops changed.
+
+Segment fuel, purchase bounds and feasibility do not depend on prices, so
+they are computed once per route.  The work of a refresh is proportional to
+the routes touched and to how far along them the change reaches.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from fuel_batch import PLAN_COLUMNS, ROUTES_FILE_PATH, batch_inputs, plan_rows, vehicle_states
+from fuel_solver import MIN_PURCHASE_LITRES, greedy_purchases_batch, min_levels, purchase_bounds
+from geo_distance import CHAINAGE_COLUMN, SEGMENT_DISTANCE_COLUMN, add_route_distances
+from price_index import RoutePriceIndex
+from route_chainage import add_road_chainage
+from vehicles import TANK_CAPACITY
+
+CHANGE_COLUMNS = ['Route Name', 'Vehicle', 'Load Status', 'Start Fuel (L)', 'Status', 'Old Cost (₹)',
+                  'New Cost (₹)', 'Cost Change (₹)', 'Stops Changed', 'Stop Plan']
+
+
+class _RoutePlans:
+    """Price-independent inputs and the current plans of one route."""
+
+    def __init__(self, name, districts, chainage, prices, distances, states, start_fuels, end_fuel, buffer_fuel,
+                 tank_capacity):
+        self.name = name
+        self.districts = districts
+        self.index = RoutePriceIndex(chainage, prices)
+        n = len(prices)
+        self.segments, self.starts = batch_inputs(distances, states, start_fuels)
+        levels = np.broadcast_to(min_levels(n, buffer_fuel, end_fuel), (len(self.starts), n))
+        self.lower, self.upper = purchase_bounds(self.segments, self.starts, levels, tank_capacity)
+        self.feasible = (self.starts >= buffer_fuel) & (self.starts <= tank_capacity) \
+            & np.all(self.lower <= self.upper + 1e-9, axis=1)
+        self.bought = greedy_purchases_batch(self.index.next_cheaper, self.lower, self.upper) if n >= 2 \
+            else np.zeros((len(self.starts), 0))
+
+    @property
+    def purchase(self):
+        """Litres bought at each district, one row per plan (as solve_refuelling_batch returns)."""
+        k, n = len(self.starts), self.index.n
+        purchase = np.zeros((k, n))
+        if n >= 2:
+            purchase[:, :n - 1] = self.bought
+            purchase[:, 1:n - 1] = np.diff(self.bought, axis=1)
+            purchase[~self.feasible] = 0.0
+        return purchase
+
+    def reprice(self, positions, prices):
+        """Apply new prices at `positions`; returns how many greedy columns were re-walked."""
+        moved = self.index.update_many(positions, prices)
+        if not len(moved) or self.index.n < 2:
+            return 0
+        start = int(moved.min())
+        greedy_purchases_batch(self.index.next_cheaper, self.lower, self.upper, self.bought, start)
+        return self.index.n - 1 - start
+
+
+class PlanBook:
+    def __init__(self, routes_df, start_fuels=(200.0,), end_fuel=50.0, buffer_fuel=30.0,
+                 tank_capacity=TANK_CAPACITY, vehicles=None):
+        if SEGMENT_DISTANCE_COLUMN not in routes_df.columns or CHAINAGE_COLUMN not in routes_df.columns:
+            routes_df = add_road_chainage(add_route_distances(routes_df))
+        self.states = vehicle_states(vehicles)
+        self.start_fuels = list(start_fuels)
+        self.routes = {}
+        # (district, state) -> [(route name, positions on the route)]
+        self.dependents = {}
+        self.prices = {}
+        districts = routes_df['Intersected District'].to_numpy(dtype=object)
+        states = routes_df['Intersected State'].to_numpy(dtype=object)
+        all_prices = routes_df['Price'].to_numpy(dtype=float)
+        chainage = routes_df[CHAINAGE_COLUMN].to_numpy(dtype=float)
+        distances = routes_df[SEGMENT_DISTANCE_COLUMN].to_numpy(dtype=float)
+        for route_name, rows in routes_df.groupby('Route Name', sort=False).indices.items():
+            self.routes[route_name] = _RoutePlans(
+                route_name, districts[rows], chainage[rows], all_prices[rows], distances[rows][:-1], self.states,
+                self.start_fuels, end_fuel, buffer_fuel, tank_capacity)
+            positions = {}
+            for position, (key, price) in enumerate(zip(zip(districts[rows], states[rows]), all_prices[rows])):
+                positions.setdefault(key, []).append(position)
+                self.prices[key] = price
+            for key, where in positions.items():
+                self.dependents.setdefault(key, []).append((route_name, np.array(where, dtype=np.int64)))
+        self.last_refresh = {}
+
+    def plans(self):
+        """Every current plan, in fuel_batch's table layout."""
+        rows = []
+        for route in self.routes.values():
+            rows.extend(plan_rows(route.name, route.districts, route.index.prices, route.purchase, route.feasible,
+                                  self.states, self.start_fuels))
+        return pd.DataFrame(rows, columns=PLAN_COLUMNS)
+
+    def apply_prices(self, prices):
+        """Bring the plans up to date with new district prices.
+
+        `prices` maps (district, state) to a price: a dict, a Series, or a
+        price_imputation.district_price_table.  It may hold every district or
+        only the ones that moved; districts on no route are ignored.  Returns
+        one row per plan whose cost or stops changed.
+        """
+        started = time.perf_counter()
+        if isinstance(prices, pd.DataFrame):
+            prices = prices['Price']
+        changed = {}
+        for key, price in prices.items():
+            key = tuple(key)
+            old = self.prices.get(key)
+            if key in self.dependents and not (old == price or (np.isnan(old) and np.isnan(price))):
+                changed[key] = float(price)
+
+        touched = {}
+        for key, price in changed.items():
+            self.prices[key] = price
+            for route_name, positions in self.dependents[key]:
+                touched.setdefault(route_name, []).append((positions, price))
+
+        rows, walked = [], 0
+        for route_name, updates in touched.items():
+            route = self.routes[route_name]
+            old_purchase, old_prices = route.purchase, route.index.prices.copy()
+            positions = np.concatenate([where for where, _ in updates])
+            new_prices = np.concatenate([np.full(len(where), price) for where, price in updates])
+            walked += route.reprice(positions, new_prices)
+            rows.extend(self._changes(route, old_purchase, old_prices))
+
+        self.last_refresh = {'districts': len(changed), 'routes': len(touched), 'routes_total': len(self.routes),
+                             'columns_walked': walked, 'plans_changed': len(rows),
+                             'seconds': time.perf_counter() - started}
+        return pd.DataFrame(rows, columns=CHANGE_COLUMNS)
+
+    def _changes(self, route, old_purchase, old_prices):
+        purchase, prices = route.purchase, route.index.prices
+        old_cost, new_cost = old_purchase @ old_prices, purchase @ prices
+        old_stops, new_stops = old_purchase > MIN_PURCHASE_LITRES, purchase > MIN_PURCHASE_LITRES
+        stops_changed = np.any(old_stops != new_stops, axis=1)
+        rows = []
+        for k in np.flatnonzero(stops_changed | ~np.isclose(old_cost, new_cost, rtol=0, atol=0.005)):
+            vehicle, load, _ = self.states[k // len(self.start_fuels)]
+            stop_idx = np.flatnonzero(new_stops[k])
+            rows.append((route.name, vehicle, load, route.starts[k],
+                         'Optimal' if route.feasible[k] else 'Infeasible',
+                         old_cost[k], new_cost[k], new_cost[k] - old_cost[k], bool(stops_changed[k]),
+                         '; '.join(f"{route.districts[i]} {purchase[k, i]:.1f} L" for i in stop_idx)))
+        return rows
+
+    def summary(self):
+        refresh = self.last_refresh
+        return (f"{refresh['districts']} district prices moved; re-planned {refresh['routes']} of "
+                f"{refresh['routes_total']} routes ({refresh['columns_walked']} greedy columns), "
+                f"{refresh['plans_changed']} plans changed, in {refresh['seconds'] * 1000:.1f} ms")
+
+
+def main():
+    from district_matcher import load_matches
+    from price_imputation import district_price_table
+    from price_store import open_price_store
+
+    parser = argparse.ArgumentParser(description="Re-plan only the lanes whose district prices moved.")
+    parser.add_argument('--routes', default=ROUTES_FILE_PATH, help="Route/district/price workbook")
+    parser.add_argument('--start-fuel', type=float, nargs='+', default=[200.0], help="Starting fuel levels (L)")
+    parser.add_argument('--end-fuel', type=float, default=50.0)
+    parser.add_argument('--buffer-fuel', type=float, default=30.0)
+    parser.add_argument('--output', default=None, help="CSV of every plan change")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    book = PlanBook(pd.read_excel(args.routes), args.start_fuel, args.end_fuel, args.buffer_fuel)
+    print(f"Planned {sum(len(route.starts) for route in book.routes.values())} plans on {len(book.routes)} routes "
+          f"in {time.perf_counter() - started:.3f} s")
+
+    store, matches = open_price_store(), load_matches()
+    all_changes = []
+    for date in store.dates():
+        changes = book.apply_prices(district_price_table(store.snapshot(date), matches))
+        print(f"  {date}: {book.summary()}")
+        for row in changes.sort_values('Cost Change (₹)', key=abs, ascending=False).head(5).to_dict('records'):
+            print(f"    {row['Route Name']} / {row['Vehicle']} {row['Load Status']} from {row['Start Fuel (L)']:.0f} L: "
+                  f"₹{row['Old Cost (₹)']:.2f} -> ₹{row['New Cost (₹)']:.2f}"
+                  f"{' (new stops)' if row['Stops Changed'] else ''}")
+        all_changes.append(changes.assign(Date=str(date)))
+    if args.output and all_changes:
+        pd.concat(all_changes).to_csv(args.output, index=False, encoding='utf-8')
+        print(f"Plan changes saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""Content-addressed cache of refuelling plans.
+
+Keys are a SHA-256 over the route's district/price/coordinate arrays and every
+numeric input of the solve, so the same route/vehicle/fuel combination is only
+solved once across reruns, sessions and processes.  Two tiers:
+
+* an in-memory LRU of recent plans, and
+* a SQLite file with size-based eviction (least recently used first).
+
+The SQLite tier remembers fingerprints of the source files it was filled
+from (the price workbook by default) and clears itself when any of them
+changes.
+"""
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from fuel_solver import RefuelPlan
+
+CACHE_FILE_PATH = '.plan_cache.sqlite'
+ROUTES_FILE_PATH = 'routes_districts_prices_filled_mean.xlsx'
+
+_fingerprints = {}
+
+
+def file_fingerprint(path):
+    """SHA-256 of a file's contents, recomputed only when its mtime or size changes."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _fingerprints.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    _fingerprints[path] = (signature, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def plan_key(*arrays, **params):
+    """Hash of the input arrays and the named numeric/string parameters."""
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.asarray(array)
+        if array.dtype.kind in 'OUS':
+            digest.update('\x1f'.join(map(str, array.ravel())).encode('utf-8'))
+        else:
+            digest.update(np.ascontiguousarray(array, dtype=float).tobytes())
+        digest.update(b'\x1e')
+    for name in sorted(params):
+        digest.update(f"{name}={params[name]!r};".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _dump_plan(plan):
+    buffer = io.BytesIO()
+    np.savez(buffer, purchase=plan.purchase, fuel_level=plan.fuel_level, prices=plan.prices)
+    return buffer.getvalue()
+
+
+def _load_plan(blob, status, solver):
+    arrays = np.load(io.BytesIO(blob))
+    return RefuelPlan(purchase=arrays['purchase'], fuel_level=arrays['fuel_level'], prices=arrays['prices'],
+                      status=status, solver=solver)
+
+
+class PlanCache:
+    def __init__(self, path=CACHE_FILE_PATH, memory_items=256, max_disk_bytes=64 * 1024 * 1024,
+                 source_files=(ROUTES_FILE_PATH,)):
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.source_files = tuple(source_files)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = self.disk_hits = self.misses = 0
+        self.saved_seconds = 0.0
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS plans (
+                key TEXT PRIMARY KEY, plan BLOB, status TEXT, solver TEXT,
+                size INTEGER, solve_seconds REAL, last_access REAL);
+            CREATE INDEX IF NOT EXISTS plans_last_access ON plans (last_access);
+            CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, fingerprint TEXT);
+        """)
+        self._sources = None
+        self._check_sources()
+
+    def _check_sources(self):
+        """Drop every cached plan if a source file changed since the plans were stored."""
+        current = {path: file_fingerprint(path) for path in self.source_files}
+        if current == self._sources:
+            return
+        stored = dict(self._db.execute("SELECT path, fingerprint FROM sources"))
+        if stored != current:
+            with self._db:
+                self._db.execute("DELETE FROM plans")
+                self._db.execute("DELETE FROM sources")
+                self._db.executemany("INSERT INTO sources VALUES (?, ?)", current.items())
+            self._memory.clear()
+        self._sources = current
+
+    def get(self, key):
+        with self._lock:
+            self._check_sources()
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                self.saved_seconds += entry[1]
+                return entry[0]
+
+            row = self._db.execute("SELECT plan, status, solver, solve_seconds FROM plans WHERE key = ?",
+                                   (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with self._db:
+                self._db.execute("UPDATE plans SET last_access = ? WHERE key = ?", (time.time(), key))
+            plan = _load_plan(row[0], row[1], row[2])
+            self._remember(key, plan, row[3])
+            self.disk_hits += 1
+            self.saved_seconds += row[3]
+            return plan
+
+    def put(self, key, plan, solve_seconds=0.0):
+        blob = _dump_plan(plan)
+        with self._lock:
+            self._remember(key, plan, solve_seconds)
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 (key, blob, plan.status, plan.solver, len(blob), solve_seconds, time.time()))
+                self._evict()
+
+    def get_or_solve(self, key, solve):
+        plan = self.get(key)
+        if plan is None:
+            started = time.perf_counter()
+            plan = solve()
+            self.put(key, plan, time.perf_counter() - started)
+        return plan
+
+    def _remember(self, key, plan, solve_seconds):
+        self._memory[key] = (plan, solve_seconds)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM plans").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        # Evict down to 90% of the budget so that eviction does not run on every insert
+        excess = total - int(self.max_disk_bytes * 0.9)
+        cutoff = self._db.execute("""
+            SELECT last_access FROM (
+                SELECT last_access, SUM(size) OVER (ORDER BY last_access) AS freed FROM plans)
+            WHERE freed >= ? ORDER BY last_access LIMIT 1""", (excess,)).fetchone()
+        if cutoff is not None:
+            self._db.execute("DELETE FROM plans WHERE last_access <= ?", (cutoff[0],))
+
+    def stats(self):
+        with self._lock:
+            disk_entries, disk_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM plans").fetchone()
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            'saved_seconds': self.saved_seconds,
+            'memory_entries': len(self._memory),
+            'disk_entries': disk_entries,
+            'disk_bytes': disk_bytes,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            with self._db:
+                self._db.execute("DELETE FROM plans")
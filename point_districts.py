@@ -0,0 +1,117 @@
+"""Spatial join of geocoded price points to the district polygons they fall in.
+
+    python point_districts.py        # check cities_with_distances_from_reference.csv
+
+Name matching (district_matcher.py) says which district a CSV city *should*
+be in; the geocoded point says where it *is*.  `check_city_locations` puts
+both side by side, so geocodes such as 'Agar Malwa' landing in Kashmir show up
+as mismatches instead of silently pricing the wrong place:
+
+    ok               point inside the district its name matched
+    mismatch         point inside another district (distance to the named one given)
+    outside          point outside every district polygon (offshore, abroad)
+    unmatched name   the name matched no district; only the located one is known
+    no geocode       no coordinates for the city
+
+Assignment uses DistrictPolygons.assign_points: points sorted by longitude,
+candidate points per district picked by bounding box with two binary searches,
+then an even-odd test against that district's edges only.  50k points take
+about 0.3 s at full resolution.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from district_geometry import DISTRICTS_FILE_PATH
+from district_matcher import DISTRICT_MATCHES_PATH, resolve_cities
+from district_store import open_store
+from geo_distance import haversine_km
+from price_store import price_key
+
+CITY_CHECK_FILE = 'city_district_check.csv'
+SOURCE_CSV_PATH = 'cities_with_distances_from_reference.csv'
+
+STATUS_OK = 'ok'
+STATUS_MISMATCH = 'mismatch'
+STATUS_OUTSIDE = 'outside'
+STATUS_UNMATCHED = 'unmatched name'
+STATUS_NO_GEOCODE = 'no geocode'
+
+
+def locate_points(lat, lon, districts_path=DISTRICTS_FILE_PATH):
+    """Index of the district (in the district store's order) containing each point, or -1."""
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    located = np.full(len(lat), -1, dtype=np.int64)
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    if valid.any():
+        located[valid] = open_store(districts_path).polygons().assign_points(lon[valid], lat[valid])
+    return located
+
+
+def check_city_locations(cities, lat, lon, districts_path=DISTRICTS_FILE_PATH, matches_path=DISTRICT_MATCHES_PATH):
+    """One row per city: where its point falls, which district its name matched, and a status."""
+    started = time.perf_counter()
+    cities = [str(city) for city in cities]
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    store = open_store(districts_path)
+    names, states, centroids = store.meta['names'], store.meta['states'], store.centroids
+    index = {(name, state): i for i, (name, state) in enumerate(zip(names, states))}
+
+    located = locate_points(lat, lon, districts_path)
+    matches = resolve_cities(cities, districts_path=districts_path, path=matches_path)
+    # One key per point: `matches` holds each repeated city name once
+    keys = price_key(cities)
+
+    rows = []
+    for city, key, point_lat, point_lon, district in zip(cities, keys, lat, lon, located):
+        entry = matches[key]
+        named = [index[tuple(d)] for d in entry['districts'] if tuple(d) in index]
+        distance_km = None
+        if not np.isfinite(point_lat) or not np.isfinite(point_lon):
+            status = STATUS_NO_GEOCODE
+        elif not named:
+            status = STATUS_UNMATCHED if district >= 0 else STATUS_OUTSIDE
+        elif district in named:
+            status = STATUS_OK
+        else:
+            status = STATUS_MISMATCH if district >= 0 else STATUS_OUTSIDE
+            distance_km = round(float(np.min(haversine_km(point_lat, point_lon, centroids[named, 1],
+                                                          centroids[named, 0]))), 1)
+        rows.append({'City': city, 'Latitude': point_lat, 'Longitude': point_lon,
+                     'Located District': names[district] if district >= 0 else None,
+                     'Located State': states[district] if district >= 0 else None,
+                     'Named District': '; '.join(f"{d} ({s})" for d, s in entry['districts']) or None,
+                     'Name Match': entry['method'], 'Name Confidence': entry['confidence'],
+                     'Status': status, 'Km to Named District': distance_km})
+    check_df = pd.DataFrame(rows)
+    if len(check_df) != len(cities):
+        raise ValueError(f"Checked {len(check_df)} of {len(cities)} points; lat/lon must have one value per city")
+    counts = check_df['Status'].value_counts()
+    print(f"  Located {len(cities)} points in {time.perf_counter() - started:.2f} s: "
+          f"{', '.join(f'{count} {status}' for status, count in counts.items())}")
+    return check_df
+
+
+def print_flagged(check_df, limit=15):
+    """The mismatched points, farthest from their named district first."""
+    flagged = check_df[check_df['Status'].isin([STATUS_MISMATCH, STATUS_OUTSIDE])] \
+        .sort_values('Km to Named District', ascending=False, na_position='first')
+    for row in flagged.head(limit).to_dict('records'):
+        where = f"in {row['Located District']} ({row['Located State']})" if pd.notna(row['Located District']) \
+            else 'outside every district'
+        distance = f", {row['Km to Named District']:.0f} km from {row['Named District']}" \
+            if pd.notna(row['Km to Named District']) else ''
+        print(f"    {row['City']}: geocoded at ({row['Latitude']:.3f}, {row['Longitude']:.3f}) {where}{distance}")
+    if len(flagged) > limit:
+        print(f"    ... and {len(flagged) - limit} more (see {CITY_CHECK_FILE})")
+
+
+if __name__ == '__main__':
+    source_df = pd.read_csv(SOURCE_CSV_PATH, encoding='utf-8')
+    city_check_df = check_city_locations(source_df['City'], source_df['Latitude'], source_df['Longitude'])
+    print_flagged(city_check_df)
+    city_check_df.to_csv(CITY_CHECK_FILE, index=False, encoding='utf-8')
+    print(f"  Saved {CITY_CHECK_FILE}")
@@ -0,0 +1,92 @@
+"""Spatial estimates of diesel prices for districts without a quote.
+
+Mean-filling gives a district in Kerala the national average even when every
+neighbour is quoted 5 ₹/L above it.  Instead, each unquoted district gets the
+inverse-distance-weighted mean of its IDW_NEIGHBOURS nearest quoted districts
+(great-circle distance between centroids, via a haversine BallTree), and
+records:
+
+    Price Imputed      True where the price is an estimate
+    Price Uncertainty  weighted standard deviation of the neighbours' prices (₹/L)
+    Nearest Quote km   distance to the closest quoted district
+
+Quoted districts keep their quote (uncertainty 0).  All districts are filled
+in one vectorised query; the tree over ~700 quotes builds in a millisecond or
+two, so re-imputing after a daily price update is effectively free.
+"""
+import numpy as np
+import pandas as pd
+
+from district_geometry import DISTRICTS_FILE_PATH
+from district_matcher import district_price_keys
+from district_store import open_store
+
+EARTH_RADIUS_KM = 6371.0088
+IDW_NEIGHBOURS = 6
+IDW_POWER = 2.0
+# Distances below this count as the same place (avoids dividing by zero)
+MIN_DISTANCE_KM = 0.1
+
+IMPUTED_COLUMN = 'Price Imputed'
+UNCERTAINTY_COLUMN = 'Price Uncertainty'
+NEAREST_COLUMN = 'Nearest Quote km'
+
+
+def idw_impute(lat, lon, prices, k=IDW_NEIGHBOURS, power=IDW_POWER):
+    """Fill NaN prices from the k nearest finite ones.
+
+    Returns (prices, imputed mask, uncertainty, nearest quote km); everything
+    stays NaN if there are no quotes at all.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    prices = np.asarray(prices, dtype=float)
+    filled = prices.copy()
+    uncertainty = np.where(np.isnan(prices), np.nan, 0.0)
+    nearest_km = np.where(np.isnan(prices), np.nan, 0.0)
+    known = np.isfinite(prices) & np.isfinite(lat) & np.isfinite(lon)
+    missing = np.isnan(prices) & np.isfinite(lat) & np.isfinite(lon)
+    if not known.any() or not missing.any():
+        return filled, np.zeros(len(prices), dtype=bool), uncertainty, nearest_km
+
+    # Imported here: scikit-learn takes about a second to import, and most importers only need the column names
+    from sklearn.neighbors import BallTree
+    tree = BallTree(np.radians(np.column_stack((lat[known], lon[known]))), metric='haversine')
+    distance, neighbour = tree.query(np.radians(np.column_stack((lat[missing], lon[missing]))),
+                                     k=min(k, int(known.sum())))
+    distance_km = np.maximum(distance * EARTH_RADIUS_KM, MIN_DISTANCE_KM)
+    neighbour_prices = prices[known][neighbour]
+    weights = distance_km ** -power
+    weights /= weights.sum(axis=1, keepdims=True)
+    estimate = (weights * neighbour_prices).sum(axis=1)
+
+    filled[missing] = estimate
+    uncertainty[missing] = np.sqrt((weights * (neighbour_prices - estimate[:, None]) ** 2).sum(axis=1))
+    nearest_km[missing] = distance_km[:, 0]
+    return filled, missing, uncertainty, nearest_km
+
+
+def district_price_table(price_by_key, matches, districts_path=DISTRICTS_FILE_PATH, **idw_options):
+    """Price of every district (quoted or imputed), indexed by (district, state).
+
+    `price_by_key` maps price keys (matched CSV city keys) to prices, e.g. a
+    PriceStore snapshot; `matches` is the district_matcher mapping.
+    """
+    store = open_store(districts_path)
+    names, states, centroids = store.meta['names'], store.meta['states'], store.centroids
+    keys = district_price_keys(names, states, matches)
+    quoted = pd.Series(keys).map(pd.Series(price_by_key)).to_numpy(dtype=float)
+    prices, imputed, uncertainty, nearest_km = idw_impute(centroids[:, 1], centroids[:, 0], quoted, **idw_options)
+    return pd.DataFrame({'Price': prices, IMPUTED_COLUMN: imputed, UNCERTAINTY_COLUMN: uncertainty,
+                         NEAREST_COLUMN: nearest_km},
+                        index=pd.MultiIndex.from_arrays([names, states], names=['District', 'State']))
+
+
+def attach_district_prices(routes_df, table, district_column='Intersected District', state_column='Intersected State'):
+    """routes_df with Price, Price Imputed, Price Uncertainty and Nearest Quote km taken from the table."""
+    rows = pd.MultiIndex.from_arrays([routes_df[district_column], routes_df[state_column]])
+    values = table.reindex(rows)
+    routes_df = routes_df.copy()
+    for column in table.columns:
+        routes_df[column] = values[column].to_numpy()
+    return routes_df
@@ -0,0 +1,188 @@
+"""Range-minimum index over the prices along a route, for "cheapest ahead" queries.
+
+    python price_index.py "Toranagallu - Baghola" --from-km 300 --within 400
+
+RoutePriceIndex keeps a min segment tree over the route's prices (in
+chainage order), so:
+
+    cheapest(lo, hi)             cheapest point in index range [lo, hi)   O(log n)
+    cheapest_ahead(km, within)   same, by chainage window                 O(log n)
+    first_at_most(i, price)      first point from i on priced <= price    O(log n)
+    update(i, price)             change one price                         O(log n)
+
+It also keeps the greedy solver's next-cheaper array (fuel_solver.
+next_cheaper_stations) current: after a price change at k only points before
+k whose next-cheaper point was at or beyond k can change, and each of those
+is re-found with one first_at_most descent instead of redoing the stack pass.
+`route_price_index` memoizes one index per route and applies only the prices
+that differ from the last call, e.g. after a new price snapshot.  Indexes
+change in place, so each Streamlit session keeps its own.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from fuel_solver import next_cheaper_stations
+
+# Up to this many changed prices, update_many walks each root path in plain Python
+SCALAR_UPDATE_LIMIT = 8
+
+
+class RoutePriceIndex:
+    def __init__(self, chainage, prices):
+        self.chainage = np.asarray(chainage, dtype=float)
+        self.prices = np.asarray(prices, dtype=float).copy()
+        self.n = n = len(self.prices)
+        self.size = size = 1 << max(0, int(np.ceil(np.log2(max(n, 1)))))
+        # Node values, and the leftmost index holding each node's minimum; unknown prices never win
+        self.value = np.full(2 * size, np.inf)
+        self.argmin = np.full(2 * size, -1, dtype=np.int64)
+        self.value[size:size + n] = np.where(np.isnan(self.prices), np.inf, self.prices)
+        self.argmin[size:size + n] = np.arange(n)
+        level = size // 2
+        while level >= 1:
+            nodes = np.arange(level, 2 * level)
+            self._pull(nodes)
+            level //= 2
+        self.next_cheaper = next_cheaper_stations(self.value[size:size + n])
+
+    def _pull(self, nodes):
+        left, right = 2 * nodes, 2 * nodes + 1
+        take_right = self.value[right] < self.value[left]
+        self.value[nodes] = np.where(take_right, self.value[right], self.value[left])
+        self.argmin[nodes] = np.where(take_right, self.argmin[right], self.argmin[left])
+
+    def __len__(self):
+        return self.n
+
+    def cheapest(self, lo, hi):
+        """(price, index) of the cheapest point in [lo, hi), earliest on ties; (inf, -1) if empty."""
+        best_value, best_index = np.inf, -1
+        lo, hi = max(int(lo), 0) + self.size, min(int(hi), self.n) + self.size
+        while lo < hi:
+            if lo & 1:
+                if self.value[lo] < best_value or (self.value[lo] == best_value and self.argmin[lo] < best_index):
+                    best_value, best_index = self.value[lo], self.argmin[lo]
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                if self.value[hi] < best_value or (self.value[hi] == best_value and self.argmin[hi] < best_index):
+                    best_value, best_index = self.value[hi], self.argmin[hi]
+            lo //= 2
+            hi //= 2
+        return float(best_value), int(best_index)
+
+    def window(self, from_km, within_km):
+        """Index range [lo, hi) of the points with from_km <= chainage <= from_km + within_km."""
+        return int(np.searchsorted(self.chainage, from_km, side='left')), \
+            int(np.searchsorted(self.chainage, from_km + within_km, side='right'))
+
+    def cheapest_ahead(self, from_km, within_km):
+        """(price, index) of the cheapest point in the next `within_km` after chainage `from_km`."""
+        return self.cheapest(*self.window(from_km, within_km))
+
+    def first_at_most(self, start, price):
+        """First index >= start whose price is <= `price`, or -1."""
+        if start >= self.n:
+            return -1
+        node = int(start) + self.size
+        while self.value[node] > price:
+            # Step to the next subtree to the right: climb while a right child, then move across
+            while node & 1:
+                node //= 2
+            if node == 0:
+                return -1
+            node += 1
+        while node < self.size:
+            node = 2 * node if self.value[2 * node] <= price else 2 * node + 1
+        return node - self.size
+
+    def update(self, index, price):
+        """Change one price; keeps the tree and the next-cheaper array current."""
+        return self.update_many([index], [price])
+
+    def update_many(self, indices, prices):
+        """Change several prices; returns the positions whose next-cheaper point moved."""
+        indices = np.asarray(indices, dtype=np.int64)
+        if not len(indices):
+            return indices
+        self.prices[indices] = prices
+        self.value[indices + self.size] = np.where(np.isnan(self.prices[indices]), np.inf, self.prices[indices])
+        if len(indices) <= SCALAR_UPDATE_LIMIT:
+            # A few root paths: plain integer walks beat vectorised levels here
+            value, argmin = self.value, self.argmin
+            for leaf in (indices + self.size).tolist():
+                node = leaf // 2
+                while node >= 1:
+                    left, right = 2 * node, 2 * node + 1
+                    child = right if value[right] < value[left] else left
+                    value[node], argmin[node] = value[child], argmin[child]
+                    node //= 2
+        else:
+            nodes = np.unique((indices + self.size) // 2)
+            while len(nodes) and nodes[0] >= 1:
+                self._pull(nodes)
+                nodes = np.unique(nodes // 2)
+                nodes = nodes[nodes >= 1]
+
+        # Only points before a changed one that looked past it (or the changed points) can get a new answer:
+        # i is affected when the first changed index after i is no later than next_cheaper[i]
+        changed = np.append(np.unique(indices), self.n)
+        following = changed[np.searchsorted(changed, np.arange(self.n), side='right')]
+        affected = following <= self.next_cheaper
+        affected[indices] = True
+        leaves = self.value[self.size:self.size + self.n]
+        affected = np.flatnonzero(affected)
+        previous = self.next_cheaper[affected]
+        for i in affected:
+            found = self.first_at_most(i + 1, leaves[i]) if i < self.n - 1 else -1
+            self.next_cheaper[i] = found if found >= 0 else self.n - 1
+        return affected[self.next_cheaper[affected] != previous]
+
+
+_route_indexes = {}
+
+
+def route_price_index(route_name, chainage, prices, indexes=None):
+    """RoutePriceIndex for a route, reusing the last one and applying only changed prices.
+
+    The index is updated in place, so callers that run concurrently (app.py's
+    Streamlit sessions) each pass their own `indexes` dict; the default one is
+    for single-threaded scripts.
+    """
+    indexes = _route_indexes if indexes is None else indexes
+    chainage = np.asarray(chainage, dtype=float)
+    prices = np.asarray(prices, dtype=float)
+    index = indexes.get(route_name)
+    if index is None or len(index) != len(prices) or not np.array_equal(index.chainage, chainage):
+        index = RoutePriceIndex(chainage, prices)
+        indexes[route_name] = index
+        return index
+    changed = np.flatnonzero(~((index.prices == prices) | (np.isnan(index.prices) & np.isnan(prices))))
+    index.update_many(changed, prices[changed])
+    return index
+
+
+if __name__ == '__main__':
+    from geo_distance import CHAINAGE_COLUMN, add_route_distances
+    from route_chainage import add_road_chainage
+
+    parser = argparse.ArgumentParser(description="Cheapest diesel in a stretch of a route.")
+    parser.add_argument('route', help="Route name, e.g. 'Toranagallu - Baghola'")
+    parser.add_argument('--from-km', type=float, default=0.0)
+    parser.add_argument('--within', type=float, default=300.0, help="Length of the stretch in km")
+    parser.add_argument('--workbook', default='routes_districts_prices_filled_mean.xlsx')
+    args = parser.parse_args()
+
+    routes_df = add_road_chainage(add_route_distances(pd.read_excel(args.workbook)))
+    route_df = routes_df[routes_df['Route Name'] == args.route].reset_index(drop=True)
+    if route_df.empty:
+        raise SystemExit(f"No route '{args.route}' in {args.workbook}.")
+    index = route_price_index(args.route, route_df[CHAINAGE_COLUMN], route_df['Price'])
+    price, i = index.cheapest_ahead(args.from_km, args.within)
+    if i < 0:
+        print(f"No priced district between km {args.from_km:.0f} and {args.from_km + args.within:.0f}")
+    else:
+        print(f"Cheapest between km {args.from_km:.0f} and {args.from_km + args.within:.0f}: "
+              f"{route_df.loc[i, 'Intersected District']} at km {route_df.loc[i, CHAINAGE_COLUMN]:.1f}, ₹{price:.2f}/L")
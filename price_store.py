@@ -0,0 +1,233 @@
+"""Time-versioned diesel prices, stored as columns and appended one snapshot at a time.
+
+    python price_store.py india-diesel-22may25.csv           # date taken from the file name
+    python price_store.py prices.csv --date 2025-05-23       # explicit effective date
+
+Each ingested snapshot (a City,Price CSV with prices like '97.10 ₹/L') is
+written as one chunk file of three parallel columns:
+
+    manifest.json       district keys (index = key id), ingested sources, chunk list
+    chunk_<n>.npz       key_id int32, day int32 (days since 1970-01-01), price float64
+
+A daily refresh is an append: one new chunk plus a manifest rewrite, never a
+rewrite of older data or of the route workbook.  Keys are the normalised
+district/city name (stripped, lower case), the same key attach_prices joins on.
+
+On load, the chunks are concatenated and sorted by (key, day), so `asof`
+answers "price of these districts as of these dates" for a whole route with
+one searchsorted.  When a key has two prices for the same day, the later
+append wins.
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from plan_cache import file_fingerprint
+
+PRICE_STORE_DIR = '.price_store'
+SEED_CSV_PATH = 'india-diesel-22may25.csv'
+
+CSV_CITY_COLUMN = 'City'
+CSV_PRICE_COLUMN = 'Price'
+
+# Chunks merged into one when there are more than this many
+MAX_CHUNKS = 64
+
+_FILE_DATE = re.compile(r'(\d{1,2})([a-z]{3})(\d{2}|\d{4})(?!\d)', re.IGNORECASE)
+_EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def parse_price(values):
+    """Numeric price from strings such as '97.10 ₹/L'."""
+    return pd.to_numeric(pd.Series(values).astype(str).str.extract(r'(\d+(?:\.\d+)?)')[0], errors='coerce')
+
+
+def price_key(names):
+    """Store keys for district/city names."""
+    return pd.Series(names, dtype=object).astype(str).str.strip().str.lower().to_numpy()
+
+
+def date_from_filename(path):
+    """Effective date of a snapshot named like india-diesel-22may25.csv, or None."""
+    match = _FILE_DATE.search(os.path.basename(path))
+    if not match:
+        return None
+    day, month, year = match.groups()
+    try:
+        return datetime.datetime.strptime(f"{day} {month} {year[-2:]}", '%d %b %y').date()
+    except ValueError:
+        return None
+
+
+def to_days(dates):
+    """Days since 1970-01-01 (int32) for dates, datetime64s or ISO strings."""
+    return ((np.asarray(dates, dtype='datetime64[D]') - _EPOCH).astype(np.int64)).astype(np.int32)
+
+
+def read_snapshot(path):
+    """(city names, prices) of a City,Price CSV; rows without a numeric price are dropped."""
+    prices_df = pd.read_csv(path, encoding='utf-8-sig')
+    if CSV_CITY_COLUMN not in prices_df.columns or CSV_PRICE_COLUMN not in prices_df.columns:
+        raise ValueError(f"{path} must contain '{CSV_CITY_COLUMN}' and '{CSV_PRICE_COLUMN}' columns.")
+    cities = prices_df[CSV_CITY_COLUMN].astype(str).to_numpy()
+    prices = parse_price(prices_df[CSV_PRICE_COLUMN]).to_numpy()
+    valid = ~np.isnan(prices)
+    return cities[valid], prices[valid]
+
+
+class PriceStore:
+    def __init__(self, store_dir=PRICE_STORE_DIR):
+        self.store_dir = store_dir
+        self.manifest_path = os.path.join(store_dir, 'manifest.json')
+        self.manifest = {'keys': [], 'sources': {}, 'chunks': [], 'next_chunk': 0}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        self._key_ids = {key: i for i, key in enumerate(self.manifest['keys'])}
+        self._columns = None
+
+    def _write_manifest(self):
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(temp_path, self.manifest_path)
+
+    def _write_chunk(self, key_ids, days, prices):
+        name = f"chunk_{self.manifest['next_chunk']:05d}.npz"
+        self.manifest['next_chunk'] += 1
+        with open(os.path.join(self.store_dir, name), 'wb') as f:
+            np.savez(f, key_id=key_ids.astype(np.int32), day=days.astype(np.int32), price=prices.astype(float))
+        return name
+
+    def append(self, keys, prices, date, source=None):
+        """Add one snapshot: `prices` of the (normalised) `keys`, effective from `date`."""
+        os.makedirs(self.store_dir, exist_ok=True)
+        for key in keys:
+            if key not in self._key_ids:
+                self._key_ids[key] = len(self.manifest['keys'])
+                self.manifest['keys'].append(key)
+        key_ids = np.array([self._key_ids[key] for key in keys], dtype=np.int32)
+        days = np.full(len(key_ids), to_days(date), dtype=np.int32)
+        self.manifest['chunks'].append(self._write_chunk(key_ids, days, np.asarray(prices)))
+        if source:
+            self.manifest['sources'][source['fingerprint']] = source
+        self._write_manifest()
+        self._columns = None
+        if len(self.manifest['chunks']) > MAX_CHUNKS:
+            self.compact()
+
+    def ingest_csv(self, path, date=None):
+        """Append a snapshot CSV unless this exact file was ingested before; returns True if appended."""
+        fingerprint = file_fingerprint(path)
+        if fingerprint is None:
+            raise FileNotFoundError(path)
+        if fingerprint in self.manifest['sources']:
+            return False
+        date = date or date_from_filename(path)
+        if date is None:
+            raise ValueError(f"No effective date for {path}; pass one explicitly.")
+        cities, prices = read_snapshot(path)
+        keys = price_key(cities)
+        date = str(np.datetime64(date, 'D'))
+        self.append(keys, prices, date, source={'fingerprint': fingerprint, 'path': path, 'date': date,
+                                                'rows': len(keys)})
+        print(f"  Price store: appended {len(keys)} prices from {path} effective {date}")
+        return True
+
+    def columns(self):
+        """(key_id, day, price) of every distinct (key, day), sorted by key then day."""
+        if self._columns is None:
+            parts = []
+            for order, name in enumerate(self.manifest['chunks']):
+                with np.load(os.path.join(self.store_dir, name)) as chunk:
+                    parts.append((chunk['key_id'], chunk['day'], chunk['price'],
+                                  np.full(len(chunk['key_id']), order, dtype=np.int32)))
+            if parts:
+                key_id, day, price, order = (np.concatenate(column) for column in zip(*parts))
+            else:
+                key_id, day, order = (np.empty(0, dtype=np.int32) for _ in range(3))
+                price = np.empty(0)
+            sort = np.lexsort((order, day, key_id))
+            key_id, day, price = key_id[sort], day[sort], price[sort]
+            # Keep the last-appended price of each (key, day)
+            last = np.ones(len(key_id), dtype=bool)
+            last[:-1] = (key_id[1:] != key_id[:-1]) | (day[1:] != day[:-1])
+            self._columns = (key_id[last], day[last], price[last])
+        return self._columns
+
+    def compact(self):
+        """Rewrite all chunks as one (same content, faster to load)."""
+        key_id, day, price = self.columns()
+        old_chunks = self.manifest['chunks']
+        self.manifest['chunks'] = [self._write_chunk(key_id, day, price)]
+        self._write_manifest()
+        for name in old_chunks:
+            os.remove(os.path.join(self.store_dir, name))
+
+    def dates(self):
+        """Distinct effective dates in the store, ascending."""
+        return _EPOCH + np.unique(self.columns()[1]).astype('timedelta64[D]')
+
+    def latest_date(self):
+        days = self.columns()[1]
+        return _EPOCH + np.timedelta64(int(days.max()), 'D') if len(days) else None
+
+    def asof(self, names, dates=None):
+        """Price of each district as of each date (the latest price effective on or
+        before it); NaN where the store has none.  `names` and `dates` broadcast;
+        `dates` defaults to the latest date in the store."""
+        key_id, day, price = self.columns()
+        if dates is None:
+            dates = self.latest_date() if len(day) else np.datetime64('1970-01-01')
+        names, query_days = np.broadcast_arrays(np.asarray(names, dtype=object), to_days(dates))
+        query_ids = pd.Index(self.manifest['keys']).get_indexer(price_key(names.ravel())).reshape(names.shape)
+        # One sorted int64 axis: key id in the high bits, day in the low
+        sorted_key = (key_id.astype(np.int64) << 32) + day
+        query_key = (query_ids.astype(np.int64) << 32) + query_days
+        position = np.searchsorted(sorted_key, query_key, side='right') - 1
+        found = (query_ids >= 0) & (position >= 0)
+        found[found] &= key_id[position[found]] == query_ids[found]
+        result = np.full(names.shape, np.nan)
+        result[found] = price[position[found]]
+        return result
+
+    def snapshot(self, date=None):
+        """Series of every district's price as of `date`, indexed by key."""
+        keys = np.array(self.manifest['keys'], dtype=object)
+        return pd.Series(self.asof(keys, date), index=keys).dropna()
+
+
+_stores = {}
+
+
+def open_price_store(store_dir=PRICE_STORE_DIR, seed_files=(SEED_CSV_PATH,)):
+    """PriceStore for a directory, ingesting any seed snapshot not yet in it.
+    Reloaded when another process has appended to the store."""
+    manifest_fingerprint = file_fingerprint(os.path.join(store_dir, 'manifest.json'))
+    cached = _stores.get(store_dir)
+    store = cached[1] if cached and cached[0] == manifest_fingerprint else PriceStore(store_dir)
+    for path in seed_files:
+        if file_fingerprint(path) is not None:
+            store.ingest_csv(path)
+    _stores[store_dir] = (file_fingerprint(store.manifest_path), store)
+    return store
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Append diesel price snapshots to the price store.")
+    parser.add_argument('csv', nargs='+', help="City,Price snapshot CSV(s)")
+    parser.add_argument('--date', help="Effective date (YYYY-MM-DD); default: from the file name")
+    parser.add_argument('--store', default=PRICE_STORE_DIR)
+    args = parser.parse_args()
+
+    price_store = PriceStore(args.store)
+    for csv_path in args.csv:
+        if not price_store.ingest_csv(csv_path, args.date):
+            print(f"  {csv_path} is already in the store")
+    print(f"Price store: {len(price_store.manifest['keys'])} districts, {len(price_store.dates())} dates, "
+          f"latest {price_store.latest_date()}")
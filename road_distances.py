@@ -0,0 +1,71 @@
+"""Driving distances from a few origins (reference cities) to many targets.
+
+Instead of one full directions request per pair (downloading the whole route
+geometry just to read its length), targets are sent to the ORS matrix
+endpoint in chunks sized to the per-request limits, distance metric only.
+Chunks go out concurrently through OrsClient.map.
+
+A haversine prefilter avoids requests that cannot produce a useful answer:
+targets at the origin's own location are 0 km, and targets farther than
+MAX_HAVERSINE_KM from every origin (mis-geocoded points outside the country)
+are left as NaN, like pairs the router cannot connect.
+"""
+import numpy as np
+
+from geo_distance import haversine_km
+from ors_client import OrsError
+
+# Public ORS matrix limits: sources x destinations per request, and locations per request
+MATRIX_MAX_PAIRS = 3500
+MATRIX_MAX_LOCATIONS = 3500
+# Farther apart than any two drivable points in India
+MAX_HAVERSINE_KM = 3500.0
+
+
+def matrix_chunk_size(n_origins, max_pairs=MATRIX_MAX_PAIRS, max_locations=MATRIX_MAX_LOCATIONS):
+    """Targets per matrix request for a fixed set of origins."""
+    return max(1, min(max_pairs // max(n_origins, 1), max_locations - n_origins))
+
+
+def road_distances_km(client, origins, targets, profile='driving-car', max_haversine_km=MAX_HAVERSINE_KM,
+                      max_pairs=MATRIX_MAX_PAIRS, max_locations=MATRIX_MAX_LOCATIONS):
+    """(O, T) driving distances in km from (lat, lon) origins to (lat, lon) targets,
+    and an (O, T) mask of pairs whose matrix request failed (worth retrying later).
+
+    NaN marks pairs that were skipped by the prefilter, could not be routed, or
+    whose request failed.
+    """
+    origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+    targets = np.asarray(targets, dtype=float).reshape(-1, 2)
+    great_circle = haversine_km(origins[:, None, 0], origins[:, None, 1], targets[None, :, 0], targets[None, :, 1])
+    distances = np.full(great_circle.shape, np.nan)
+    same_place = great_circle == 0.0
+    distances[same_place] = 0.0
+    reachable = ~same_place & (great_circle <= max_haversine_km)
+    needed = np.flatnonzero(reachable.any(axis=0))
+
+    chunk = matrix_chunk_size(len(origins), max_pairs, max_locations)
+    chunks = [needed[lo:lo + chunk] for lo in range(0, len(needed), chunk)]
+    origin_locations = [[lon, lat] for lat, lon in origins]
+
+    def request(columns):
+        locations = origin_locations + [[lon, lat] for lat, lon in targets[columns]]
+        try:
+            response = client.matrix(locations, profile, sources=range(len(origins)),
+                                     destinations=range(len(origins), len(locations)), metrics=['distance'])
+        except OrsError as e:
+            print(f"    ORS API ERROR in matrix request for {len(columns)} targets: {e}")
+            return None
+        # Unroutable pairs come back as null
+        return np.array(response['distances'], dtype=float) / 1000.0
+
+    failed = np.zeros(distances.shape, dtype=bool)
+    for columns, block in zip(chunks, client.map(request, chunks)):
+        if block is None:
+            failed[:, columns] = reachable[:, columns]
+        else:
+            distances[:, columns] = np.where(reachable[:, columns], block, distances[:, columns])
+
+    print(f"  Road distances: {len(chunks)} matrix request(s) for {reachable.sum()} pairs; "
+          f"{same_place.sum()} same-place and {(~same_place & ~reachable).sum()} out-of-range pairs skipped")
+    return distances, failed
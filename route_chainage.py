@@ -0,0 +1,175 @@
+"""Linear referencing of districts along the stored route polylines.
+
+The route GeoJSONs in routes_geojson_output/ hold the real driving geometry
+(thousands of vertices per route).  A RouteLine keeps the vertex arrays and the
+cumulative road chainage at every vertex; `project` snaps points (district
+centroids, stations) onto the polyline and returns their chainage and lateral
+offset, vectorised over points x segments.
+
+RouteLines are built once per route file and cached both in memory and as .npz
+files under ROUTE_CACHE_DIR, keyed by the GeoJSON's content hash, so solves
+never pay the geometry cost.
+"""
+import json
+import os
+import re
+
+import numpy as np
+
+from geo_distance import (CHAINAGE_COLUMN, SEGMENT_DISTANCE_COLUMN, add_route_distances, chainage_km,
+                          segment_distances_km)
+from plan_cache import file_fingerprint
+
+ROUTES_GEOJSON_DIR = 'routes_geojson_output'
+ROUTE_CACHE_DIR = '.route_cache'
+DISTANCE_SOURCE_COLUMN = 'Distance Source'
+
+KM_PER_DEGREE = 111.195  # mean-sphere km per degree of latitude
+# Points x segments evaluated per chunk when projecting
+PROJECTION_CHUNK = 4_000_000
+
+
+def route_geojson_path(route_name, directory=ROUTES_GEOJSON_DIR):
+    """Where generate-routes.py saves the GeoJSON for a route name."""
+    clean_route_name = re.sub(r'[^\w_.)( -]', '', route_name).replace(' ', '_')
+    return os.path.join(directory, f"Route_{clean_route_name}.geojson")
+
+
+class RouteLine:
+    def __init__(self, lat, lon, chainage=None):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.chainage = chainage_km(segment_distances_km(self.lat, self.lon)) if chainage is None else chainage
+
+    @classmethod
+    def from_geojson(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            route_geojson = json.load(f)
+        coords = []
+        for feature in route_geojson.get('features', []):
+            geometry = feature['geometry']
+            if geometry['type'] == 'LineString':
+                coords.extend(geometry['coordinates'])
+            elif geometry['type'] == 'MultiLineString':
+                for line in geometry['coordinates']:
+                    coords.extend(line)
+        coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        return cls(lat=coords[:, 1], lon=coords[:, 0])
+
+    @property
+    def length_km(self):
+        return float(self.chainage[-1]) if len(self.chainage) else 0.0
+
+    def _nearest_on_segments(self, plat, plon, segments):
+        """Position (0-1) along and squared distance (degrees²) to the nearest point of
+        each segment index in `segments`, broadcast against the points."""
+        ay, ax = self.lat[segments], self.lon[segments]
+        by, bx = self.lat[segments + 1], self.lon[segments + 1]
+        # Local equirectangular frame around each segment start
+        k = np.cos(np.radians((plat + ay) / 2))
+        abx, aby = (bx - ax) * k, by - ay
+        apx, apy = (plon - ax) * k, plat - ay
+        length2 = abx ** 2 + aby ** 2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = np.clip(np.where(length2 > 0, (apx * abx + apy * aby) / length2, 0.0), 0.0, 1.0)
+        return t, (apx - t * abx) ** 2 + (apy - t * aby) ** 2
+
+    def project(self, lat, lon):
+        """Chainage (km along the route) and lateral offset (km) of the nearest
+        point on the polyline for each input point."""
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lon = np.atleast_1d(np.asarray(lon, dtype=float))
+        return self.project_near(lat, lon, np.zeros(len(lat), dtype=np.int64),
+                                 np.full(len(lat), len(self.lat) - 1, dtype=np.int64))
+
+    def project_near(self, lat, lon, segment_lo, segment_hi):
+        """Like `project`, but point i is only compared with segments
+        segment_lo[i] <= s < segment_hi[i] (a chainage window known to hold its
+        nearest point), so the cost is points x window instead of points x route."""
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lon = np.atleast_1d(np.asarray(lon, dtype=float))
+        segment_lo = np.asarray(segment_lo, dtype=np.int64)
+        segment_hi = np.maximum(np.asarray(segment_hi, dtype=np.int64), segment_lo + 1)
+        segment_km = np.diff(self.chainage)
+        last_segment = len(self.lat) - 2
+
+        chainage = np.empty(len(lat))
+        offset = np.empty(len(lat))
+        # Widest windows first, so each chunk is padded only to its own widest window
+        widths = segment_hi - segment_lo
+        order = np.argsort(-widths, kind='stable')
+        start = 0
+        while start < len(order):
+            width = int(widths[order[start]])
+            points = order[start:start + max(1, PROJECTION_CHUNK // width)]
+            start += len(points)
+            window = segment_lo[points, None] + np.arange(width)
+            valid = window < segment_hi[points, None]
+            window = np.minimum(window, last_segment)
+            t, d2 = self._nearest_on_segments(lat[points, None], lon[points, None], window)
+            d2 = np.where(valid, d2, np.inf)
+            best = np.argmin(d2, axis=1)
+            rows = np.arange(len(best))
+            segment = window[rows, best]
+            chainage[points] = self.chainage[segment] + t[rows, best] * segment_km[segment]
+            offset[points] = np.sqrt(d2[rows, best]) * KM_PER_DEGREE
+        return chainage, offset
+
+
+_route_lines = {}
+
+
+def load_route_line(path, cache_dir=ROUTE_CACHE_DIR):
+    """RouteLine for a route GeoJSON, built at most once per file version."""
+    fingerprint = file_fingerprint(path)
+    if fingerprint is None:
+        return None
+    cached = _route_lines.get(path)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+
+    cache_path = os.path.join(cache_dir, f"{fingerprint}.npz")
+    if os.path.exists(cache_path):
+        arrays = np.load(cache_path)
+        route_line = RouteLine(arrays['lat'], arrays['lon'], arrays['chainage'])
+    else:
+        route_line = RouteLine.from_geojson(path)
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(cache_path, lat=route_line.lat, lon=route_line.lon, chainage=route_line.chainage)
+    _route_lines[path] = (fingerprint, route_line)
+    return route_line
+
+
+def add_road_chainage(routes_df, directory=ROUTES_GEOJSON_DIR, route_column='Route Name',
+                      lat_column='District Latitude (Centroid)', lon_column='District Longitude (Centroid)'):
+    """Replace straight-line segment distances and chainage with road kilometres
+    for every route whose polyline is on disk.
+
+    District centroids are projected onto the polyline and each such route's rows
+    are put in driving order (by chainage); some routes in the workbook list
+    their districts starting from the destination.  The 'Distance Source'
+    column records 'road' or 'straight line'.
+    """
+    if SEGMENT_DISTANCE_COLUMN not in routes_df.columns:
+        routes_df = add_route_distances(routes_df, route_column, lat_column, lon_column)
+    segments = routes_df[SEGMENT_DISTANCE_COLUMN].to_numpy(dtype=float).copy()
+    chainage = routes_df[CHAINAGE_COLUMN].to_numpy(dtype=float).copy()
+    source = np.full(len(routes_df), 'straight line', dtype=object)
+    lat = routes_df[lat_column].to_numpy(dtype=float)
+    lon = routes_df[lon_column].to_numpy(dtype=float)
+
+    order = []
+    for route_name, rows in routes_df.groupby(route_column, sort=False).indices.items():
+        route_line = load_route_line(route_geojson_path(route_name, directory))
+        if route_line is not None and len(route_line.lat) >= 2:
+            road_chainage, _ = route_line.project(lat[rows], lon[rows])
+            by_chainage = np.argsort(road_chainage, kind='stable')
+            rows, road_chainage = rows[by_chainage], road_chainage[by_chainage]
+            segments[rows] = np.append(np.diff(road_chainage), np.nan)
+            chainage[rows] = road_chainage - road_chainage[0]
+            source[rows] = 'road'
+        order.append(rows)
+
+    routes_df = routes_df.assign(**{SEGMENT_DISTANCE_COLUMN: segments, CHAINAGE_COLUMN: chainage,
+                                    DISTANCE_SOURCE_COLUMN: source})
+    return routes_df.iloc[np.concatenate(order)].reset_index(drop=True)
@@ -0,0 +1,21 @@
+# Shared configuration for the route scripts
+
+# Pre-defined City Coordinates (lat, lon)
+cities_coords_provided = {
+    'Baghola, Haryana': (29.143027, 76.342784),
+    'Bangalore, Karnataka': (12.96557, 77.60625),
+    'Chittorgarh, Rajasthan': (24.878835, 74.645359),
+    'Haridwar, Uttarakhand': (29.926373, 78.132662),
+    'Hosur, Tamil Nadu': (12.7335, 77.826319),
+    'Raigarh, Chhattisgarh': (21.9, 83.4),
+    'Toranagallu, Karnataka': (15.19556, 76.67782)
+}
+
+# Routes Configuration
+routes_to_process_config = {
+    "Toranagallu - Baghola": {"cities": ["Toranagallu, Karnataka", "Baghola, Haryana"]},
+    "Baghola - Chittorgarh": {"cities": ["Baghola, Haryana", "Chittorgarh, Rajasthan"]},
+    "Chittorgarh - Hosur": {"cities": ["Chittorgarh, Rajasthan", "Hosur, Tamil Nadu"]},
+    "Haridwar - Bangalore": {"cities": ["Haridwar, Uttarakhand", "Bangalore, Karnataka"]},
+    "Raigarh - Toranagallu": {"cities": ["Raigarh, Chhattisgarh", "Toranagallu, Karnataka"]}
+}
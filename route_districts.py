@@ -0,0 +1,160 @@
+"""Rebuild the route/district/price workbooks from the route GeoJSONs.
+
+Usage:
+    python route_districts.py
+
+Every route polyline in routes_geojson_output/ is densified and its vertices
+are assigned to the containing district (bounding-box prefilter, then a
+vectorised point-in-polygon test), which gives the districts in the order the
+route enters them.  Each row gets the district's centroid and diesel price
+(an inverse-distance-weighted estimate where the district has no quote, see
+price_imputation.py), and the result is written to routes_and_districts.xlsx (no prices) and
+routes_districts_prices_filled_mean.xlsx (the workbook app.py reads).
+
+Per-route intersections are cached in INTERSECTION_CACHE_FILE, keyed by the
+route GeoJSON and district file hashes, so only new or changed routes are
+recomputed.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from district_geometry import DISTRICTS_FILE_PATH
+from district_matcher import DISTRICT_MATCHES_PATH, resolve_cities
+from district_store import open_store
+from plan_cache import file_fingerprint
+from price_imputation import IMPUTED_COLUMN, attach_district_prices, district_price_table
+from price_store import price_key, read_snapshot
+from route_chainage import ROUTES_GEOJSON_DIR, RouteLine, route_geojson_path
+from route_config import routes_to_process_config
+
+CSV_CITIES_FILE_PATH = 'india-diesel-22may25.csv'
+ROUTES_AND_DISTRICTS_FILE = 'routes_and_districts.xlsx'
+ROUTES_DISTRICTS_PRICES_FILE = 'routes_districts_prices_filled_mean.xlsx'
+INTERSECTION_CACHE_FILE = '.route_districts_cache.json'
+
+# Longest step between route vertices before the polyline is densified
+MAX_STEP_KM = 0.5
+
+ROUTE_COLUMNS = ['Route Name', 'Start City (Route)', 'End City (Route)', 'Intersected District',
+                 'Intersected State', 'District Latitude (Centroid)', 'District Longitude (Centroid)']
+
+
+def densify(route_line, max_step_km=MAX_STEP_KM):
+    """Lon/lat arrays with extra vertices so no step is longer than max_step_km."""
+    steps = np.diff(route_line.chainage)
+    pieces = np.maximum(np.ceil(steps / max_step_km).astype(np.int64), 1)
+    segment = np.repeat(np.arange(len(steps)), pieces)
+    # Fraction along each segment: 0, 1/k, ..., (k-1)/k
+    fraction = (np.arange(len(segment)) - np.repeat(np.cumsum(pieces) - pieces, pieces)) / np.repeat(pieces, pieces)
+    lon = route_line.lon[segment] + fraction * (route_line.lon[segment + 1] - route_line.lon[segment])
+    lat = route_line.lat[segment] + fraction * (route_line.lat[segment + 1] - route_line.lat[segment])
+    return np.append(lon, route_line.lon[-1]), np.append(lat, route_line.lat[-1])
+
+
+def route_district_sequence(route_line, districts):
+    """District indices in the order the route first enters them."""
+    lon, lat = densify(route_line)
+    assigned = districts.assign_points(lon, lat)
+    assigned = assigned[assigned >= 0]
+    _, first_seen = np.unique(assigned, return_index=True)
+    return assigned[np.sort(first_seen)]
+
+
+def configured_routes(directory=ROUTES_GEOJSON_DIR, routes_config=None):
+    """(route name, start city, end city, GeoJSON path) for every route on disk.
+
+    Routes in the config come first; GeoJSONs without a config entry are named
+    after their file and get their endpoints from the name.
+    """
+    routes_config = routes_to_process_config if routes_config is None else routes_config
+    routes = []
+    known_paths = set()
+    for route_name, route_info in routes_config.items():
+        path = route_geojson_path(route_name, directory)
+        known_paths.add(os.path.normpath(path))
+        if os.path.exists(path):
+            routes.append((route_name, route_info['cities'][0], route_info['cities'][-1], path))
+    for path in sorted(glob.glob(os.path.join(directory, 'Route_*.geojson'))):
+        if os.path.normpath(path) in known_paths:
+            continue
+        route_name = os.path.basename(path)[len('Route_'):-len('.geojson')].replace('_', ' ')
+        start_city, _, end_city = route_name.partition(' - ')
+        routes.append((route_name, start_city, end_city or start_city, path))
+    return routes
+
+
+def intersect_routes(routes, districts_path=DISTRICTS_FILE_PATH, cache_file=INTERSECTION_CACHE_FILE):
+    """Route/district rows for every route, reusing cached rows for unchanged routes."""
+    cache = {}
+    if cache_file and os.path.exists(cache_file):
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+
+    districts_fingerprint = file_fingerprint(districts_path)
+    districts = None
+    rows, fresh_cache, recomputed = [], {}, []
+    for route_name, start_city, end_city, path in routes:
+        fingerprint = f"{file_fingerprint(path)}:{districts_fingerprint}"
+        entry = cache.get(route_name)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            if districts is None:
+                districts = open_store(districts_path).polygons()
+            sequence = route_district_sequence(RouteLine.from_geojson(path), districts)
+            entry = {'fingerprint': fingerprint, 'rows': [
+                [route_name, start_city, end_city, districts.names[i], districts.states[i],
+                 float(districts.centroids[i, 1]), float(districts.centroids[i, 0])]
+                for i in sequence]}
+            recomputed.append(route_name)
+        fresh_cache[route_name] = entry
+        rows.extend(entry['rows'])
+
+    if cache_file:
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump(fresh_cache, f)
+    return pd.DataFrame(rows, columns=ROUTE_COLUMNS), recomputed
+
+
+def attach_prices(routes_df, prices_csv=CSV_CITIES_FILE_PATH, districts_path=DISTRICTS_FILE_PATH,
+                  matches_path=DISTRICT_MATCHES_PATH):
+    """Add the diesel price of each district (via the CSV city matched to it); districts
+    without a quote get an inverse-distance-weighted estimate from the nearest quoted ones."""
+    cities, prices = read_snapshot(prices_csv)
+    matches = resolve_cities(cities, districts_path=districts_path, path=matches_path)
+    price_by_name = pd.Series(prices, index=price_key(cities))
+    price_by_name = price_by_name[~price_by_name.index.duplicated(keep='last')]
+    return attach_district_prices(routes_df, district_price_table(price_by_name, matches, districts_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intersect route polylines with district boundaries.")
+    parser.add_argument('--routes-dir', default=ROUTES_GEOJSON_DIR)
+    parser.add_argument('--districts', default=DISTRICTS_FILE_PATH)
+    parser.add_argument('--prices', default=CSV_CITIES_FILE_PATH)
+    parser.add_argument('--routes-output', default=ROUTES_AND_DISTRICTS_FILE)
+    parser.add_argument('--output', default=ROUTES_DISTRICTS_PRICES_FILE)
+    parser.add_argument('--cache', default=INTERSECTION_CACHE_FILE)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    routes = configured_routes(args.routes_dir)
+    print(f"--- Intersecting {len(routes)} routes with districts from {args.districts} ---")
+    routes_df, recomputed = intersect_routes(routes, args.districts, args.cache)
+    print(f"  Recomputed {len(recomputed)} route(s), reused {len(routes) - len(recomputed)} from cache.")
+
+    routes_df.to_excel(args.routes_output, index=False)
+    print(f"  Route/district rows saved to: {args.routes_output}")
+    priced_df = attach_prices(routes_df, args.prices)
+    print(f"  {int(priced_df[IMPUTED_COLUMN].sum())} of {len(priced_df)} district prices imputed from neighbours.")
+    priced_df.to_excel(args.output, index=False)
+    print(f"  Route/district/price rows saved to: {args.output}")
+    print(f"--- Done in {time.perf_counter() - started:.2f} s ---")
+
+
+if __name__ == '__main__':
+    main()
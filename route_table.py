@@ -0,0 +1,107 @@
+"""Column arrays for the route/district table, grouped by route.
+
+app.py used to filter the whole DataFrame on every click
+(`routes_df[routes_df['Route Name'] == route]`) and then read prices one
+cell at a time with `.loc`.  A RouteTable is built once from the same table:
+every per-district column is a contiguous NumPy array with each route's rows
+side by side, so `table.route(name)` is a dict lookup plus slicing (views,
+no copies; ~10 us against ~1.5 ms for the filter).  District names are
+interned: rows carry an int32 id into `district_names` / `district_states`,
+which is also what repricing works on: `with_prices` looks each district up
+once and gathers by id.
+
+For the shipped 117-row workbook the table takes ~6 KB against ~22 KB for the
+DataFrame (~56 KB with object-dtype strings), per deep memory usage.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from geo_distance import CHAINAGE_COLUMN, SEGMENT_DISTANCE_COLUMN
+from price_imputation import IMPUTED_COLUMN, UNCERTAINTY_COLUMN
+from route_chainage import DISTANCE_SOURCE_COLUMN
+
+
+@dataclass(frozen=True)
+class RouteView:
+    """One route's rows: NumPy views into the table's arrays, in route order."""
+    name: str
+    lat: np.ndarray
+    lon: np.ndarray
+    price: np.ndarray
+    imputed: np.ndarray
+    uncertainty: np.ndarray
+    chainage: np.ndarray
+    segment_km: np.ndarray      # to the next district; NaN on the last row
+    district_id: np.ndarray
+    districts: np.ndarray       # interned names, gathered by district_id
+    distance_source: str
+
+    def __len__(self):
+        return len(self.price)
+
+
+class RouteTable:
+    def __init__(self, routes_df):
+        codes, self.names = pd.factorize(routes_df['Route Name'], sort=False)
+        order = np.argsort(codes, kind='stable')
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(self.names)))))
+        self._route_index = {name: i for i, name in enumerate(self.names)}
+
+        def column(name, dtype, default=np.nan):
+            if name not in routes_df.columns:
+                return np.full(len(order), default, dtype=dtype)
+            return np.ascontiguousarray(routes_df[name].to_numpy(dtype=dtype)[order])
+
+        # Centroids to ~1 m are plenty for drawing; prices and distances stay float64 so costs are unchanged
+        self.lat = column('District Latitude (Centroid)', np.float32)
+        self.lon = column('District Longitude (Centroid)', np.float32)
+        self.price = column('Price', np.float64)
+        self.imputed = column(IMPUTED_COLUMN, bool, False)
+        self.uncertainty = column(UNCERTAINTY_COLUMN, np.float32, 0.0)
+        self.chainage = column(CHAINAGE_COLUMN, np.float64)
+        self.segment_km = column(SEGMENT_DISTANCE_COLUMN, np.float64)
+
+        district_codes, districts = pd.MultiIndex.from_arrays(
+            [routes_df['Intersected District'].to_numpy(dtype=object)[order],
+             routes_df['Intersected State'].to_numpy(dtype=object)[order]]).factorize()
+        self.district_id = district_codes.astype(np.int32)
+        self.district_names = districts.get_level_values(0).to_numpy(dtype=object)
+        self.district_states = districts.get_level_values(1).to_numpy(dtype=object)
+
+        sources = routes_df[DISTANCE_SOURCE_COLUMN].to_numpy(dtype=object)[order] \
+            if DISTANCE_SOURCE_COLUMN in routes_df.columns else np.full(len(order), None, dtype=object)
+        self.distance_source = sources[self.offsets[:-1]] if len(order) else sources
+
+    def __len__(self):
+        return len(self.names)
+
+    def route(self, name):
+        """RouteView of one route; KeyError if it is not in the table."""
+        i = self._route_index[name]
+        rows = slice(self.offsets[i], self.offsets[i + 1])
+        district_id = self.district_id[rows]
+        return RouteView(name=name, lat=self.lat[rows], lon=self.lon[rows], price=self.price[rows],
+                         imputed=self.imputed[rows], uncertainty=self.uncertainty[rows],
+                         chainage=self.chainage[rows], segment_km=self.segment_km[rows],
+                         district_id=district_id, districts=self.district_names[district_id],
+                         distance_source=self.distance_source[i])
+
+    def with_prices(self, district_prices):
+        """A table sharing this one's geometry, priced from a price_imputation.district_price_table."""
+        rows = pd.MultiIndex.from_arrays([self.district_names, self.district_states])
+        values = district_prices.reindex(rows)
+        priced = object.__new__(RouteTable)
+        priced.__dict__.update(self.__dict__)
+        priced.price = values['Price'].to_numpy(dtype=float)[self.district_id]
+        priced.imputed = values[IMPUTED_COLUMN].fillna(False).to_numpy(dtype=bool)[self.district_id]
+        priced.uncertainty = values[UNCERTAINTY_COLUMN].to_numpy(dtype=np.float32)[self.district_id]
+        return priced
+
+    @property
+    def nbytes(self):
+        arrays = (self.offsets, self.lat, self.lon, self.price, self.imputed, self.uncertainty, self.chainage,
+                  self.segment_km, self.district_id)
+        return sum(array.nbytes for array in arrays) + \
+            sum(len(str(name)) + len(str(state)) for name, state in zip(self.district_names, self.district_states))
@@ -0,0 +1,72 @@
+"""Append-only JSONL journal for resumable per-item loops.
+
+The first line records the run key (a hash of the inputs that determine the
+results); every further line is one finished item:
+
+    {"run": "<sha256>"}
+    {"key": "Adilabad", "data": {...}}
+
+Opening a journal with the same run key loads the finished items so a
+restarted run skips them; a different run key starts a new journal.  A line
+cut short by a crash is ignored.  Lines are flushed as they are written and
+`sync()` fsyncs them, so a committed batch survives the process dying.
+"""
+import hashlib
+import json
+import os
+
+
+def run_key(*parts):
+    """Stable hash of the JSON-serialisable inputs of a run."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class RunJournal:
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.items = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            lines = text.splitlines()
+            try:
+                header = json.loads(lines[0]) if lines else {}
+            except ValueError:
+                header = {}
+            if header.get('run') == key:
+                for line in lines[1:]:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # partial line from an interrupted write
+                    self.items[entry['key']] = entry['data']
+        resumed = bool(self.items)
+        self.file = open(path, 'a' if resumed else 'w', encoding='utf-8')
+        if not resumed:
+            self.file.write(json.dumps({'run': key}) + '\n')
+        elif not text.endswith('\n'):
+            self.file.write('\n')
+        self.file.flush()
+
+    def __contains__(self, item_key):
+        return item_key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, item_key, default=None):
+        return self.items.get(item_key, default)
+
+    def append(self, item_key, data):
+        self.items[item_key] = data
+        self.file.write(json.dumps({'key': item_key, 'data': data}, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.sync()
+        self.file.close()
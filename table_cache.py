@@ -0,0 +1,139 @@
+"""Columnar cache of the route/price workbook, so a cold start skips openpyxl.
+
+    python table_cache.py                        # (re)build and time the default workbook
+    python table_cache.py routes_and_districts.xlsx
+
+`read_table(path)` returns the same DataFrame as `pd.read_excel(path)` (or
+`pd.read_csv` for a .csv).  The first read parses the file and saves every
+column as an array in .table_cache/<file name>.npz, text columns as fixed-width
+Unicode plus a missing-value mask, so loading needs no pickle.  Later reads
+load the arrays directly.
+
+The cache records the source's mtime, size and SHA-256.  When mtime and size
+match it is used without reading the source at all; when they differ the
+source is hashed, and only a changed hash re-parses it (a `touch` or a fresh
+checkout just refreshes the recorded mtime).  A table with columns of mixed
+Python objects is not cached, and a read-only cache directory only costs the
+parse.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from plan_cache import file_fingerprint
+
+TABLE_CACHE_DIR = '.table_cache'
+TABLE_CACHE_VERSION = 1
+
+# Source, path and seconds of the last read_table call, for startup reports
+last_read = {}
+
+
+def _cache_path(path, cache_dir):
+    return os.path.join(cache_dir, os.path.basename(path) + '.npz')
+
+
+def _parse(path):
+    return pd.read_csv(path) if path.lower().endswith('.csv') else pd.read_excel(path)
+
+
+def _encode(df):
+    """Arrays and per-column dtypes for a DataFrame, or None if a column can't be stored without pickle."""
+    arrays, dtypes = {}, []
+    for i, (name, column) in enumerate(df.items()):
+        values = column.to_numpy()
+        if values.dtype.kind in 'biufcmM':
+            arrays[f'c{i}'] = values
+        else:
+            missing = column.isna().to_numpy()
+            text = values[~missing]
+            if not all(isinstance(value, str) for value in text):
+                return None
+            arrays[f'c{i}'] = np.where(missing, '', values).astype(str)
+            arrays[f'na{i}'] = missing
+        dtypes.append(str(column.dtype))
+    return arrays, dtypes
+
+
+def _decode(arrays, meta):
+    columns = {}
+    for i, (name, dtype) in enumerate(zip(meta['columns'], meta['dtypes'])):
+        values = arrays[f'c{i}']
+        if f'na{i}' in arrays:
+            values = values.astype(object)
+            values[arrays[f'na{i}']] = np.nan
+            columns[name] = pd.Series(values, dtype=dtype)
+        else:
+            columns[name] = values
+    return pd.DataFrame(columns)
+
+
+def _write_cache(df, path, cache_path, stat):
+    encoded = _encode(df)
+    if encoded is None:
+        print(f"  {path} has columns of mixed objects; not cached")
+        return
+    arrays, dtypes = encoded
+    meta = {'version': TABLE_CACHE_VERSION, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+            'fingerprint': file_fingerprint(path), 'columns': df.columns.tolist(), 'dtypes': dtypes}
+    try:
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        temp_path = cache_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta, ensure_ascii=False)), **arrays)
+        os.replace(temp_path, cache_path)
+    except OSError as error:
+        print(f"  Could not write table cache {cache_path}: {error}")
+
+
+def read_table(path, cache_dir=TABLE_CACHE_DIR):
+    """The workbook (or CSV) at `path` as a DataFrame, from the columnar cache when it is current."""
+    started = time.perf_counter()
+    stat = os.stat(path)
+    cache_path = _cache_path(path, cache_dir)
+    df, source = None, 'parsed'
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            arrays = dict(cached)
+        meta = json.loads(str(arrays.pop('meta')))
+        if meta.get('version') == TABLE_CACHE_VERSION:
+            if (meta['mtime_ns'], meta['size']) == (stat.st_mtime_ns, stat.st_size):
+                df, source = _decode(arrays, meta), 'cache'
+            elif meta['fingerprint'] == file_fingerprint(path):
+                df, source = _decode(arrays, meta), 'cache (re-hashed)'
+
+    if df is None:
+        df = _parse(path)
+        _write_cache(df, path, cache_path, stat)
+    elif source != 'cache':
+        _write_cache(df, path, cache_path, stat)
+
+    last_read.update(path=path, source=source, seconds=time.perf_counter() - started)
+    return df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the columnar cache of a workbook and time it against openpyxl.")
+    parser.add_argument('path', nargs='?', default='routes_districts_prices_filled_mean.xlsx')
+    parser.add_argument('--cache-dir', default=TABLE_CACHE_DIR)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    parsed = _parse(args.path)
+    parse_seconds = time.perf_counter() - started
+    cache_path = _cache_path(args.path, args.cache_dir)
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+    read_table(args.path, args.cache_dir)
+    cached = read_table(args.path, args.cache_dir)
+    if last_read['source'] != 'cache':
+        raise SystemExit(f"{args.path} could not be cached.")
+    pd.testing.assert_frame_equal(cached, parsed)
+    print(f"{args.path}: {len(parsed)} rows x {len(parsed.columns)} columns")
+    print(f"  Parse:      {parse_seconds * 1000:.1f} ms")
+    print(f"  Cache read: {last_read['seconds'] * 1000:.1f} ms "
+          f"({os.path.getsize(cache_path) / 1024:.0f} KB in {cache_path})")
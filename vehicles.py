@@ -0,0 +1,7 @@
+# Vehicle mileage data (km/l) by load status
+vehicle_mileage = {
+    'RJ14GG9302': {'Load': 4.60, 'Empty': 5.00},
+    'RJ14GH7301': {'Load': 2.10, 'Empty': 4.00}
+}
+
+TANK_CAPACITY = 300